@@ -1,12 +1,89 @@
+import bisect
+import json
 import logging
+import os
+import re
+import sys
+import threading
 import time
-from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from abc import ABC
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, Iterator, List, Optional, Set, Tuple
 
-from mistral_client import MistralClient
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import AgentConfig
+from analytics_engine import analytics_engine
+from distributed_system import performance_optimizer, telemetry_bus
+from intent_classifier import intent_classifier
+from knowledge_cache import knowledge_cache
+from knowledge_search import knowledge_search_engine
+from mistral_client import MistralClient, mistral_client
+from personalization_engine import personalization_engine
+from response_cache import response_cache, semantic_response_cache
+from semantic_search import semantic_search_engine
+from static_content_cache import static_content_cache
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    from enhanced_agents import AIAbiturEnhanced
+except ImportError:
+    AIAbiturEnhanced = None
 
 logger = logging.getLogger(__name__)
 
+# Статический контекст агентов на случай недоступности базы знаний
+_FALLBACKS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'agent_fallbacks.json')
+
+# Маркеры структуры Markdown: '**', '###', '\n-', '\n•', '1.', '2.'
+_STRUCTURE_RE = re.compile(r'\*\*|###|\n-|\n•|1\.|2\.')
+
+
+@lru_cache(maxsize=1024)
+def _tokenize(message: str) -> Tuple[str, frozenset]:
+    """Lowercased message and its word set, shared by all scorers of one message"""
+    message_lower = message.lower()
+    return message_lower, frozenset(message_lower.split())
+
+
+@lru_cache(maxsize=256)
+def _context_profile(context: str) -> Tuple[frozenset, float]:
+    """
+    Per-context features reused across messages: word set and the weighted
+    message-independent part of the context confidence (length 0.3, structure 0.2)
+    """
+    context_words = frozenset(context.lower().split())
+    length_confidence = min(1.0, len(context) / 1000)  # Normalize to 1000 chars
+    # Одно сканирование regex; 5 разных маркеров уже дают максимум 1.0
+    markers = set()
+    for match in _STRUCTURE_RE.finditer(context):
+        markers.add(match.group())
+        if len(markers) == 5:
+            break
+    structure_confidence = min(1.0, len(markers) * 0.2)
+    return context_words, length_confidence * 0.3 + structure_confidence * 0.2
+
+
+@lru_cache(maxsize=1)
+def _load_fallback_contexts() -> Dict[str, Dict[str, str]]:
+    """Static fallback context per agent type and language, read on first use"""
+    try:
+        with open(_FALLBACKS_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading agent fallback contexts: {e}")
+        return {}
+    return {
+        sys.intern(agent_type): {sys.intern(language): text for language, text in texts.items()}
+        for agent_type, texts in data.items()
+    }
+
+
 class AgentType:
     AI_ABITUR = "ai_abitur"
     KADRAI = "kadrai"
@@ -15,29 +92,93 @@ class AgentType:
     UNIROOM = "uniroom"
 
 class BaseAgent(ABC):
-    def __init__(self, agent_type: str, name: str, description: str):
-        self.agent_type = agent_type
-        self.name = name
+    # Ключевые слова для маршрутизации и уверенность без совпадений
+    KEYWORDS: Tuple[str, ...] = ()
+    DEFAULT_CONFIDENCE = 0.2
+    # Системные промпты по языкам (задаются в агентах)
+    _PROMPTS: Dict[str, str] = {}
+    _KW_RE: Optional[re.Pattern] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Одна скомпилированная альтернатива вместо цикла по ключевым словам
+        if cls.KEYWORDS:
+            cls._KW_RE = re.compile('|'.join(map(re.escape, cls.KEYWORDS)), re.IGNORECASE)
+
+    def __init__(self, agent_type: str, name: str, description: str,
+                 mistral: Optional[MistralClient] = None):
+        # Интернированные строки: ключи кэшей сравниваются по указателю
+        self.agent_type = sys.intern(agent_type)
+        self.name = sys.intern(name)
         self.description = description
-        # Each agent has its own MistralClient instance
-        self.mistral = MistralClient()
+        # All agents share one client and its HTTP connection pool unless one is injected
+        self.mistral = mistral or mistral_client
+        # Заготовки ответов: копируются и заполняются вместо сборки словаря заново
+        self._response_skeleton = {
+            'response': None,
+            'confidence': 0.0,
+            'agent_type': agent_type,
+            'agent_name': name,
+            'context_used': False,
+            'context_confidence': 0.0,
+            'cached': False,
+            'response_time': 0.0,
+            'user_id': None
+        }
+        self._error_message = f"Извините, возникла ошибка при обработке запроса по теме '{description}'."
+        self._error_response = {
+            'response': self._error_message,
+            'confidence': 0.1,
+            'agent_type': agent_type,
+            'agent_name': name,
+            'context_used': False,
+            'context_confidence': 0.0,
+            'cached': False,
+            'error': True
+        }
 
-    @abstractmethod
     def can_handle(self, message: str, language: str = "ru") -> float:
-        pass
+        if self._KW_RE is not None and self._KW_RE.search(message):
+            return 1.0
+        return self.DEFAULT_CONFIDENCE
 
-    @abstractmethod
     def get_system_prompt(self, language: str = "ru") -> str:
-        pass
+        return self._PROMPTS.get(language) or self._PROMPTS['ru']
+
+    def process_message(self, message: str, language: str = "ru", user_id: str = "anonymous",
+                        agent_confidence: Optional[float] = None) -> Dict[str, Any]:
+        # Fast path: exact in-process cache hit, nothing else to compute
+        cached_response = response_cache.get(message, self.agent_type, language)
+        if cached_response:
+            return self._cached_result(cached_response, 'exact', message, language, user_id)
+        return self._process_uncached(message, language, user_id, agent_confidence)
 
-    def process_message(self, message: str, language: str = "ru", user_id: str = "anonymous") -> Dict[str, Any]:
+    def _cached_result(self, cached_response: Dict[str, Any], cache_type: str,
+                       message: str, language: str, user_id: str) -> Dict[str, Any]:
+        """Return cached response, personalization update goes to the background"""
+        telemetry_bus.publish(personalization_engine.update_user_interaction, user_id, {
+            'message': message,
+            'agent_type': self.agent_type,
+            'confidence': cached_response.get('confidence', 1.0),
+            'cached': True,
+            'language': language
+        })
+        
+        logger.info(f"Returning {cache_type} cached response for {self.name}")
+        return {
+            **cached_response,
+            'cached': True,
+            'cache_type': cache_type
+        }
+
+    def _process_uncached(self, message: str, language: str, user_id: str,
+                          agent_confidence: Optional[float]) -> Dict[str, Any]:
+        """Slow path: distributed cache, semantic cache, then context retrieval and LLM call"""
         try:
             start_time = time.time()
             
-            # Import advanced components
-            from analytics_engine import analytics_engine
-            from personalization_engine import personalization_engine
-            from distributed_system import performance_optimizer
+            # Токенизация сообщения один раз на весь запрос
+            _, message_tokens = _tokenize(message)
             
             # Check performance optimization first
             optimization_result = performance_optimizer.optimize_response_generation(
@@ -58,7 +199,7 @@ class BaseAgent(ABC):
                     'context_confidence': 1.0,
                     'language': language
                 }
-                analytics_engine.track_interaction(interaction_data)
+                telemetry_bus.publish(analytics_engine.track_interaction, interaction_data)
                 
                 return {
                     **optimization_result['response'],
@@ -77,25 +218,10 @@ class BaseAgent(ABC):
                     'async_processing': True
                 }
             
-            # Check cache first for performance
-            from response_cache import response_cache
-            
-            cached_response = response_cache.get(message, self.agent_type, language)
+            # Перефразированные вопросы обслуживаются семантическим кэшем
+            cached_response = semantic_response_cache.get(message, self.agent_type, language)
             if cached_response:
-                # Update user personalization
-                personalization_engine.update_user_interaction(user_id, {
-                    'message': message,
-                    'agent_type': self.agent_type,
-                    'confidence': cached_response.get('confidence', 1.0),
-                    'cached': True,
-                    'language': language
-                })
-                
-                logger.info(f"Returning cached response for {self.name}")
-                return {
-                    **cached_response,
-                    'cached': True
-                }
+                return self._cached_result(cached_response, 'semantic', message, language, user_id)
             
             # Get agent-specific system prompt
             system_prompt = self.get_system_prompt(language)
@@ -103,8 +229,11 @@ class BaseAgent(ABC):
             # Get agent-specific context from knowledge base with semantic search
             context = self.get_agent_context(message, language)
             
-            # Calculate context confidence for overall response confidence
-            context_confidence = self._assess_context_confidence(context, message)
+            # Calculate overall confidence based on agent matching and context quality
+            base_confidence = agent_confidence if agent_confidence is not None else self.can_handle(message, language)
+            overall_confidence, context_confidence = self._assess_and_combine(
+                context, message, base_confidence, message_tokens
+            )
             
             # Use agent-specific system prompt for this message
             response = self.mistral.get_response_with_system_prompt(
@@ -114,61 +243,18 @@ class BaseAgent(ABC):
             # Apply personalization to response
             personalized_response = personalization_engine.adapt_response_style(user_id, response)
             
-            # Calculate overall confidence based on agent matching and context quality
-            base_confidence = self.can_handle(message, language)
-            overall_confidence = self._calculate_overall_confidence(
-                base_confidence, context_confidence, bool(context)
-            )
-            
             # Calculate response time
             response_time = time.time() - start_time
             
-            response_data = {
-                'response': personalized_response,
-                'confidence': overall_confidence,
-                'agent_type': self.agent_type,
-                'agent_name': self.name,
-                'context_used': bool(context),
-                'context_confidence': context_confidence,
-                'cached': False,
-                'response_time': response_time,
-                'user_id': user_id
-            }
-            
-            # Generate proactive suggestions
-            suggestions = personalization_engine.generate_proactive_suggestions(user_id, context)
-            if suggestions:
-                response_data['suggestions'] = suggestions
-            
-            # Update user personalization
-            personalization_engine.update_user_interaction(user_id, {
-                'message': message,
-                'agent_type': self.agent_type,
-                'agent_name': self.name,
-                'confidence': overall_confidence,
-                'response_time': response_time,
-                'context_used': bool(context),
-                'context_confidence': context_confidence,
-                'language': language
-            })
-            
-            # Track interaction in analytics
-            analytics_engine.track_interaction({
-                'user_id': user_id,
-                'message': message,
-                'agent_type': self.agent_type,
-                'agent_name': self.name,
-                'confidence': overall_confidence,
-                'response_time': response_time,
-                'cached': False,
-                'context_used': bool(context),
-                'context_confidence': context_confidence,
-                'language': language
-            })
+            response_data = self._response_skeleton.copy()
+            response_data['response'] = personalized_response
+            response_data['confidence'] = overall_confidence
+            response_data['context_used'] = bool(context)
+            response_data['context_confidence'] = context_confidence
+            response_data['response_time'] = response_time
+            response_data['user_id'] = user_id
             
-            # Cache successful responses
-            if response_cache.should_cache(message, response_data):
-                response_cache.set(message, self.agent_type, response_data, language)
+            self._record_interaction(message, language, user_id, response_data, context)
                 
             return response_data
             
@@ -177,8 +263,7 @@ class BaseAgent(ABC):
             
             # Track error
             try:
-                from analytics_engine import analytics_engine
-                analytics_engine.track_error({
+                telemetry_bus.publish(analytics_engine.track_error, {
                     'error_type': 'agent_processing_error',
                     'agent_type': self.agent_type,
                     'message': message,
@@ -188,51 +273,143 @@ class BaseAgent(ABC):
             except:
                 pass  # Don't let analytics errors break the response
             
-            return {
-                'response': f"Извините, возникла ошибка при обработке запроса по теме '{self.description}'.",
-                'confidence': 0.1,
+            return self._error_response.copy()
+    
+    def process_message_stream(self, message: str, language: str = "ru",
+                               user_id: str = "anonymous") -> Iterator[Dict[str, Any]]:
+        """
+        Stream response events: 'meta' (confidence etc.) first, then 'chunk'
+        events with response text, then 'done'. The full text is cached and
+        tracked once the stream is finished; a stream cut off midway ends with
+        an 'error' event and is not cached.
+        """
+        start_time = time.time()
+        _, message_tokens = _tokenize(message)
+        try:
+            cached_response = (response_cache.get(message, self.agent_type, language)
+                               or semantic_response_cache.get(message, self.agent_type, language))
+            if cached_response:
+                yield {
+                    'type': 'meta',
+                    'agent_type': self.agent_type,
+                    'agent_name': self.name,
+                    'confidence': cached_response.get('confidence', 1.0),
+                    'context_used': cached_response.get('context_used', False),
+                    'context_confidence': cached_response.get('context_confidence', 0.0),
+                    'cached': True
+                }
+                yield {'type': 'chunk', 'content': cached_response['response']}
+                yield {'type': 'done', 'response_time': time.time() - start_time}
+                return
+            
+            system_prompt = self.get_system_prompt(language)
+            context = self.get_agent_context(message, language)
+            has_context = bool(context)
+            overall_confidence, context_confidence = self._assess_and_combine(
+                context, message, self.can_handle(message, language), message_tokens
+            )
+            
+            # Метаданные отправляются до первого токена
+            yield {
+                'type': 'meta',
                 'agent_type': self.agent_type,
                 'agent_name': self.name,
-                'context_used': False,
-                'context_confidence': 0.0,
-                'cached': False,
-                'error': True
+                'confidence': overall_confidence,
+                'context_used': has_context,
+                'context_confidence': context_confidence,
+                'cached': False
             }
-    
-    def _assess_context_confidence(self, context: str, message: str) -> float:
-        """Assess confidence in the retrieved context"""
+            
+            chunks = []
+            for chunk in self.mistral.stream_response_with_system_prompt(
+                message, context, language, system_prompt
+            ):
+                chunks.append(chunk)
+                yield {'type': 'chunk', 'content': chunk}
+            
+            response_time = time.time() - start_time
+            response_data = self._response_skeleton.copy()
+            response_data['response'] = ''.join(chunks)
+            response_data['confidence'] = overall_confidence
+            response_data['context_used'] = has_context
+            response_data['context_confidence'] = context_confidence
+            response_data['response_time'] = response_time
+            response_data['user_id'] = user_id
+            self._record_interaction(message, language, user_id, response_data, context)
+            
+            yield {'type': 'done', 'response_time': response_time}
+            
+        except Exception as e:
+            logger.error(f"Error in {self.name} agent stream: {str(e)}")
+            yield {
+                'type': 'error',
+                'error': self._error_message
+            }
+
+    def _record_interaction(self, message: str, language: str, user_id: str,
+                            response_data: Dict[str, Any], context: str):
+        """Suggestions, personalization, analytics and caching for a generated response"""
+        # Generate proactive suggestions (part of the response, stays inline)
+        suggestions = personalization_engine.generate_proactive_suggestions(user_id, context)
+        if suggestions:
+            response_data['suggestions'] = suggestions
+        
+        # Update user personalization and analytics off the request path
+        telemetry_bus.publish(personalization_engine.update_user_interaction, user_id, {
+            'message': message,
+            'agent_type': self.agent_type,
+            'agent_name': self.name,
+            'confidence': response_data['confidence'],
+            'response_time': response_data['response_time'],
+            'context_used': response_data['context_used'],
+            'context_confidence': response_data['context_confidence'],
+            'language': language
+        })
+        
+        telemetry_bus.publish(analytics_engine.track_interaction, {
+            'user_id': user_id,
+            'message': message,
+            'agent_type': self.agent_type,
+            'agent_name': self.name,
+            'confidence': response_data['confidence'],
+            'response_time': response_data['response_time'],
+            'cached': False,
+            'context_used': response_data['context_used'],
+            'context_confidence': response_data['context_confidence'],
+            'language': language
+        })
+        
+        # Cache successful responses
+        if response_cache.should_cache(message, response_data):
+            response_cache.set(message, self.agent_type, response_data, language)
+            semantic_response_cache.set(message, self.agent_type, response_data, language)
+
+    def _assess_and_combine(self, context: str, message: str, agent_confidence: float,
+                            message_tokens: Optional[frozenset] = None) -> Tuple[float, float]:
+        """
+        Assess retrieved context and combine it with agent confidence
+        
+        Returns:
+            Tuple of (overall confidence, context confidence)
+        """
         if not context:
-            return 0.0
+            # No context available, rely mainly on agent confidence
+            return agent_confidence * 0.8, 0.0  # Reduce confidence when no context
             
-        # Simple heuristics for context confidence
-        message_words = set(message.lower().split())
-        context_words = set(context.lower().split())
+        # Context-side features are computed once per distinct context
+        context_words, context_score = _context_profile(context)
+        message_words = message_tokens if message_tokens is not None else _tokenize(message)[1]
         
-        # Word overlap ratio
+        # Word overlap ratio: both sides are cached frozensets, '&' probes
+        # the smaller one against the other's hash table in C
         if message_words:
-            overlap = len(message_words.intersection(context_words))
-            word_confidence = overlap / len(message_words)
+            word_confidence = len(message_words & context_words) / len(message_words)
         else:
             word_confidence = 0.0
-            
-        # Context length confidence (more content usually means better info)
-        length_confidence = min(1.0, len(context) / 1000)  # Normalize to 1000 chars
         
-        # Structure confidence (well-formatted content is usually better)
-        structure_indicators = ['**', '###', '\n-', '\n•', '1.', '2.']
-        structure_score = sum(1 for indicator in structure_indicators if indicator in context)
-        structure_confidence = min(1.0, structure_score * 0.2)
+        # Weighted average (context part is precomputed)
+        context_confidence = word_confidence * 0.5 + context_score
         
-        # Weighted average
-        return (word_confidence * 0.5 + length_confidence * 0.3 + structure_confidence * 0.2)
-    
-    def _calculate_overall_confidence(self, agent_confidence: float, context_confidence: float, 
-                                    has_context: bool) -> float:
-        """Calculate overall response confidence"""
-        if not has_context:
-            # No context available, rely mainly on agent confidence
-            return agent_confidence * 0.8  # Reduce confidence when no context
-            
         # Combine agent and context confidence
         # Agent confidence shows how well this agent can handle the query type
         # Context confidence shows how relevant the retrieved information is
@@ -246,123 +423,117 @@ class BaseAgent(ABC):
         if context_confidence < 0.3:
             combined_confidence *= 0.8
             
-        return min(1.0, max(0.1, combined_confidence))
+        return min(1.0, max(0.1, combined_confidence)), context_confidence
     
     def get_agent_context(self, message: str, language: str = "ru") -> str:
         """Get agent-specific context from knowledge base using enhanced semantic search"""
         try:
-            # Import models with error handling
-            try:
-                from models import AgentKnowledgeBase
-                from app import db
-                from knowledge_search import knowledge_search_engine
-                from semantic_search import semantic_search_engine
-            except ImportError as ie:
-                logger.warning(f"Could not import required modules: {ie}")
-                return self._get_fallback_context(message, language)
-            
-            # Search for relevant knowledge entries for this agent
-            try:
-                knowledge_entries = AgentKnowledgeBase.query.filter_by(
-                    agent_type=self.agent_type,
-                    is_active=True
-                ).order_by(AgentKnowledgeBase.priority.asc()).all()
-            except Exception as db_error:
-                logger.warning(f"Database query failed: {db_error}")
-                return self._get_fallback_context(message, language)
-            
-            if not knowledge_entries:
-                logger.info(f"No knowledge entries found for agent type: {self.agent_type}")
-                return self._get_fallback_context(message, language)
-            
-            # Try semantic search first for better relevance
-            try:
-                semantic_results = semantic_search_engine.semantic_search(
-                    query=message,
-                    knowledge_entries=knowledge_entries,
-                    language=language,
-                    max_results=3,
-                    semantic_threshold=0.2
-                )
-                
-                if semantic_results:
-                    # Format semantic search results
-                    context_parts = []
-                    for result in semantic_results:
-                        title = result['title']
-                        content = result['content']
-                        semantic_score = result['semantic_score']
-                        
-                        context_parts.append(f"**{title}** (семантическая релевантность: {semantic_score:.2f})\n{content}")
-                    
-                    semantic_context = "\n\n".join(context_parts)
-                    logger.info(f"Semantic search found {len(semantic_results)} relevant entries for '{message[:50]}...'")
-                    return semantic_context
-                
-            except Exception as semantic_error:
-                logger.warning(f"Semantic search failed: {semantic_error}, falling back to enhanced search")
-                
-                # Fallback to enhanced search engine
-                try:
-                    search_results = knowledge_search_engine.search_knowledge_base(
-                        query=message,
-                        knowledge_entries=knowledge_entries,
-                        language=language,
-                        max_results=3,
-                        min_score=0.1
-                    )
-                    
-                    # If enhanced search finds relevant results, use them
-                    if search_results:
-                        context = knowledge_search_engine.format_context(search_results, max_length=1500)
-                        logger.info(f"Enhanced search found {len(search_results)} relevant knowledge entries for '{message[:50]}...'")
-                        return context
-                except Exception as search_error:
-                    logger.warning(f"Enhanced search failed: {search_error}")
-                
-                # Fallback to simple method if both enhanced searches fail
-                logger.info(f"Using fallback search for '{message[:50]}...'")
-                
-                # Build context from high-priority entries as fallback
-                context_parts = []
-                for entry in knowledge_entries[:2]:  # Top 2 priority entries
-                    content = entry.content_ru if language == 'ru' else entry.content_kz
-                    if content and content.strip():
-                        context_parts.append(f"**{entry.title}**\n{content}")
-                
-                fallback_context = "\n\n".join(context_parts) if context_parts else ""
-                if fallback_context:
-                    logger.info(f"Using {len(context_parts)} fallback knowledge entries")
-                    return fallback_context
-                else:
-                    logger.info("No usable knowledge entries found, using agent fallback")
-                    return self._get_fallback_context(message, language)
-            
+            return self._search_agent_context(message, language)
         except Exception as e:
             logger.error(f"Error getting agent context for {self.agent_type}: {str(e)}")
             return self._get_fallback_context(message, language)
+    
+    def _search_agent_context(self, message: str, language: str) -> str:
+        """Semantic search over the agent's knowledge snapshot, keyword search as fallback"""
+        # Search for relevant knowledge entries for this agent
+        try:
+            knowledge_snapshot = knowledge_cache.get_snapshot(self.agent_type)
+        except (SQLAlchemyError, RuntimeError) as db_error:
+            # RuntimeError: вызов вне контекста приложения Flask
+            logger.warning(f"Database query failed: {db_error}")
+            return self._get_fallback_context(message, language)
+        
+        knowledge_entries = knowledge_snapshot.entries
+        if not knowledge_entries:
+            logger.info(f"No knowledge entries found for agent type: {self.agent_type}")
+            return self._get_fallback_context(message, language)
+        
+        # Try semantic search first for better relevance
+        try:
+            semantic_results = semantic_search_engine.semantic_search(
+                query=message,
+                knowledge_entries=knowledge_entries,
+                language=language,
+                max_results=3,
+                semantic_threshold=0.2
+            )
+        except Exception as semantic_error:
+            logger.warning(f"Semantic search failed: {semantic_error}, falling back to enhanced search")
+            return self._get_keyword_context(message, knowledge_snapshot, language)
+        
+        if not semantic_results:
+            return ""
+        
+        # Format semantic search results
+        context_parts = [
+            f"**{result['title']}** (семантическая релевантность: {result['semantic_score']:.2f})\n{result['content']}"
+            for result in semantic_results
+        ]
+        logger.info(f"Semantic search found {len(semantic_results)} relevant entries for '{message[:50]}...'")
+        return "\n\n".join(context_parts)
+    
+    def _get_keyword_context(self, message: str, knowledge_snapshot, language: str) -> str:
+        """Fallback context from keyword search, then from top-priority entries"""
+        try:
+            search_results = knowledge_search_engine.search_knowledge_base(
+                query=message,
+                knowledge_entries=knowledge_snapshot.entries,
+                language=language,
+                max_results=3,
+                min_score=0.1
+            )
+        except Exception as search_error:
+            logger.warning(f"Enhanced search failed: {search_error}")
+            search_results = []
+        
+        # If enhanced search finds relevant results, use them
+        if search_results:
+            logger.info(f"Enhanced search found {len(search_results)} relevant knowledge entries for '{message[:50]}...'")
+            return knowledge_search_engine.format_context(search_results, max_length=1500)
+        
+        # Fallback to simple method if both enhanced searches fail
+        logger.info(f"Using fallback search for '{message[:50]}...'")
+        
+        # Build context from high-priority entries as fallback (top 2, memoized per snapshot)
+        fallback_context = knowledge_snapshot.top_context(language, top_k=2)
+        if fallback_context:
+            logger.info("Using top-priority fallback knowledge entries")
+            return fallback_context
+        
+        logger.info("No usable knowledge entries found, using agent fallback")
+        return self._get_fallback_context(message, language)
 
     def _get_fallback_context(self, message: str, language: str = "ru") -> str:
         """Provide fallback context when knowledge base is unavailable"""
-        # This method should be implemented by each agent to provide basic context
-        # when the knowledge base is not available
-        return ""
+        # Static per-language context lives in data/agent_fallbacks.json
+        fallback_context = _load_fallback_contexts().get(self.agent_type, {})
+        return fallback_context.get(language) or fallback_context.get('ru', "")
 
 class AIAbiturAgent(BaseAgent):
-    def __init__(self):
+    KEYWORDS = ("поступление", "абитуриент", "документы", "экзамен", "приём", "требования", "специальности", "факультет")
+    DEFAULT_CONFIDENCE = 0.3
+
+    def __init__(self, mistral: Optional[MistralClient] = None):
         super().__init__(
             AgentType.AI_ABITUR,
             "AI-Abitur",
-            "Цифровой помощник для абитуриентов (поступающих в вуз)"
+            "Цифровой помощник для абитуриентов (поступающих в вуз)",
+            mistral
         )
+        self._enhanced = AIAbiturEnhanced() if AIAbiturEnhanced is not None else None
 
-    def can_handle(self, message: str, language: str = "ru") -> float:
-        keywords = ["поступление", "абитуриент", "документы", "экзамен", "приём", "требования", "специальности", "факультет"]
-        return 1.0 if any(k in message.lower() for k in keywords) else 0.3
+    _PROMPTS = {
+        'ru': """
+Вы цифровой помощник для абитуриентов Кызылординского университета "Болашак". Вы помогаете с:
+- Помощью при поступлении
+- Консультациями по вопросам приёма
+- Информацией о необходимых документах
+- Объяснением вступительных экзаменов
+- Информацией о специальностях и факультетах
 
-    def get_system_prompt(self, language: str = "ru") -> str:
-        if language == "kz":
-            return """
+Ваши ответы должны быть конкретными, полезными и поддерживающими. Используйте формат Markdown.
+""",
+        'kz': """
 Сіз Қызылорда "Болашақ" университетінің талапкерлерге арналған цифрлық көмекшісіз. Сіз:
 - Түсу мәселелері бойынша көмек көрсетесіз
 - Түсу бойынша кеңес бересіз
@@ -372,26 +543,17 @@ class AIAbiturAgent(BaseAgent):
 
 Жауаптарыңыз нақты, пайдалы және көмек көрсетуші болуы керек. Markdown форматын қолданыңыз.
 """
-        return """
-Вы цифровой помощник для абитуриентов Кызылординского университета "Болашак". Вы помогаете с:
-- Помощью при поступлении
-- Консультациями по вопросам приёма
-- Информацией о необходимых документах
-- Объяснением вступительных экзаменов
-- Информацией о специальностях и факультетах
-
-Ваши ответы должны быть конкретными, полезными и поддерживающими. Используйте формат Markdown.
-"""
+    }
 
     def _get_fallback_context(self, message: str, language: str = "ru") -> str:
         """Provide enhanced admission context with specific functionality"""
         try:
-            # Import enhanced functionality
-            from enhanced_agents import AIAbiturEnhanced
-            enhanced = AIAbiturEnhanced()
+            enhanced = self._enhanced
+            if enhanced is None:
+                return super()._get_fallback_context(message, language)
             
             # Check if message is asking for specific information
-            message_lower = message.lower()
+            message_lower, _ = _tokenize(message)
             
             if any(word in message_lower for word in ['документы', 'справки', 'заявление', 'форма']):
                 # Get templates
@@ -410,52 +572,31 @@ class AIAbiturAgent(BaseAgent):
             pass  # Fall back to static context
         
         # Fallback to static context
-        if language == "kz":
-            return """**Қызылорда "Болашақ" университетіне түсу**
-
-Негізгі ақпарат:
-- Қабылдау комиссиясы: +7 (7242) 123-457
-- Email: admission@bolashak.kz
-- Мекен-жайы: г. Кызылорда, ул. Университетская, 1
-
-Түсу үшін қажетті құжаттар:
-- Мектеп аттестаты
-- Денсаулық туралы анықтама
-- Фотосуреттер (3x4)
-- Жеке куәлік көшірмесі
-
-💡 Егжей-тегжейлі ақпарат алу үшін: /api/enhanced/abitur/admission-info"""
-        
-        return """**Поступление в Кызылординский университет "Болашак"**
-
-Основная информация:
-- Приёмная комиссия: +7 (7242) 123-457
-- Email: admission@bolashak.kz
-- Адрес: г. Кызылорда, ул. Университетская, 1
-
-Документы для поступления:
-- Аттестат о среднем образовании
-- Справка о состоянии здоровья
-- Фотографии 3x4
-- Копия удостоверения личности
-
-💡 Подробную информацию можно получить через: /api/enhanced/abitur/admission-info"""
+        return super()._get_fallback_context(message, language)
 
 class KadrAIAgent(BaseAgent):
-    def __init__(self):
+    KEYWORDS = ("кадры", "отпуск", "перевод", "приказ", "сотрудник", "преподаватель", "отдел кадров", "трудовой", "зарплата", "кадровые")
+    DEFAULT_CONFIDENCE = 0.3
+
+    def __init__(self, mistral: Optional[MistralClient] = None):
         super().__init__(
             AgentType.KADRAI,
             "KadrAI",
-            "Интеллектуальный помощник для поддержки сотрудников и преподавателей в вопросах внутренних кадровых процедур"
+            "Интеллектуальный помощник для поддержки сотрудников и преподавателей в вопросах внутренних кадровых процедур",
+            mistral
         )
 
-    def can_handle(self, message: str, language: str = "ru") -> float:
-        keywords = ["кадры", "отпуск", "перевод", "приказ", "сотрудник", "преподаватель", "отдел кадров", "трудовой", "зарплата", "кадровые"]
-        return 1.0 if any(k in message.lower() for k in keywords) else 0.3
+    _PROMPTS = {
+        'ru': """
+Вы интеллектуальный помощник для сотрудников и преподавателей Кызылординского университета "Болашак". Вы помогаете с:
+- Консультациями по кадровым процессам: отпуска, переводы, приказы и т.д.
+- Вопросами трудового права
+- Объяснением внутренних процедур
+- Информацией о заработной плате и льготах
 
-    def get_system_prompt(self, language: str = "ru") -> str:
-        if language == "kz":
-            return """
+Ваши ответы должны быть профессиональными, конкретными и полезными. Используйте формат Markdown.
+""",
+        'kz': """
 Сіз Қызылорда "Болашақ" университетінің қызметкерлер мен оқытушыларға арналған зияткерлік көмекшісіз. Сіз:
 - Кадр процестері бойынша кеңес бересіз: демалыстар, ауыстырулар, бұйрықтар және т.б.
 - Еңбек құқығы мәселелері бойынша көмектесесіз
@@ -464,60 +605,31 @@ class KadrAIAgent(BaseAgent):
 
 Жауаптарыңыз кәсіби, нақты және пайдалы болуы керек. Markdown форматын қолданыңыз.
 """
-        return """
-Вы интеллектуальный помощник для сотрудников и преподавателей Кызылординского университета "Болашак". Вы помогаете с:
-- Консультациями по кадровым процессам: отпуска, переводы, приказы и т.д.
-- Вопросами трудового права
-- Объяснением внутренних процедур
-- Информацией о заработной плате и льготах
-
-Ваши ответы должны быть профессиональными, конкретными и полезными. Используйте формат Markdown.
-"""
-
-    def _get_fallback_context(self, message: str, language: str = "ru") -> str:
-        """Provide basic HR context when knowledge base is unavailable"""
-        if language == "kz":
-            return """**Кадр қызметі ақпараты**
-
-Кадр бөлімі байланысы:
-- Телефон: +7 (7242) 123-458
-- Email: info@bolashak.kz
-- Жұмыс уақыты: Дс-Жм 9:00-18:00
-
-Негізгі кадр мәселелері:
-- Демалыс рәсімдеу
-- Ауысу және тағайындау
-- Жалақы мәселелері
-- Құжаттама"""
-        
-        return """**Информация отдела кадров**
-
-Контакты отдела кадров:
-- Телефон: +7 (7242) 123-458
-- Email: info@bolashak.kz
-- Время работы: Пн-Пт 9:00-18:00
-
-Основные кадровые вопросы:
-- Оформление отпусков
-- Переводы и назначения
-- Вопросы заработной платы
-- Документооборот"""
+    }
 
 class UniNavAgent(BaseAgent):
-    def __init__(self):
+    KEYWORDS = ("расписание", "учёб", "занятие", "заявление", "обращение", "деканат", "академический", "экзамен", "зачёт", "вопросы")
+    DEFAULT_CONFIDENCE = 0.2
+
+    def __init__(self, mistral: Optional[MistralClient] = None):
         super().__init__(
             AgentType.UNINAV,
             "UniNav",
-            "Интерактивный чат-ассистент, обеспечивающий полное сопровождение обучающегося по всем университетским процессам"
+            "Интерактивный чат-ассистент, обеспечивающий полное сопровождение обучающегося по всем университетским процессам",
+            mistral
         )
 
-    def can_handle(self, message: str, language: str = "ru") -> float:
-        keywords = ["расписание", "учёб", "занятие", "заявление", "обращение", "деканат", "академический", "экзамен", "зачёт", "вопросы"]
-        return 1.0 if any(k in message.lower() for k in keywords) else 0.2
+    _PROMPTS = {
+        'ru': """
+Вы интерактивный чат-ассистент для студентов Кызылординского университета "Болашак". Вы обеспечиваете полное сопровождение по:
+- Навигации по учебным вопросам
+- Информации о расписании
+- Помощи с заявлениями и обращениями
+- Объяснению академических процессов
 
-    def get_system_prompt(self, language: str = "ru") -> str:
-        if language == "kz":
-            return """
+Ваши ответы должны быть конкретными и содержать пошаговые инструкции. Используйте формат Markdown.
+""",
+        'kz': """
 Сіз Қызылорда "Болашақ" университетінің студенттерге арналған интерактивті чат-көмекшісіз. Сіз:
 - Оқу мәселелері бойынша навигация жасайсыз
 - Сабақ кестесі туралы ақпарат бересіз
@@ -526,60 +638,31 @@ class UniNavAgent(BaseAgent):
 
 Жауаптарыңыз нақты және қадамдық нұсқаулықтар болуы керек. Markdown форматын қолданыңыз.
 """
-        return """
-Вы интерактивный чат-ассистент для студентов Кызылординского университета "Болашак". Вы обеспечиваете полное сопровождение по:
-- Навигации по учебным вопросам
-- Информации о расписании
-- Помощи с заявлениями и обращениями
-- Объяснению академических процессов
-
-Ваши ответы должны быть конкретными и содержать пошаговые инструкции. Используйте формат Markdown.
-"""
-
-    def _get_fallback_context(self, message: str, language: str = "ru") -> str:
-        """Provide basic student navigation context when knowledge base is unavailable"""
-        if language == "kz":
-            return """**Студенттерге арналған ақпарат**
-
-Деканаттар:
-- Телефон: +7 (7242) 123-458
-- Email: student@bolashak.kz
-- Жұмыс уақыты: Дс-Жм 9:00-18:00
-
-Негізгі студенттік қызметтер:
-- Сабақ кестесі
-- Академиялық анықтамалар
-- Өтініш беру
-- Емтихан мәселелері"""
-        
-        return """**Информация для студентов**
-
-Деканаты:
-- Телефон: +7 (7242) 123-458  
-- Email: student@bolashak.kz
-- Время работы: Пн-Пт 9:00-18:00
-
-Основные студенческие услуги:
-- Расписание занятий
-- Академические справки
-- Подача заявлений
-- Вопросы экзаменов"""
+    }
 
 class CareerNavigatorAgent(BaseAgent):
-    def __init__(self):
+    KEYWORDS = ("работ", "трудоустройств", "ваканс", "резюме", "карьер", "выпускник", "стажировк", "работодател")
+    DEFAULT_CONFIDENCE = 0.2
+
+    def __init__(self, mistral: Optional[MistralClient] = None):
         super().__init__(
             AgentType.CAREER_NAVIGATOR,
             "CareerNavigator",
-            "Интеллектуальный чат-бот для содействия трудоустройству студентов и выпускников"
+            "Интеллектуальный чат-бот для содействия трудоустройству студентов и выпускников",
+            mistral
         )
 
-    def can_handle(self, message: str, language: str = "ru") -> float:
-        keywords = ["работ", "трудоустройств", "ваканс", "резюме", "карьер", "выпускник", "стажировк", "работодател"]
-        return 1.0 if any(k in message.lower() for k in keywords) else 0.2
+    _PROMPTS = {
+        'ru': """
+Вы интеллектуальный чат-бот для содействия трудоустройству студентов и выпускников Кызылординского университета "Болашак". Вы помогаете с:
+- Поиском вакансий
+- Консультациями по резюме
+- Рекомендациями по карьере  
+- Поиском стажировок
 
-    def get_system_prompt(self, language: str = "ru") -> str:
-        if language == "kz":
-            return """
+Ваши ответы должны быть практичными и ориентированными на результат. Используйте формат Markdown.
+""",
+        'kz': """
 Сіз Қызылорда "Болашақ" университетінің студенттер мен түлектердің жұмысқа орналасуына көмектесетін зияткерлік чат-ботсыз. Сіз:
 - Жұмыс іздеуде көмектесесіз
 - Резюме бойынша кеңес бересіз  
@@ -588,60 +671,31 @@ class CareerNavigatorAgent(BaseAgent):
 
 Жауаптарыңыз практикалық және нәтижеге бағытталған болуы керек. Markdown форматын қолданыңыз.
 """
-        return """
-Вы интеллектуальный чат-бот для содействия трудоустройству студентов и выпускников Кызылординского университета "Болашак". Вы помогаете с:
-- Поиском вакансий
-- Консультациями по резюме
-- Рекомендациями по карьере  
-- Поиском стажировок
-
-Ваши ответы должны быть практичными и ориентированными на результат. Используйте формат Markdown.
-"""
-
-    def _get_fallback_context(self, message: str, language: str = "ru") -> str:
-        """Provide basic career guidance context when knowledge base is unavailable"""
-        if language == "kz":
-            return """**Мансап дамыту қызметі**
-
-Байланыс:
-- Телефон: +7 (7242) 123-456 
-- Email: info@bolashak.kz
-- Жұмыс уақыты: Дс-Жм 9:00-18:00
-
-Қызметтер:
-- Жұмыс орындарын іздеу
-- Резюме дайындау
-- Мансап кеңесі
-- Тәжірибе орындары"""
-        
-        return """**Служба развития карьеры**
-
-Контакты:
-- Телефон: +7 (7242) 123-456
-- Email: info@bolashak.kz
-- Время работы: Пн-Пт 9:00-18:00
-
-Услуги:
-- Поиск вакансий
-- Подготовка резюме
-- Карьерное консультирование
-- Стажировки"""
+    }
 
 class UniRoomAgent(BaseAgent):
-    def __init__(self):
+    KEYWORDS = ("общежитие", "заселение", "переселение", "бытов", "администрация", "комната", "жилищ", "проживан", "проблем")
+    DEFAULT_CONFIDENCE = 0.2
+
+    def __init__(self, mistral: Optional[MistralClient] = None):
         super().__init__(
             AgentType.UNIROOM,
             "UniRoom",
-            "Цифровой помощник для студентов, проживающих в общежитии"
+            "Цифровой помощник для студентов, проживающих в общежитии",
+            mistral
         )
 
-    def can_handle(self, message: str, language: str = "ru") -> float:
-        keywords = ["общежитие", "заселение", "переселение", "бытов", "администрация", "комната", "жилищ", "проживан", "проблем"]
-        return 1.0 if any(k in message.lower() for k in keywords) else 0.2
+    _PROMPTS = {
+        'ru': """
+Вы цифровой помощник для студентов, проживающих в общежитии Кызылординского университета "Болашак". Вы помогаете с:
+- Заселением
+- Переселением  
+- Решением бытовых вопросов
+- Обращениями в администрацию
 
-    def get_system_prompt(self, language: str = "ru") -> str:
-        if language == "kz":
-            return """
+Ваши ответы должны проявлять сочувствие и понимание. Используйте формат Markdown.
+""",
+        'kz': """
 Сіз Қызылорда "Болашақ" университетінде жатақханада тұратын студенттерге арналған цифрлық көмекшісіз. Сіз:
 - Орналасу мәселелері бойынша көмектесесіз
 - Көшіру мәселелерін шешесіз
@@ -650,162 +704,396 @@ class UniRoomAgent(BaseAgent):
 
 Жауаптарыңыз сүйемелділік пен түсінушілік танытуы керек. Markdown форматын қолданыңыз.
 """
-        return """
-Вы цифровой помощник для студентов, проживающих в общежитии Кызылординского университета "Болашак". Вы помогаете с:
-- Заселением
-- Переселением  
-- Решением бытовых вопросов
-- Обращениями в администрацию
+    }
 
-Ваши ответы должны проявлять сочувствие и понимание. Используйте формат Markdown.
-"""
+class KeywordMatcher:
+    """Single-pass multi-keyword matcher over all agents' KEYWORDS"""
+
+    def __init__(self, agents: List[BaseAgent]):
+        # keyword -> agent types that list it (e.g. "экзамен" is shared)
+        keyword_agents: Dict[str, Set[str]] = {}
+        for agent in agents:
+            for keyword in agent.KEYWORDS:
+                keyword_agents.setdefault(keyword, set()).add(agent.agent_type)
+
+        self.keyword_agents = {k: frozenset(v) for k, v in keyword_agents.items()}
+        # Ключевые слова по агентам в порядке приоритета маршрутизации
+        self.agent_keywords = tuple((agent.agent_type, agent.KEYWORDS) for agent in agents)
+        self.agent_rank = {agent_type: rank for rank, (agent_type, _) in enumerate(self.agent_keywords)}
+        self.agent_count = len({agent.agent_type for agent in agents})
+        # Уверенность агента без совпадений (как в can_handle)
+        self.default_scores = {agent.agent_type: agent.DEFAULT_CONFIDENCE for agent in agents}
+        self._automaton = None
+
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for keyword, agent_types in self.keyword_agents.items():
+                automaton.add_word(keyword, agent_types)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+        # Выбор агента и оценка уверенности сканируют одно и то же сообщение
+        self.match = lru_cache(maxsize=1024)(self._scan)
+
+    def _scan(self, message: str) -> FrozenSet[str]:
+        """Return agent types whose keywords occur in message"""
+        message_lower, _ = _tokenize(message)
+        matched: Set[str] = set()
+
+        if self._automaton is not None:
+            for _, agent_types in self._automaton.iter(message_lower):
+                matched.update(agent_types)
+            return frozenset(matched)
+
+        for keyword, agent_types in self.keyword_agents.items():
+            if keyword in message_lower:
+                matched.update(agent_types)
+                if len(matched) == self.agent_count:
+                    break
+        return frozenset(matched)
+
+    def first_match(self, message: str) -> Optional[str]:
+        """
+        Highest-priority agent type whose keywords occur in message
+        
+        Agents are checked in routing order and the scan stops at the first
+        agent with a hit, so later agents' keywords are not examined.
+        """
+        message_lower, _ = _tokenize(message)
+
+        if self._automaton is not None:
+            best_rank = None
+            for _, agent_types in self._automaton.iter(message_lower):
+                rank = min(self.agent_rank[agent_type] for agent_type in agent_types)
+                if best_rank is None or rank < best_rank:
+                    best_rank = rank
+                    if rank == 0:
+                        break
+            return self.agent_keywords[best_rank][0] if best_rank is not None else None
+
+        for agent_type, keywords in self.agent_keywords:
+            for keyword in keywords:
+                if keyword in message_lower:
+                    return agent_type
+        return None
+
+    def scores(self, message: str) -> Dict[str, float]:
+        """can_handle score of every agent from a single scan of the message"""
+        matched = self.match(message)
+        return {
+            agent_type: 1.0 if agent_type in matched else default
+            for agent_type, default in self.default_scores.items()
+        }
 
-    def _get_fallback_context(self, message: str, language: str = "ru") -> str:
-        """Provide basic dormitory context when knowledge base is unavailable"""
-        if language == "kz":
-            return """**Жатақхана ақпараты**
-
-Жатақхана әкімшілігі:
-- Телефон: +7 (7242) 123-459
-- Email: info@bolashak.kz  
-- Жұмыс уақыты: Дс-Жм 9:00-18:00
-
-Негізгі қызметтер:
-- Орналастыру мәселелері
-- Тұрмыстық мәселелер
-- Көшіру рәсімдері
-- Төлем мәселелері"""
-        
-        return """**Информация об общежитии**
-
-Администрация общежития:
-- Телефон: +7 (7242) 123-459
-- Email: info@bolashak.kz
-- Время работы: Пн-Пт 9:00-18:00
-
-Основные услуги:
-- Вопросы заселения
-- Бытовые проблемы
-- Процедуры переселения
-- Вопросы оплаты"""
 
 class AgentRouter:
-    def __init__(self):
-        # Each agent now creates its own MistralClient instance
+    # Routing decision cache limits
+    DECISION_CACHE_SIZE = 10000
+    DECISION_CACHE_TTL = 300  # 5 minutes
+    # Near-duplicate reuse: shared prefix share, minimum length and cached confidence
+    PREFIX_MATCH_RATIO = 0.9
+    PREFIX_MATCH_MIN_LENGTH = 20
+    PREFIX_MATCH_CONFIDENCE = 0.7
+    ANALYTICS_CACHE_TTL = 30  # seconds
+
+    # Просьба уточнить вопрос, когда ни один агент не подходит
+    CLARIFY_RESPONSES = {
+        'ru': "Уточните, пожалуйста, ваш вопрос: о поступлении, работе и кадрах, учебном процессе, карьере или общежитии?",
+        'kz': "Сұрағыңызды нақтылаңызшы: түсу, жұмыс және кадрлар, оқу процесі, мансап немесе жатақхана туралы ма?",
+        'en': "Could you please clarify your question: is it about admission, HR and staff, studies, career or the dormitory?"
+    }
+
+    def __init__(self, mistral: Optional[MistralClient] = None):
+        # Все агенты используют один клиент Mistral (общий пул соединений)
         self.agents = [
-            AIAbiturAgent(),
-            KadrAIAgent(),
-            UniNavAgent(),
-            CareerNavigatorAgent(),
-            UniRoomAgent()
+            AIAbiturAgent(mistral),
+            KadrAIAgent(mistral),
+            UniNavAgent(mistral),
+            CareerNavigatorAgent(mistral),
+            UniRoomAgent(mistral)
         ]
+        self._agents_by_type = {agent.agent_type: agent for agent in self.agents}
+        self.keyword_matcher = KeywordMatcher(self.agents)
+        # Агент по умолчанию, если ни одно ключевое слово не найдено (первый с максимальной уверенностью)
+        self._default_agent = max(self.agents, key=lambda agent: agent.DEFAULT_CONFIDENCE)
+        # Кэш решений классификатора: (язык, нормализованное сообщение) -> (expires_at, оценки)
+        self._decision_cache: OrderedDict = OrderedDict()
+        # Отсортированные ключи кэша: соседи по порядку имеют самый длинный общий префикс
+        self._decision_index: List[Tuple[str, str]] = []
+        self._decision_lock = threading.Lock()
+        # Снимок аналитики маршрутизации для опроса дашбордом: (expires_at, результат)
+        self._analytics_cache: Optional[Tuple[float, Dict[str, Any]]] = None
         logger.info(f"AgentRouter initialized with {len(self.agents)} agents")
 
-    def route_message(self, message: str, language: str = "ru", user_id: str = "anonymous") -> Dict[str, Any]:
-        """Enhanced agent routing with ML-based intent classification"""
+    def select_agent(self, message: str, language: str = "ru",
+                     user_id: str = "anonymous") -> Tuple[Optional[BaseAgent], float, Dict[str, Any]]:
+        """
+        Choose agent for message without processing it
+        
+        Returns:
+            Tuple of (agent or None, selection confidence, routing info)
+        """
         try:
-            # Import ML components
-            from intent_classifier import intent_classifier
-            from personalization_engine import personalization_engine
-            from analytics_engine import analytics_engine
-            
             # Get personalized agent recommendation
-            recommendation_result = personalization_engine.get_agent_recommendation(
-                user_id, message, [agent.agent_type for agent in self.agents]
-            )
-            recommended_agent, recommendation_confidence = recommendation_result if recommendation_result else (None, 0.0)
-            
-            # Use ML-based intent classification
-            agent_scores = intent_classifier.classify_intent(message, language)
-            
-            # If we have a strong personal recommendation, boost its score
-            if recommended_agent and recommended_agent in agent_scores:
-                original_score = agent_scores[recommended_agent]
-                boosted_score = min(1.0, original_score + recommendation_confidence * 0.2)
-                agent_scores[recommended_agent] = boosted_score
-                logger.info(f"Boosted {recommended_agent} score from {original_score:.3f} to {boosted_score:.3f} based on user preference")
-            
-            # Find best agent
-            if agent_scores:
-                best_agent_type = max(agent_scores, key=agent_scores.get)
-                confidence = agent_scores[best_agent_type]
-                
-                # Find the agent instance
-                best_agent = None
-                for agent in self.agents:
-                    if agent.agent_type == best_agent_type:
-                        best_agent = agent
-                        break
-                
-                if best_agent and confidence > 0.15:  # Minimum confidence threshold
-                    logger.info(f"ML router selected {best_agent.name} with confidence {confidence:.3f}")
-                    
-                    # Process message with selected agent
-                    result = best_agent.process_message(message, language, user_id)
-                    
-                    # Add routing information to result
-                    result['routing_info'] = {
-                        'ml_scores': agent_scores,
-                        'selected_agent': best_agent_type,
-                        'selection_confidence': confidence,
-                        'recommended_agent': recommended_agent,
-                        'recommendation_confidence': recommendation_confidence
-                    }
-                    
-                    return result
+            recommendation_result = self._get_recommendation(message, user_id)
+            
+            # Use ML-based intent classification (cached per message)
+            agent_scores = self._classify_intent(message, language)
+            
+            selection = self._select_from_scores(agent_scores, recommendation_result)
+            if selection:
+                return selection
             
             # Fallback to traditional routing if ML fails
             logger.warning("ML routing failed, falling back to traditional method")
-            return self._traditional_routing(message, language, user_id)
             
         except Exception as e:
             logger.error(f"Error in enhanced routing: {e}")
-            # Fallback to traditional routing
-            return self._traditional_routing(message, language, user_id)
-    
-    def _traditional_routing(self, message: str, language: str = "ru", user_id: str = "anonymous") -> Dict[str, Any]:
-        """Traditional keyword-based routing as fallback"""
-        best_conf = 0
-        best_agent = None
         
-        for agent in self.agents:
-            conf = agent.can_handle(message, language)
-            if conf > best_conf:
-                best_conf = conf
-                best_agent = agent
+        return self._traditional_result(message)
+
+    def _classify_intent(self, message: str, language: str) -> Dict[str, float]:
+        """
+        Intent scores for message, reused for repeated questions
+        
+        Scores do not depend on the user, so one entry serves everyone; the
+        personal boost is applied later on the returned copy. Besides exact
+        repeats, a confident decision is reused for a message that shares
+        nearly all of its text with a cached one (e.g. differs only in the tail).
+        """
+        message_lower, _ = _tokenize(message)
+        key = (language, ' '.join(message_lower.split()))
+        now = time.time()
+        with self._decision_lock:
+            cached = self._decision_cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._decision_cache.move_to_end(key)
+                return dict(cached[1])
+            near_scores = self._near_decision(key, now)
+            if near_scores is not None:
+                return dict(near_scores)
+        
+        agent_scores = intent_classifier.classify_intent(message, language, message_lower)
+        with self._decision_lock:
+            if key not in self._decision_cache:
+                bisect.insort(self._decision_index, key)
+            self._decision_cache[key] = (now + self.DECISION_CACHE_TTL, dict(agent_scores))
+            if len(self._decision_cache) > self.DECISION_CACHE_SIZE:
+                self._drop_decision(next(iter(self._decision_cache)))
+        return agent_scores
+
+    def _near_decision(self, key: Tuple[str, str], now: float) -> Optional[Dict[str, float]]:
+        """Confident cached decision for a sorted neighbour sharing the key's prefix"""
+        language, text = key
+        if len(text) < self.PREFIX_MATCH_MIN_LENGTH:
+            return None
+        
+        position = bisect.bisect_left(self._decision_index, key)
+        for neighbour in self._decision_index[max(0, position - 1):position + 1]:
+            if neighbour[0] != language:
+                continue
+            common = len(os.path.commonprefix((text, neighbour[1])))
+            if common / max(len(text), len(neighbour[1])) <= self.PREFIX_MATCH_RATIO:
+                continue
+            expires_at, scores = self._decision_cache[neighbour]
+            if expires_at > now and scores and max(scores.values()) > self.PREFIX_MATCH_CONFIDENCE:
+                return scores
+        return None
+
+    def _drop_decision(self, key: Tuple[str, str]):
+        """Remove decision from cache and its sorted index (lock held)"""
+        del self._decision_cache[key]
+        position = bisect.bisect_left(self._decision_index, key)
+        del self._decision_index[position]
+
+    def _invalidate_decisions(self, message: str, agent_type: str, user_rating: float):
+        """Drop routing decisions affected by user feedback"""
+        with self._decision_lock:
+            if user_rating >= 0.8:
+                # New learned pattern changes scoring for every message
+                self._decision_cache.clear()
+                self._decision_index.clear()
+                return
+            
+            message_key = ' '.join(_tokenize(message)[0].split())
+            for key in list(self._decision_cache):
+                scores = self._decision_cache[key][1]
+                poor_choice = (user_rating < 0.5 and scores
+                               and max(scores, key=scores.get) == agent_type)
+                if key[1] == message_key or poor_choice:
+                    self._drop_decision(key)
+
+    def _get_recommendation(self, message: str, user_id: str) -> Optional[Tuple[str, float]]:
+        """Personalized agent recommendation for user"""
+        return personalization_engine.get_agent_recommendation(
+            user_id, message, [agent.agent_type for agent in self.agents]
+        )
+
+    def _select_from_scores(self, agent_scores: Dict[str, float],
+                            recommendation_result: Optional[Tuple[str, float]]
+                            ) -> Optional[Tuple[BaseAgent, float, Dict[str, Any]]]:
+        """Pick agent from ML scores boosted by personal recommendation, None if too weak"""
+        recommended_agent, recommendation_confidence = recommendation_result if recommendation_result else (None, 0.0)
         
+        # If we have a strong personal recommendation, boost its score
+        if recommended_agent and recommended_agent in agent_scores:
+            original_score = agent_scores[recommended_agent]
+            boosted_score = min(1.0, original_score + recommendation_confidence * 0.2)
+            agent_scores[recommended_agent] = boosted_score
+            logger.info(f"Boosted {recommended_agent} score from {original_score:.3f} to {boosted_score:.3f} based on user preference")
+        
+        # Find best agent
+        if not agent_scores:
+            return None
+        
+        best_agent_type = max(agent_scores, key=agent_scores.get)
+        confidence = agent_scores[best_agent_type]
+        
+        # Find the agent instance
+        best_agent = self._agents_by_type.get(best_agent_type)
+        
+        if best_agent and confidence > 0.15:  # Minimum confidence threshold
+            logger.info(f"ML router selected {best_agent.name} with confidence {confidence:.3f}")
+            return best_agent, confidence, {
+                'ml_scores': agent_scores,
+                'selected_agent': best_agent_type,
+                'selection_confidence': confidence,
+                'recommended_agent': recommended_agent,
+                'recommendation_confidence': recommendation_confidence
+            }
+        return None
+
+    def _traditional_result(self, message: str) -> Tuple[Optional[BaseAgent], float, Dict[str, Any]]:
+        """Keyword-based selection with its routing info"""
+        best_agent, best_conf = self._traditional_selection(message)
         if best_agent:
             logger.info(f"Traditional router selected {best_agent.name} with confidence {best_conf:.3f}")
-            result = best_agent.process_message(message, language, user_id)
-            result['routing_info'] = {
-                'method': 'traditional',
-                'selected_agent': best_agent.agent_type,
-                'selection_confidence': best_conf
-            }
-            return result
+        return best_agent, best_conf, {
+            'method': 'traditional',
+            'selected_agent': best_agent.agent_type if best_agent else None,
+            'selection_confidence': best_conf
+        }
+
+    def route_message(self, message: str, language: str = "ru", user_id: str = "anonymous") -> Dict[str, Any]:
+        """
+        Enhanced agent routing with ML-based intent classification
+        
+        Args:
+            message: User message
+            language: Message language
+            user_id: User identifier
+        """
+        # Language is part of every cache key below; intern it once per request
+        language = sys.intern(language)
+        
+        best_agent, confidence, routing_info = self.select_agent(message, language, user_id)
+        return self._dispatch(best_agent, confidence, routing_info,
+                              message, language, user_id)
+    
+    def _dispatch(self, best_agent: Optional[BaseAgent], confidence: float,
+                  routing_info: Dict[str, Any], message: str, language: str,
+                  user_id: str) -> Dict[str, Any]:
+        """Process message with the selected agent and attach routing info"""
+        if not best_agent:
+            return self._routing_error_response()
+        
+        # Keyword confidence is already known for traditional routing,
+        # otherwise take it from one shared scan instead of the agent's can_handle
+        is_traditional = routing_info.get('method') == 'traditional'
+        if is_traditional:
+            agent_confidence = confidence
         else:
-            # No agent can handle, return general error
-            return {
-                'response': "Извините, я не смог определить подходящего специалиста для вашего вопроса. Обратитесь в общую информационную службу университета.",
-                'confidence': 0.1,
-                'agent_type': 'none',
-                'agent_name': 'Router',
-                'context_used': False,
-                'context_confidence': 0.0,
-                'cached': False,
-                'routing_error': True
-            }
+            agent_confidence = self.keyword_matcher.scores(message)[best_agent.agent_type]
+        
+        # No keyword matched: answer from cache if possible, otherwise ask to clarify (no LLM call)
+        if self.should_clarify(confidence, routing_info):
+            result = self._low_confidence_response(best_agent, message, language, confidence)
+            result['routing_info'] = routing_info
+            return result
+        
+        # Process message with selected agent
+        result = best_agent.process_message(message, language, user_id, agent_confidence)
+        
+        # Add routing information to result
+        result['routing_info'] = routing_info
+        return result
+
+    def _traditional_selection(self, message: str) -> Tuple[Optional[BaseAgent], float]:
+        """Keyword-based agent selection from a single scan of the message"""
+        matched_type = self.keyword_matcher.first_match(message)
+        if matched_type is not None:
+            return self._agents_by_type[matched_type], 1.0
+        
+        return self._default_agent, self._default_agent.DEFAULT_CONFIDENCE
+    
+    def should_clarify(self, confidence: float, routing_info: Dict[str, Any]) -> bool:
+        """Whether selection is too weak to spend context retrieval and an LLM call on"""
+        return (routing_info.get('method') == 'traditional'
+                and confidence < AgentConfig.CLARIFY_THRESHOLD)
+    
+    def clarify_stream(self, agent: BaseAgent, message: str, language: str,
+                       confidence: float) -> Iterator[Dict[str, Any]]:
+        """Low-confidence answer as process_message_stream events"""
+        start_time = time.time()
+        result = self._low_confidence_response(agent, message, language, confidence)
+        yield {
+            'type': 'meta',
+            'agent_type': result.get('agent_type'),
+            'agent_name': result.get('agent_name'),
+            'confidence': result.get('confidence', confidence),
+            'context_used': result.get('context_used', False),
+            'context_confidence': result.get('context_confidence', 0.0),
+            'cached': result.get('cached', False)
+        }
+        yield {'type': 'chunk', 'content': result['response']}
+        yield {'type': 'done', 'response_time': time.time() - start_time}
+    
+    def _low_confidence_response(self, agent: BaseAgent, message: str, language: str,
+                                 confidence: float) -> Dict[str, Any]:
+        """Cached answer of the default agent or a localized clarification request"""
+        cached_response = (response_cache.get(message, agent.agent_type, language)
+                           or semantic_response_cache.get(message, agent.agent_type, language))
+        if cached_response:
+            logger.info(f"Low-confidence message answered from cache by {agent.name}")
+            return {**cached_response, 'cached': True}
+        
+        return {
+            'response': self.CLARIFY_RESPONSES.get(language) or self.CLARIFY_RESPONSES['ru'],
+            'confidence': confidence,
+            'agent_type': 'none',
+            'agent_name': 'Router',
+            'context_used': False,
+            'context_confidence': 0.0,
+            'cached': False,
+            'needs_clarification': True
+        }
+    
+    def _routing_error_response(self) -> Dict[str, Any]:
+        return {
+            'response': "Извините, я не смог определить подходящего специалиста для вашего вопроса. Обратитесь в общую информационную службу университета.",
+            'confidence': 0.1,
+            'agent_type': 'none',
+            'agent_name': 'Router',
+            'context_used': False,
+            'context_confidence': 0.0,
+            'cached': False,
+            'routing_error': True
+        }
     
     def provide_feedback(self, user_id: str, message: str, agent_type: str, 
                         user_rating: float, feedback_text: str = ""):
-        """Provide feedback for learning improvement"""
+        """Provide feedback for learning improvement (applied in the background)"""
+        telemetry_bus.publish(self._apply_feedback, user_id, message, agent_type,
+                              user_rating, feedback_text)
+    
+    def _apply_feedback(self, user_id: str, message: str, agent_type: str,
+                        user_rating: float, feedback_text: str = ""):
+        """Update classifier, personalization and analytics with one feedback event"""
         try:
-            from intent_classifier import intent_classifier
-            from personalization_engine import personalization_engine
-            from analytics_engine import analytics_engine
-            
             # Update intent classifier with feedback
             intent_classifier.learn_from_feedback(message, agent_type, user_rating)
+            self._invalidate_decisions(message, agent_type, user_rating)
+            self._analytics_cache = None
             
             # Update personalization engine
             personalization_engine.add_user_feedback(user_id, user_rating, feedback_text)
@@ -826,40 +1114,68 @@ class AgentRouter:
             logger.error(f"Error processing feedback: {e}")
     
     def get_routing_analytics(self) -> Dict[str, Any]:
-        """Get analytics about routing performance"""
+        """Get analytics about routing performance (cached for ANALYTICS_CACHE_TTL seconds)"""
+        cached = self._analytics_cache
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+        
         try:
-            from intent_classifier import intent_classifier
-            from analytics_engine import analytics_engine
-            
             # Get ML classifier stats
             ml_stats = intent_classifier.get_learning_stats()
             
             # Get overall performance metrics
             performance_metrics = analytics_engine.get_performance_metrics(time_window_hours=24)
             
-            # Get agent usage distribution
+            # Get agent usage distribution (one pass over history for all agents)
+            bulk_metrics = analytics_engine.get_performance_metrics_bulk(
+                list(self._agents_by_type), time_window_hours=24
+            )
             agent_usage = {}
-            for agent in self.agents:
-                agent_metrics = analytics_engine.get_performance_metrics(
-                    agent_type=agent.agent_type, 
-                    time_window_hours=24
-                )
-                agent_usage[agent.agent_type] = {
+            for agent_type, agent in self._agents_by_type.items():
+                agent_metrics = bulk_metrics[agent_type]
+                agent_usage[agent_type] = {
                     'name': agent.name,
                     'interactions': agent_metrics.get('total_interactions', 0),
                     'avg_confidence': agent_metrics.get('performance', {}).get('avg_confidence', 0)
                 }
             
-            return {
+            result = {
                 'ml_classifier_stats': ml_stats,
                 'overall_performance': performance_metrics,
                 'agent_usage': agent_usage,
                 'total_agents': len(self.agents)
             }
+            self._analytics_cache = (time.time() + self.ANALYTICS_CACHE_TTL, result)
+            return result
             
         except Exception as e:
             logger.error(f"Error getting routing analytics: {e}")
             return {'error': str(e)}
 
+    def warm_up(self):
+        """
+        Pay one-time costs at startup instead of on the first chat request:
+        fallback texts, knowledge snapshots, per-entry search profiles,
+        regex compilation and classifier setup
+        """
+        _load_fallback_contexts()
+        # Справочный контент агентов: одна выборка всех строк при старте
+        static_content_cache.get('ai_abitur', 'admission_info')
+        sample = "Как подать документы на поступление и заселиться в общежитие?"
+        self.keyword_matcher.first_match(sample)
+        intent_classifier.classify_intent(sample, 'ru')
+        for agent in self.agents:
+            agent.get_system_prompt('ru')
+            try:
+                snapshot = knowledge_cache.get_snapshot(agent.agent_type)
+            except SQLAlchemyError as e:
+                logger.warning(f"Knowledge warm-up skipped for {agent.agent_type}: {e}")
+                continue
+            # Профили записей строятся при первом поиске по каждому языку
+            for language in ('ru', 'kz'):
+                semantic_search_engine.semantic_search(sample, snapshot.entries, language)
+                knowledge_search_engine.search_knowledge_base(sample, snapshot.entries, language)
+        logger.info("AgentRouter warmed up")
+
     def get_available_agents(self) -> List[Dict[str, str]]:
         return [{'type': a.agent_type, 'name': a.name, 'description': a.description} for a in self.agents]
\ No newline at end of file
@@ -10,13 +10,19 @@ import logging
 import json
 import time
 from typing import Dict, List, Optional, Any
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, namedtuple
 from datetime import datetime, timedelta
 import random
 import statistics
 
 logger = logging.getLogger(__name__)
 
+# Компактная запись производительности агента (кортеж без __dict__ на каждую запись)
+PerformanceSample = namedtuple(
+    'PerformanceSample',
+    ['confidence', 'response_time', 'cached', 'context_confidence', 'timestamp']
+)
+
 
 class AnalyticsEngine:
     """Comprehensive analytics and learning system"""
@@ -71,13 +77,16 @@ class AnalyticsEngine:
         # Update agent performance metrics
         agent_type = interaction['agent_type']
         if agent_type:
-            self.agent_performance[agent_type].append({
-                'confidence': interaction['confidence'],
-                'response_time': interaction['response_time'],
-                'cached': interaction['cached'],
-                'context_confidence': interaction['context_confidence'],
-                'timestamp': interaction['timestamp']
-            })
+            performance = self.agent_performance[agent_type]
+            performance.append(PerformanceSample(
+                interaction['confidence'],
+                interaction['response_time'],
+                interaction['cached'],
+                interaction['context_confidence'],
+                interaction['timestamp']
+            ))
+            if len(performance) > 10000:
+                del performance[:-8000]  # Keep recent 8000
         
         # Track response times
         if interaction['response_time'] > 0:
@@ -128,6 +137,50 @@ class AnalyticsEngine:
         if not recent_interactions:
             return {'error': 'No data available for the specified criteria'}
         
+        return self._summarize_interactions(
+            recent_interactions, self._count_recent_errors(cutoff_time), time_window_hours
+        )
+    
+    def get_performance_metrics_bulk(self, agent_types: Optional[List[str]] = None,
+                                     time_window_hours: int = 24) -> Dict[str, Dict[str, Any]]:
+        """
+        Performance metrics for several agents from one pass over history
+        
+        Args:
+            agent_types: Agents to report (None for every agent seen in the window)
+            time_window_hours: Time window in hours
+        
+        Returns:
+            Dict agent_type -> same structure as get_performance_metrics(agent_type)
+        """
+        cutoff_time = time.time() - (time_window_hours * 3600)
+        
+        by_agent = defaultdict(list)
+        for interaction in self.interaction_history:
+            if interaction['timestamp'] >= cutoff_time and interaction['agent_type']:
+                by_agent[interaction['agent_type']].append(interaction)
+        
+        error_count = self._count_recent_errors(cutoff_time)
+        no_data = {'error': 'No data available for the specified criteria'}
+        return {
+            agent_type: (
+                self._summarize_interactions(by_agent[agent_type], error_count, time_window_hours)
+                if by_agent.get(agent_type) else dict(no_data)
+            )
+            for agent_type in (agent_types if agent_types is not None else list(by_agent))
+        }
+    
+    def _count_recent_errors(self, cutoff_time: float) -> int:
+        """Number of tracked errors newer than cutoff_time"""
+        return sum(
+            1 for error_list in self.error_tracking.values()
+            for e in error_list
+            if e['timestamp'] >= cutoff_time
+        )
+    
+    def _summarize_interactions(self, recent_interactions: List[Dict[str, Any]],
+                                error_count: int, time_window_hours: int) -> Dict[str, Any]:
+        """Aggregate metrics over a non-empty list of interactions"""
         # Calculate metrics
         total_interactions = len(recent_interactions)
         
@@ -157,12 +210,7 @@ class AnalyticsEngine:
         satisfaction_count = len(ratings)
         
         # Error rate calculation
-        recent_errors = [
-            e for error_list in self.error_tracking.values() 
-            for e in error_list 
-            if e['timestamp'] >= cutoff_time
-        ]
-        error_rate = len(recent_errors) / total_interactions if total_interactions > 0 else 0
+        error_rate = error_count / total_interactions if total_interactions > 0 else 0
         
         # Agent distribution
         agent_distribution = Counter(i['agent_type'] for i in recent_interactions if i['agent_type'])
@@ -326,7 +374,7 @@ class AnalyticsEngine:
             return {'error': 'Insufficient data for learning analysis'}
         
         # Sort by timestamp
-        recent_performance.sort(key=lambda x: x['timestamp'])
+        recent_performance.sort(key=lambda x: x.timestamp)
         
         # Calculate trends over time
         time_windows = [7, 30, 90]  # days
@@ -335,11 +383,11 @@ class AnalyticsEngine:
         trends = {}
         for window in time_windows:
             cutoff = current_time - (window * 24 * 3600)
-            window_data = [p for p in recent_performance if p['timestamp'] >= cutoff]
+            window_data = [p for p in recent_performance if p.timestamp >= cutoff]
             
             if len(window_data) >= 2:
-                confidences = [p['confidence'] for p in window_data]
-                response_times = [p['response_time'] for p in window_data if p['response_time'] > 0]
+                confidences = [p.confidence for p in window_data]
+                response_times = [p.response_time for p in window_data if p.response_time > 0]
                 
                 trends[f'{window}d'] = {
                     'interactions': len(window_data),
@@ -382,7 +430,7 @@ class AnalyticsEngine:
         slope = numerator / denominator
         return slope
     
-    def _calculate_learning_score(self, agent_type: str, performance_data: List[Dict]) -> float:
+    def _calculate_learning_score(self, agent_type: str, performance_data: List[PerformanceSample]) -> float:
         """Calculate overall learning score for an agent"""
         if len(performance_data) < 10:
             return 0.5  # Neutral score for insufficient data
@@ -396,13 +444,13 @@ class AnalyticsEngine:
             return 0.5
         
         # Compare confidence improvements
-        recent_confidence = statistics.mean(p['confidence'] for p in recent_data)
-        historical_confidence = statistics.mean(p['confidence'] for p in historical_data)
+        recent_confidence = statistics.mean(p.confidence for p in recent_data)
+        historical_confidence = statistics.mean(p.confidence for p in historical_data)
         confidence_improvement = (recent_confidence - historical_confidence) / historical_confidence
         
         # Compare response time improvements (lower is better)
-        recent_response_times = [p['response_time'] for p in recent_data if p['response_time'] > 0]
-        historical_response_times = [p['response_time'] for p in historical_data if p['response_time'] > 0]
+        recent_response_times = [p.response_time for p in recent_data if p.response_time > 0]
+        historical_response_times = [p.response_time for p in historical_data if p.response_time > 0]
         
         response_time_improvement = 0
         if recent_response_times and historical_response_times:
@@ -416,7 +464,7 @@ class AnalyticsEngine:
         # Clamp to [0, 1] range
         return max(0.0, min(1.0, learning_score))
     
-    def _identify_improvement_areas(self, agent_type: str, performance_data: List[Dict]) -> List[str]:
+    def _identify_improvement_areas(self, agent_type: str, performance_data: List[PerformanceSample]) -> List[str]:
         """Identify areas where the agent needs improvement"""
         improvement_areas = []
         
@@ -427,26 +475,26 @@ class AnalyticsEngine:
         recent_data = performance_data[-50:]  # Last 50 interactions
         
         # Check confidence levels
-        confidences = [p['confidence'] for p in recent_data]
+        confidences = [p.confidence for p in recent_data]
         avg_confidence = statistics.mean(confidences)
         if avg_confidence < 0.7:
             improvement_areas.append("Low confidence in responses")
         
         # Check response times
-        response_times = [p['response_time'] for p in recent_data if p['response_time'] > 0]
+        response_times = [p.response_time for p in recent_data if p.response_time > 0]
         if response_times:
             avg_response_time = statistics.mean(response_times)
             if avg_response_time > self.benchmarks['response_time_target']:
                 improvement_areas.append("Slow response times")
         
         # Check context utilization
-        context_usage = sum(1 for p in recent_data if p.get('context_confidence', 0) > 0.5)
+        context_usage = sum(1 for p in recent_data if p.context_confidence > 0.5)
         context_usage_rate = context_usage / len(recent_data)
         if context_usage_rate < 0.3:
             improvement_areas.append("Low context utilization")
         
         # Check cache efficiency
-        cache_usage = sum(1 for p in recent_data if p.get('cached', False))
+        cache_usage = sum(1 for p in recent_data if p.cached)
         cache_rate = cache_usage / len(recent_data)
         if cache_rate < self.benchmarks['cache_hit_target']:
             improvement_areas.append("Low cache hit rate")
@@ -461,9 +509,10 @@ class AnalyticsEngine:
         # Analyze each agent
         agent_insights = {}
         agent_types = set(i['agent_type'] for i in self.interaction_history if i['agent_type'])
+        bulk_metrics = self.get_performance_metrics_bulk(list(agent_types), time_window_hours=168)
         
         for agent_type in agent_types:
-            agent_metrics = self.get_performance_metrics(agent_type, time_window_hours=168)
+            agent_metrics = bulk_metrics[agent_type]
             learning_analysis = self.analyze_learning_progress(agent_type)
             
             agent_insights[agent_type] = {
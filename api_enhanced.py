@@ -3,17 +3,25 @@ Enhanced API endpoints for AI-SANA system
 Provides specific functionality for each agent type
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, abort, current_app, make_response, request, jsonify, session
 from werkzeug.utils import secure_filename
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from functools import wraps
+from sqlalchemy import select
 
 from enhanced_agents import (
     AIAbiturEnhanced, KadrAIEnhanced, UniNavEnhanced, 
     CareerNavigatorEnhanced, UniRoomEnhanced
 )
 from models import db, StudentRequest, DocumentTemplate, Schedule, JobPosting, HousingRoom
+from request_tracking_cache import request_tracking_cache
+from static_content_cache import static_content_cache
+from template_cache import template_cache
 
 logger = logging.getLogger(__name__)
 
@@ -27,12 +35,70 @@ uninav_enhanced = UniNavEnhanced()
 career_enhanced = CareerNavigatorEnhanced()
 uniroom_enhanced = UniRoomEnhanced()
 
+# Верхняя граница тела JSON-запроса (анкеты, резюме); больше - 413 без разбора
+MAX_JSON_BODY_SIZE = 1_000_000
+
+@api_enhanced.before_request
+def limit_json_body():
+    if request.is_json and (request.content_length or 0) > MAX_JSON_BODY_SIZE:
+        abort(413)
+
 # Helper function to get language from request
 def get_language():
     return request.args.get('lang', session.get('language', 'ru'))
 
+def conditional_get(max_age: int = 60):
+    """Add a weak ETag (content hash unless the view set one) and answer 304 when it matches"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                if response.status_code == 200 and not response.get_etag()[0]:
+                    response.add_etag(weak=True)
+                response.cache_control.private = True
+                response.cache_control.max_age = max_age
+                response.make_conditional(request)
+            return response
+        return wrapper
+    return decorator
+
+# Кэш ответов статических GET-эндпоинтов: (путь, язык, аргументы) -> (expires_at, тело, mimetype)
+_response_cache: OrderedDict = OrderedDict()
+_response_cache_lock = threading.Lock()
+RESPONSE_CACHE_SIZE = 512
+
+@static_content_cache.on_invalidate
+def clear_response_cache():
+    """Drop cached responses: admission and faculty endpoints embed static content"""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+def cached_get(timeout: int = 600):
+    """Cache successful responses of read-only endpoints per path, language and query args"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, get_language(), tuple(sorted(request.args.items(multi=True))))
+            with _response_cache_lock:
+                cached = _response_cache.get(key)
+                if cached is not None and cached[0] > time.time():
+                    _response_cache.move_to_end(key)
+                    return current_app.response_class(cached[1], mimetype=cached[2])
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                with _response_cache_lock:
+                    _response_cache[key] = (time.time() + timeout, response.get_data(), response.mimetype)
+                    if len(_response_cache) > RESPONSE_CACHE_SIZE:
+                        _response_cache.popitem(last=False)
+            return response
+        return wrapper
+    return decorator
+
 # AI-Abitur Enhanced Endpoints
 @api_enhanced.route('/abitur/admission-info', methods=['GET'])
+@cached_get(timeout=600)
 def get_admission_info():
     """Get comprehensive admission information"""
     try:
@@ -77,6 +143,7 @@ def get_program_requirements(program_name):
 
 # KadrAI Enhanced Endpoints
 @api_enhanced.route('/kadrai/procedures', methods=['GET'])
+@cached_get(timeout=600)
 def get_hr_procedures():
     """Get HR procedures and regulations"""
     try:
@@ -147,6 +214,7 @@ def get_exam_schedule():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api_enhanced.route('/uninav/faculty-info', methods=['GET'])
+@cached_get(timeout=600)
 def get_faculty_info():
     """Get faculty and instructor information"""
     try:
@@ -178,8 +246,15 @@ def search_jobs():
         skills = request.args.getlist('skills')
         location = request.args.get('location')
         job_type = request.args.get('job_type')
+        # Keyset-пагинация: created_at и id последней вакансии предыдущей страницы
+        before = request.args.get('before')
+        try:
+            before = datetime.fromisoformat(before) if before else None
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid before cursor'}), 400
+        before_id = request.args.get('before_id', type=int)
         
-        jobs = career_enhanced.search_jobs(skills, location, job_type, language)
+        jobs = career_enhanced.search_jobs(skills, location, job_type, language, before, before_id)
         return jsonify({'success': True, 'data': jobs})
     except Exception as e:
         logger.error(f"Error searching jobs: {e}")
@@ -210,6 +285,7 @@ def create_resume_template():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api_enhanced.route('/career/interview-tips', methods=['GET'])
+@cached_get(timeout=600)
 def get_interview_tips():
     """Get interview preparation tips"""
     try:
@@ -246,6 +322,8 @@ def submit_housing_request():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api_enhanced.route('/uniroom/rules', methods=['GET'])
+@conditional_get(max_age=60)
+@cached_get(timeout=600)
 def get_housing_rules():
     """Get dormitory rules and regulations"""
     try:
@@ -285,7 +363,14 @@ def get_maintenance_schedule():
 def track_request(request_id):
     """Track any type of request by ID"""
     try:
-        request_obj = StudentRequest.query.filter_by(request_id=request_id).first()
+        data = request_tracking_cache.get(request_id)
+        if data is not None:
+            return jsonify({'success': True, 'data': data})
+        
+        # request_id is unique (indexed), not the primary key
+        request_obj = db.session.execute(
+            select(StudentRequest).where(StudentRequest.request_id == request_id)
+        ).scalar_one_or_none()
         if not request_obj:
             return jsonify({'success': False, 'error': 'Request not found'}), 404
         
@@ -295,19 +380,20 @@ def track_request(request_id):
             'type': request_obj.request_type,
             'category': request_obj.category,
             'status': request_obj.status,
-            'submitted_at': request_obj.submitted_at.strftime('%Y-%m-%d %H:%M'),
-            'updated_at': request_obj.updated_at.strftime('%Y-%m-%d %H:%M'),
+            'submitted_at': request_obj.submitted_at.isoformat(sep=' ', timespec='minutes'),
+            'updated_at': request_obj.updated_at.isoformat(sep=' ', timespec='minutes'),
             'assigned_to': request_obj.assigned_to,
             'processing_notes': request_obj.processing_notes,
             'priority': request_obj.priority
         }
         
         if request_obj.due_date:
-            data['due_date'] = request_obj.due_date.strftime('%Y-%m-%d')
+            data['due_date'] = request_obj.due_date.date().isoformat()
         
         if request_obj.completed_at:
-            data['completed_at'] = request_obj.completed_at.strftime('%Y-%m-%d %H:%M')
+            data['completed_at'] = request_obj.completed_at.isoformat(sep=' ', timespec='minutes')
         
+        request_tracking_cache.set(request_id, data)
         return jsonify({'success': True, 'data': data})
         
     except Exception as e:
@@ -330,21 +416,26 @@ def get_my_requests():
         if student_id:
             query = query.filter_by(student_id=student_id)
         
-        requests = query.order_by(StudentRequest.created_at.desc()).limit(20).all()
+        # StudentRequest has no created_at; submitted_at is its creation time
+        rows = query.with_entities(
+            StudentRequest.request_id, StudentRequest.title, StudentRequest.request_type,
+            StudentRequest.category, StudentRequest.status, StudentRequest.submitted_at,
+            StudentRequest.assigned_to, StudentRequest.priority
+        ).order_by(StudentRequest.submitted_at.desc()).limit(20).all()
         
-        data = []
-        for req in requests:
-            item = {
-                'request_id': req.request_id,
-                'title': req.title,
-                'type': req.request_type,
-                'category': req.category,
-                'status': req.status,
-                'submitted_at': req.submitted_at.strftime('%Y-%m-%d %H:%M'),
-                'assigned_to': req.assigned_to,
-                'priority': req.priority
+        data = [
+            {
+                'request_id': request_id,
+                'title': title,
+                'type': request_type,
+                'category': category,
+                'status': status,
+                'submitted_at': submitted_at.isoformat(sep=' ', timespec='minutes'),
+                'assigned_to': assigned_to,
+                'priority': priority
             }
-            data.append(item)
+            for request_id, title, request_type, category, status, submitted_at, assigned_to, priority in rows
+        ]
         
         return jsonify({'success': True, 'data': data})
         
@@ -354,26 +445,12 @@ def get_my_requests():
 
 # Document template endpoints
 @api_enhanced.route('/templates/<agent_type>', methods=['GET'])
+@conditional_get(max_age=60)
 def get_agent_templates(agent_type):
     """Get templates for specific agent"""
     try:
         language = get_language()
-        templates = DocumentTemplate.query.filter_by(
-            agent_type=agent_type,
-            is_active=True
-        ).all()
-        
-        data = []
-        for template in templates:
-            item = {
-                'id': template.id,
-                'name': template.get_name(language),
-                'category': template.category,
-                'instructions': template.get_instructions(language),
-                'required_fields': template.required_fields,
-                'file_path': template.file_path
-            }
-            data.append(item)
+        data = template_cache.get_templates(agent_type, language)
         
         return jsonify({'success': True, 'data': data})
         
@@ -382,6 +459,7 @@ def get_agent_templates(agent_type):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api_enhanced.route('/templates/<int:template_id>/content', methods=['GET'])
+@conditional_get(max_age=60)
 def get_template_content(template_id):
     """Get template content for filling"""
     try:
@@ -390,6 +468,15 @@ def get_template_content(template_id):
             return jsonify({'success': False, 'error': 'Template not found'}), 404
         
         language = get_language()
+        
+        # Версия шаблона по времени изменения: без сериализации, если клиент уже её видел
+        modified = template.updated_at or template.created_at
+        etag = f"{template.id}-{modified.timestamp():.0f}-{language}" if modified else None
+        if etag and request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+            response.set_etag(etag, weak=True)
+            return response
+        
         data = {
             'id': template.id,
             'name': template.get_name(language),
@@ -398,7 +485,11 @@ def get_template_content(template_id):
             'instructions': template.get_instructions(language)
         }
         
-        return jsonify({'success': True, 'data': data})
+        response = jsonify({'success': True, 'data': data})
+        if etag:
+            response.set_etag(etag, weak=True)
+            response.last_modified = modified
+        return response
         
     except Exception as e:
         logger.error(f"Error getting template content: {e}")
@@ -409,24 +500,28 @@ def get_template_content(template_id):
 def get_request_stats():
     """Get request statistics"""
     try:
-        # Basic statistics
-        total_requests = StudentRequest.query.count()
-        pending_requests = StudentRequest.query.filter(
-            StudentRequest.status.in_(['submitted', 'in_progress'])
-        ).count()
-        completed_requests = StudentRequest.query.filter_by(status='completed').count()
-        
-        # Requests by type
-        request_types = db.session.query(
+        # One grouped query instead of separate counts
+        rows = db.session.query(
+            StudentRequest.status,
             StudentRequest.request_type,
-            db.func.count(StudentRequest.id).label('count')
-        ).group_by(StudentRequest.request_type).all()
+            db.func.count(StudentRequest.id)
+        ).group_by(StudentRequest.status, StudentRequest.request_type).all()
+        
+        total_requests = pending_requests = completed_requests = 0
+        by_type = {}
+        for status, request_type, count in rows:
+            total_requests += count
+            if status in ('submitted', 'in_progress'):
+                pending_requests += count
+            elif status == 'completed':
+                completed_requests += count
+            by_type[request_type] = by_type.get(request_type, 0) + count
         
         data = {
             'total_requests': total_requests,
             'pending_requests': pending_requests,
             'completed_requests': completed_requests,
-            'by_type': {rt[0]: rt[1] for rt in request_types}
+            'by_type': by_type
         }
         
         return jsonify({'success': True, 'data': data})
@@ -444,6 +539,10 @@ def bad_request(error):
 def not_found(error):
     return jsonify({'success': False, 'error': 'Resource not found'}), 404
 
+@api_enhanced.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({'success': False, 'error': 'Request body too large'}), 413
+
 @api_enhanced.errorhandler(500)
 def internal_error(error):
     return jsonify({'success': False, 'error': 'Internal server error'}), 500
\ No newline at end of file
@@ -57,10 +57,17 @@ def create_app():
     # Настройки движка базы данных в зависимости от типа БД
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = DatabaseConfig.get_engine_options()
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Без записи каждого запроса к БД (инструментирование только для отладки)
+    app.config["SQLALCHEMY_RECORD_QUERIES"] = False
 
     # Инициализация базы данных с приложением
     db.init_app(app)
 
+    # Быстрая сериализация JSON-ответов, если установлен orjson
+    from json_provider import OrjsonProvider, orjson
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
     # Настройка CORS (разрешение кросс-доменных запросов)
     CORS(
         app,
@@ -101,6 +108,15 @@ def create_app():
         # Создание всех таблиц в базе данных
         db.create_all()
 
+        # Прогрев роутера агентов, чтобы первый запрос не платил за инициализацию
+        from config import AgentConfig
+        if AgentConfig.PREWARM_AGENTS:
+            try:
+                from views import initialize_agent_router
+                initialize_agent_router().warm_up()
+            except Exception as e:
+                logging.error(f"Agent router warm-up failed: {e}")
+
         # Инициализация начальных данных с задержкой
         # Commented out for now to avoid circular imports
         # try:
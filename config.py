@@ -20,6 +20,12 @@ class DatabaseConfig:
     POSTGRES_USER = os.environ.get('POSTGRES_USER', os.environ.get('PGUSER', 'postgres'))
     POSTGRES_PASSWORD = os.environ.get('POSTGRES_PASSWORD', os.environ.get('PGPASSWORD', ''))
     
+    # Connection pool settings (PostgreSQL/MySQL)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '20'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '300'))  # Переподключение каждые 5 минут
+    
     # MySQL settings
     MYSQL_HOST = os.environ.get('MYSQL_HOST', 'localhost')
     MYSQL_PORT = os.environ.get('MYSQL_PORT', '3306')
@@ -67,32 +73,30 @@ class DatabaseConfig:
     def get_engine_options(cls) -> Dict[str, Any]:
         """Get database engine options based on database type"""
         base_options = {
-            "pool_recycle": 300,  # Переподключение каждые 5 минут
+            "pool_recycle": cls.DB_POOL_RECYCLE,
             "pool_pre_ping": True,  # Проверка соединения перед использованием
         }
+        pool_options = {
+            "pool_size": cls.DB_POOL_SIZE,
+            "max_overflow": cls.DB_MAX_OVERFLOW,
+            "pool_timeout": cls.DB_POOL_TIMEOUT,
+        }
         
         if cls.DB_TYPE == 'postgresql':
             # Different options for psycopg2 vs pg8000
             try:
                 import psycopg2
-                return {
-                    **base_options,
-                    "pool_size": 5,
-                    "max_overflow": 10,
-                    "pool_timeout": 30,
-                }
+                return {**base_options, **pool_options}
             except ImportError:
                 # pg8000 works better with simpler pool settings
                 return {
                     "pool_pre_ping": True,
-                    "pool_recycle": 300,
+                    "pool_recycle": cls.DB_POOL_RECYCLE,
                 }
         elif cls.DB_TYPE == 'mysql':
             return {
                 **base_options,
-                "pool_size": 5,
-                "max_overflow": 10,
-                "pool_timeout": 30,
+                **pool_options,
                 "connect_args": {"charset": "utf8mb4"}
             }
         else:  # SQLite
@@ -107,10 +111,20 @@ class AgentConfig:
     # Agent knowledge base settings
     AGENT_KNOWLEDGE_ENABLED = os.environ.get('AGENT_KNOWLEDGE_ENABLED', 'true').lower() == 'true'
     DEFAULT_AGENT_PRIORITY = int(os.environ.get('DEFAULT_AGENT_PRIORITY', '1'))
+    KNOWLEDGE_CACHE_TTL = int(os.environ.get('KNOWLEDGE_CACHE_TTL', '300'))  # 5 minutes
+    TEMPLATE_CACHE_TTL = int(os.environ.get('TEMPLATE_CACHE_TTL', '600'))  # 10 minutes
+    STATIC_CONTENT_CACHE_TTL = int(os.environ.get('STATIC_CONTENT_CACHE_TTL', '600'))  # 10 minutes
+    # Создавать и прогревать роутер агентов при старте приложения
+    PREWARM_AGENTS = os.environ.get('PREWARM_AGENTS', 'true').lower() == 'true'
+    # PostgreSQL: подтверждать заявки студентов, не дожидаясь fsync WAL (synchronous_commit=off).
+    # Выключено по умолчанию: при сбое сервера последние заявки могут потеряться
+    ASYNC_REQUEST_COMMIT = os.environ.get('ASYNC_REQUEST_COMMIT', 'false').lower() == 'true'
     
     # Agent response settings
     MAX_RESPONSE_LENGTH = int(os.environ.get('MAX_RESPONSE_LENGTH', '2000'))
     DEFAULT_CONFIDENCE_THRESHOLD = float(os.environ.get('DEFAULT_CONFIDENCE_THRESHOLD', '0.3'))
+    # Ниже этого порога (нет совпадений по ключевым словам) просим уточнить вопрос без вызова LLM
+    CLARIFY_THRESHOLD = float(os.environ.get('CLARIFY_THRESHOLD', '0.5'))
     
     # Available agent types with their display names
     AGENT_TYPES = {
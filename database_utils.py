@@ -1,8 +1,10 @@
 # Утилиты для работы с базой данных
 # Database utilities for BolashakChat
 
+import io
 import logging
 import os
+import sys
 from typing import Optional, Dict, Any
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
@@ -142,7 +144,10 @@ if __name__ == "__main__":
     
     manager = DatabaseManager()
     
-    print("=== Database Configuration Info ===")
+    # Вывод собирается в буфер и пишется одним вызовом на секцию
+    buf = io.StringIO()
+    
+    buf.write("=== Database Configuration Info ===\n")
     info = manager.get_database_info()
     for key, value in info.items():
         if key == 'url' and '@' in str(value):
@@ -151,18 +156,22 @@ if __name__ == "__main__":
             if ':' in parts[0]:
                 user_pass = parts[0].split(':')
                 safe_value = f"{user_pass[0]}:***@{parts[1]}"
-                print(f"{key}: {safe_value}")
+                buf.write(f"{key}: {safe_value}\n")
             else:
-                print(f"{key}: {value}")
+                buf.write(f"{key}: {value}\n")
         else:
-            print(f"{key}: {value}")
+            buf.write(f"{key}: {value}\n")
+    sys.stdout.write(buf.getvalue())
+    buf.seek(0)
+    buf.truncate(0)
     
-    print("\n=== Testing Database Connections ===")
+    buf.write("\n=== Testing Database Connections ===\n")
     results = test_all_databases()
     for db_type, success in results.items():
         status = "✓ SUCCESS" if success else "✗ FAILED"
-        print(f"{db_type.upper()}: {status}")
+        buf.write(f"{db_type.upper()}: {status}\n")
     
-    print(f"\nCurrent database type: {DatabaseConfig.DB_TYPE}")
+    buf.write(f"\nCurrent database type: {DatabaseConfig.DB_TYPE}\n")
     current_status = "✓ SUCCESS" if manager.test_connection() else "✗ FAILED"
-    print(f"Current connection: {current_status}")
\ No newline at end of file
+    buf.write(f"Current connection: {current_status}\n")
+    sys.stdout.write(buf.getvalue())
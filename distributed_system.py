@@ -6,6 +6,7 @@ This module provides enhanced caching with Redis support and
 asynchronous processing capabilities for better scalability.
 """
 
+import atexit
 import logging
 import asyncio
 import json
@@ -13,7 +14,7 @@ import time
 import threading
 from typing import Dict, List, Optional, Any, Callable
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue, Empty
+from queue import Queue, Empty, Full
 import hashlib
 
 logger = logging.getLogger(__name__)
@@ -326,6 +327,109 @@ class AsyncTaskProcessor:
         logger.info("Async task processor shutdown")
 
 
+class TelemetryBus:
+    """
+    Bounded background queue for fire-and-forget side effects (analytics,
+    personalization updates) so they do not delay the user's response
+    """
+    
+    def __init__(self, maxsize: int = 10000, batch_size: int = 100, batch_wait: float = 0.05):
+        """
+        Initialize telemetry bus
+        
+        Args:
+            maxsize: Queue capacity; when full the oldest event is dropped
+            batch_size: Maximum events handled per worker wake-up
+            batch_wait: Seconds to wait for more events before handling a batch
+        """
+        self.queue = Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.stats = {
+            'published': 0,
+            'dispatched': 0,
+            'dropped': 0,
+            'failed': 0
+        }
+        
+        # Start background worker
+        self.worker_thread = threading.Thread(target=self._run, daemon=True)
+        self.worker_thread.start()
+        
+        logger.info(f"Telemetry bus initialized (capacity {maxsize})")
+    
+    def publish(self, handler: Callable, *args, **kwargs) -> bool:
+        """
+        Queue handler(*args, **kwargs) for background execution
+        
+        Returns:
+            False if the event had to be dropped
+        """
+        event = (handler, args, kwargs)
+        try:
+            self.queue.put_nowait(event)
+        except Full:
+            # Drop oldest event to make room for the new one
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.stats['dropped'] += 1
+                self.queue.put_nowait(event)
+            except (Empty, Full):
+                self.stats['dropped'] += 1
+                return False
+        
+        self.stats['published'] += 1
+        return True
+    
+    def _run(self):
+        """Background worker: handle queued events in small batches"""
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except Empty:
+                    break
+            
+            for handler, args, kwargs in batch:
+                try:
+                    handler(*args, **kwargs)
+                    self.stats['dispatched'] += 1
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    logger.error(f"Telemetry handler error: {e}")
+                finally:
+                    self.queue.task_done()
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until all queued events are handled
+        
+        Returns:
+            True if the queue was drained within timeout
+        """
+        end_time = time.time() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = end_time - time.time()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get bus statistics"""
+        return {
+            'queue_size': self.queue.qsize(),
+            'statistics': self.stats.copy()
+        }
+
+
 class PerformanceOptimizer:
     """Performance optimization coordinator"""
     
@@ -426,7 +530,7 @@ class PerformanceOptimizer:
         
         # Create hash for key
         key_data = f"{normalized_message}:{agent_type}:{language}"
-        key_hash = hashlib.md5(key_data.encode('utf-8')).hexdigest()[:12]
+        key_hash = hashlib.blake2b(key_data.encode('utf-8'), digest_size=20).hexdigest()
         
         return f"optimized:{key_hash}:{agent_type}:{language}"
     
@@ -525,4 +629,8 @@ class PerformanceOptimizer:
 # Global instances
 distributed_cache = DistributedCache()
 async_processor = AsyncTaskProcessor(max_workers=4)
-performance_optimizer = PerformanceOptimizer(distributed_cache, async_processor)
\ No newline at end of file
+performance_optimizer = PerformanceOptimizer(distributed_cache, async_processor)
+telemetry_bus = TelemetryBus()
+
+# Drain pending telemetry on interpreter shutdown
+atexit.register(telemetry_bus.flush)
\ No newline at end of file
@@ -3,42 +3,333 @@ Enhanced agent functionalities for AI-SANA system
 Implements specific capabilities for each agent type as described in requirements
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
 from datetime import datetime, timedelta
+import heapq
 import json
 import logging
+import math
+
+from flask import g, has_app_context
+from sqlalchemy import and_, func, insert, or_, text
 
 from models import (
-    db, DocumentTemplate, StudentRequest, Schedule, JobPosting, 
+    db, StudentRequest, Schedule, JobPosting, 
     HousingRoom, HousingAssignment, Notification, FAQ, AgentKnowledgeBase
 )
+from config import AgentConfig
+from static_content_cache import static_content_cache
+from template_cache import template_cache
 
 logger = logging.getLogger(__name__)
 
+# Справочные данные агентов: неизменяемые, собираются один раз при импорте и
+# отдаются всем вызовам без копирования (списки - кортежи; не изменять).
+# Часть из них переопределяется таблицей agent_static_content (static_content_cache)
+
+ADMISSION_INFO = {
+    'contact_info': {
+        'phone': '+7 (7242) 123-457',
+        'email': 'admission@bolashak.kz',
+        'address': 'г. Кызылорда, ул. Университетская, 1',
+        'working_hours': 'Пн-Пт 9:00-18:00'
+    },
+    'important_dates': (
+        {'date': '2024-06-01', 'event': 'Начало приема документов'},
+        {'date': '2024-07-15', 'event': 'Окончание приема документов'},
+        {'date': '2024-08-01', 'event': 'Публикация результатов'},
+        {'date': '2024-08-20', 'event': 'Начало учебного года'}
+    ),
+    'required_documents': (
+        'Аттестат о среднем образовании',
+        'Справка о состоянии здоровья',
+        'Фотографии 3x4 (6 шт)',
+        'Копия удостоверения личности',
+        'Результаты ЕНТ'
+    ),
+    'faculties': (
+        {'name': 'Естественно-технических наук', 'programs': 15},
+        {'name': 'Гуманитарный', 'programs': 12},
+        {'name': 'Экономический', 'programs': 8},
+        {'name': 'Педагогический', 'programs': 10}
+    )
+}
+
+PROGRAM_REQUIREMENTS = {
+    'информационные технологии': {
+        'min_ent_score': 75,
+        'required_subjects': ('Математика', 'Физика', 'Информатика'),
+        'duration': '4 года',
+        'language': 'Казахский/Русский',
+        'tuition_fee': '400,000 тенге/год'
+    },
+    'экономика': {
+        'min_ent_score': 70,
+        'required_subjects': ('Математика', 'Обществознание', 'История'),
+        'duration': '4 года',
+        'language': 'Казахский/Русский',
+        'tuition_fee': '350,000 тенге/год'
+    }
+}
+
+HR_PROCEDURES = {
+    'vacation_policy': {
+        'annual_days': 28,
+        'advance_notice': '14 дней',
+        'approval_process': 'Подача заявления → Согласование с руководителем → Приказ',
+        'carryover_limit': '7 дней'
+    },
+    'transfer_procedures': {
+        'internal_transfer': 'Заявление + согласие принимающего подразделения',
+        'external_transfer': 'Заявление + справка с нового места работы',
+        'processing_time': '10 рабочих дней'
+    },
+    'salary_info': {
+        'payment_date': '15 число каждого месяца',
+        'bonus_periods': ('Новый год', 'День университета', 'По итогам года'),
+        'salary_review': 'Ежегодно в сентябре'
+    }
+}
+
+FACULTIES = {
+    'естественно-технических наук': {
+        'dean': 'Сидоров С.С.',
+        'dean_email': 'siidorov@bolashak.kz',
+        'office': 'Главный корпус, каб. 301',
+        'phone': '+7 (7242) 123-461',
+        'departments': (
+            'Кафедра математики и информатики',
+            'Кафедра физики и техники',
+            'Кафедра химии и биологии'
+        )
+    },
+    'гуманитарный': {
+        'dean': 'Жанбосынова А.К.',
+        'dean_email': 'zhanbosynova@bolashak.kz',
+        'office': 'Главный корпус, каб. 201',
+        'phone': '+7 (7242) 123-462',
+        'departments': (
+            'Кафедра казахского языка и литературы',
+            'Кафедра истории и философии',
+            'Кафедра иностранных языков'
+        )
+    }
+}
+
+FACULTY_LIST = {'faculties': tuple(FACULTIES)}
+
+RESUME_TEMPLATE = """
+# {name}
+
+## Контактная информация
+- Email: {email}
+- Телефон: {phone}
+- LinkedIn: {linkedin}
+
+## Образование
+**Кызылординский университет "Болашак"**
+- Факультет: {faculty}
+- Специальность: {major}
+- Год окончания: {graduation_year}
+
+## Навыки
+{skills}
+
+## Опыт работы
+[Опишите ваш опыт работы]
+
+## Проекты
+[Опишите ваши проекты]
+
+## Дополнительная информация
+[Языки, сертификаты, хобби]
+        """
+
+# Навык студента (в нижнем регистре) -> рекомендация по развитию
+SKILL_DEVELOPMENT = {
+    'python': {
+        'skill': 'Django/Flask',
+        'reason': 'Дополнит ваши знания Python для веб-разработки',
+        'resources': ('Онлайн курсы', 'Практические проекты')
+    }
+}
+
+TECH_CAREER_PATHS = (
+    'Системный администратор',
+    'Веб-разработчик',
+    'Инженер по данным',
+    'DevOps инженер'
+)
+
+INTERVIEW_TIPS = (
+    {
+        'category': 'Подготовка',
+        'tips': (
+            'Изучите компанию и должность',
+            'Подготовьте ответы на типичные вопросы',
+            'Подготовьте вопросы для интервьюера'
+        )
+    },
+    {
+        'category': 'Во время интервью',
+        'tips': (
+            'Приходите вовремя',
+            'Одевайтесь профессионально',
+            'Поддерживайте зрительный контакт',
+            'Будьте конкретными в ответах'
+        )
+    }
+)
+
+INTERNSHIP_INTERVIEW_TIPS = INTERVIEW_TIPS + ({
+    'category': 'Для стажировки',
+    'tips': (
+        'Подчеркните желание учиться',
+        'Покажите энтузиазм',
+        'Расскажите о проектах из университета'
+    )
+},)
+
+HOUSING_RULES = {
+    'general_rules': (
+        'Соблюдение тишины с 22:00 до 7:00',
+        'Запрет на курение в здании',
+        'Регистрация гостей в администрации',
+        'Содержание комнаты в чистоте'
+    ),
+    'payment_rules': {
+        'monthly_payment_date': '5 число каждого месяца',
+        'late_fee': '10% за каждый день просрочки',
+        'deposit_return': 'В течение 30 дней после выселения'
+    },
+    'maintenance_requests': {
+        'urgent_issues': 'Немедленно обратиться в администрацию',
+        'routine_maintenance': 'Подать заявку через систему',
+        'response_time': '24-48 часов'
+    },
+    'contact_info': {
+        'admin_office': 'Общежитие А, 1 этаж',
+        'phone': '+7 (7242) 123-459',
+        'emergency_phone': '+7 (7242) 123-999',
+        'working_hours': '8:00-20:00 ежедневно'
+    }
+}
+
+MAINTENANCE_SCHEDULE = (
+    {
+        'date': '2024-07-15',
+        'time': '10:00-16:00',
+        'type': 'Плановая проверка электропроводки',
+        'building': 'А',
+        'affected_floors': (1, 2, 3),
+        'contact': 'Технический отдел: +7 (7242) 123-460'
+    },
+    {
+        'date': '2024-07-20',
+        'time': '9:00-12:00',
+        'type': 'Ремонт системы отопления',
+        'building': 'Б',
+        'affected_floors': (2,),
+        'contact': 'Администрация общежития: +7 (7242) 123-459'
+    }
+)
+
+
+def _request_id(prefix: str) -> str:
+    """Human-readable request id: PREFIX-YYYYMMDDHHMMSS (без strftime)"""
+    now = datetime.now()
+    return (f"{prefix}-{now.year:04d}{now.month:02d}{now.day:02d}"
+            f"{now.hour:02d}{now.minute:02d}{now.second:02d}")
+
+
+def _request_cache(key: Hashable, loader: Callable[[], List[Dict]]) -> List[Dict]:
+    """
+    Memoize loader result for the current request (flask.g)
+    
+    Outside of an application context the loader is called directly.
+    """
+    if not has_app_context():
+        return loader()
+    cache = g.setdefault('_agent_cache', {})
+    result = cache.get(key)
+    if result is None:
+        result = cache[key] = loader()
+    return list(result)
+
+
 class AgentEnhancedFunctionality:
     """Base class for enhanced agent functionality"""
     
+    # Заявки агента (StudentRequest); задаются агентами, принимающими заявки
+    REQUEST_PREFIX = None
+    REQUEST_TYPE = None
+    REQUEST_ASSIGNED_TO = None
+    REQUEST_SUCCESS_MESSAGE = None
+    REQUEST_PROCESSING_TIME = None
+    
     def __init__(self, agent_type: str):
         self.agent_type = agent_type
     
     def get_templates(self, language: str = 'ru') -> List[Dict]:
-        """Get document templates for this agent"""
-        templates = DocumentTemplate.query.filter_by(
-            agent_type=self.agent_type, 
-            is_active=True
-        ).all()
-        
-        return [{
-            'id': t.id,
-            'name': t.get_name(language),
-            'category': t.category,
-            'instructions': t.get_instructions(language),
-            'required_fields': t.required_fields,
-            'file_path': t.file_path
-        } for t in templates]
+        """Get document templates for this agent (process-wide cache, then per request)"""
+        return _request_cache(
+            ('tpl', self.agent_type, language),
+            lambda: template_cache.get_templates(self.agent_type, language)
+        )
     
     def search_knowledge_base(self, query: str, language: str = 'ru', limit: int = 5) -> List[Dict]:
-        """Search agent-specific knowledge base"""
+        """Search agent-specific knowledge base (results are reused within a request)"""
+        return _request_cache(
+            ('kb', self.agent_type, query.lower(), language, limit),
+            lambda: self._search_knowledge_base(query, language, limit)
+        )
+    
+    def _request_row(self, request_data: Dict) -> Dict:
+        """StudentRequest column values for a submitted request"""
+        return {
+            'student_id': request_data.get('student_id'),
+            'student_name': request_data.get('student_name'),
+            'student_email': request_data.get('email'),
+            'category': request_data.get('request_type'),
+            'title': request_data.get('title'),
+            'description': request_data.get('description')
+        }
+    
+    def _submit_request(self, request_data: Dict) -> Dict:
+        """Submit a single request of this agent"""
+        try:
+            request_id = _request_id(self.REQUEST_PREFIX)
+            row = {
+                **self._request_row(request_data),
+                'request_id': request_id,
+                'request_type': self.REQUEST_TYPE,
+                'status': 'submitted',
+                'assigned_to': self.REQUEST_ASSIGNED_TO
+            }
+            
+            if AgentConfig.ASYNC_REQUEST_COMMIT and db.engine.dialect.name == 'postgresql':
+                # Не ждать fsync WAL: при сбое сервера теряются только последние
+                # мгновения заявок, целостность базы не нарушается
+                db.session.execute(text("SET LOCAL synchronous_commit = off"))
+            db.session.execute(insert(StudentRequest).values(row))
+            db.session.commit()
+            
+            return {
+                'success': True,
+                'request_id': request_id,
+                'message': self.REQUEST_SUCCESS_MESSAGE,
+                'estimated_processing_time': self.REQUEST_PROCESSING_TIME
+            }
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error submitting {self.REQUEST_TYPE} request: {e}")
+            return {
+                'success': False,
+                'message': 'Ошибка при подаче заявки. Попробуйте позже.'
+            }
+    
+    def _search_knowledge_base(self, query: str, language: str, limit: int) -> List[Dict]:
+        """Query knowledge base entries whose keywords contain query"""
         knowledge = AgentKnowledgeBase.query.filter_by(
             agent_type=self.agent_type,
             is_active=True
@@ -61,33 +352,7 @@ class AIAbiturEnhanced(AgentEnhancedFunctionality):
     
     def get_admission_info(self, language: str = 'ru') -> Dict:
         """Get comprehensive admission information"""
-        return {
-            'contact_info': {
-                'phone': '+7 (7242) 123-457',
-                'email': 'admission@bolashak.kz',
-                'address': 'г. Кызылорда, ул. Университетская, 1',
-                'working_hours': 'Пн-Пт 9:00-18:00'
-            },
-            'important_dates': [
-                {'date': '2024-06-01', 'event': 'Начало приема документов'},
-                {'date': '2024-07-15', 'event': 'Окончание приема документов'},
-                {'date': '2024-08-01', 'event': 'Публикация результатов'},
-                {'date': '2024-08-20', 'event': 'Начало учебного года'}
-            ],
-            'required_documents': [
-                'Аттестат о среднем образовании',
-                'Справка о состоянии здоровья',
-                'Фотографии 3x4 (6 шт)',
-                'Копия удостоверения личности',
-                'Результаты ЕНТ'
-            ],
-            'faculties': [
-                {'name': 'Естественно-технических наук', 'programs': 15},
-                {'name': 'Гуманитарный', 'programs': 12},
-                {'name': 'Экономический', 'programs': 8},
-                {'name': 'Педагогический', 'programs': 10}
-            ]
-        }
+        return static_content_cache.get(self.agent_type, 'admission_info', language, ADMISSION_INFO)
     
     def get_application_templates(self, language: str = 'ru') -> List[Dict]:
         """Get admission-related document templates"""
@@ -108,54 +373,30 @@ class AIAbiturEnhanced(AgentEnhancedFunctionality):
     def get_program_requirements(self, program_name: str, language: str = 'ru') -> Dict:
         """Get specific program requirements"""
         # This would typically come from a database
-        programs = {
-            'информационные технологии': {
-                'min_ent_score': 75,
-                'required_subjects': ['Математика', 'Физика', 'Информатика'],
-                'duration': '4 года',
-                'language': 'Казахский/Русский',
-                'tuition_fee': '400,000 тенге/год'
-            },
-            'экономика': {
-                'min_ent_score': 70,
-                'required_subjects': ['Математика', 'Обществознание', 'История'],
-                'duration': '4 года',
-                'language': 'Казахский/Русский',
-                'tuition_fee': '350,000 тенге/год'
+        program_key = program_name.lower().strip()
+        programs = static_content_cache.get(self.agent_type, 'programs', language, PROGRAM_REQUIREMENTS)
+        requirements = programs.get(program_key)
+        if requirements is None:
+            return {
+                'message': f'Информация по программе "{program_name}" не найдена. Обратитесь в приемную комиссию.'
             }
-        }
-        
-        program_key = program_name.lower()
-        return programs.get(program_key, {
-            'message': f'Информация по программе "{program_name}" не найдена. Обратитесь в приемную комиссию.'
-        })
+        return requirements
 
 class KadrAIEnhanced(AgentEnhancedFunctionality):
     """Enhanced functionality for KadrAI agent"""
     
+    REQUEST_PREFIX = 'HR'
+    REQUEST_TYPE = 'hr'
+    REQUEST_ASSIGNED_TO = 'Отдел кадров'
+    REQUEST_SUCCESS_MESSAGE = 'Заявка успешно подана'
+    REQUEST_PROCESSING_TIME = '3-5 рабочих дней'
+    
     def __init__(self):
         super().__init__('kadrai')
     
     def get_hr_procedures(self, language: str = 'ru') -> Dict:
         """Get HR procedures and regulations"""
-        return {
-            'vacation_policy': {
-                'annual_days': 28,
-                'advance_notice': '14 дней',
-                'approval_process': 'Подача заявления → Согласование с руководителем → Приказ',
-                'carryover_limit': '7 дней'
-            },
-            'transfer_procedures': {
-                'internal_transfer': 'Заявление + согласие принимающего подразделения',
-                'external_transfer': 'Заявление + справка с нового места работы',
-                'processing_time': '10 рабочих дней'
-            },
-            'salary_info': {
-                'payment_date': '15 число каждого месяца',
-                'bonus_periods': ['Новый год', 'День университета', 'По итогам года'],
-                'salary_review': 'Ежегодно в сентябре'
-            }
-        }
+        return HR_PROCEDURES
     
     def get_leave_calendar(self, department: str = None, language: str = 'ru') -> List[Dict]:
         """Get vacation/leave schedule"""
@@ -181,84 +422,80 @@ class KadrAIEnhanced(AgentEnhancedFunctionality):
     
     def submit_hr_request(self, request_data: Dict) -> Dict:
         """Submit HR-related request"""
-        try:
-            # Generate unique request ID
-            request_id = f"HR-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            
-            # Create request record
-            request = StudentRequest(
-                request_id=request_id,
-                student_name=request_data.get('employee_name'),
-                student_email=request_data.get('email'),
-                request_type='hr',
-                category=request_data.get('request_type'),
-                title=request_data.get('title'),
-                description=request_data.get('description'),
-                status='submitted',
-                assigned_to='Отдел кадров'
-            )
-            
-            db.session.add(request)
-            db.session.commit()
-            
-            return {
-                'success': True,
-                'request_id': request_id,
-                'message': 'Заявка успешно подана',
-                'estimated_processing_time': '3-5 рабочих дней'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error submitting HR request: {e}")
-            return {
-                'success': False,
-                'message': 'Ошибка при подаче заявки. Попробуйте позже.'
-            }
+        return self._submit_request(request_data)
+    
+    def _request_row(self, request_data: Dict) -> Dict:
+        """HR requests are filed by employees"""
+        return {
+            'student_name': request_data.get('employee_name'),
+            'student_email': request_data.get('email'),
+            'category': request_data.get('request_type'),
+            'title': request_data.get('title'),
+            'description': request_data.get('description')
+        }
 
 class UniNavEnhanced(AgentEnhancedFunctionality):
     """Enhanced functionality for UniNav agent"""
     
+    REQUEST_PREFIX = 'AC'
+    REQUEST_TYPE = 'academic'
+    REQUEST_ASSIGNED_TO = 'Деканат'
+    REQUEST_SUCCESS_MESSAGE = 'Заявка успешно подана в деканат'
+    REQUEST_PROCESSING_TIME = '5-7 рабочих дней'
+    
     def __init__(self):
         super().__init__('uninav')
     
-    def get_current_schedule(self, group: str = None, language: str = 'ru') -> List[Dict]:
-        """Get current class schedule"""
-        query = Schedule.query.filter_by(
-            schedule_type='class',
+    # Колонки, нужные для ответа: без description и других текстовых полей
+    SCHEDULE_COLUMNS = (
+        Schedule.title, Schedule.instructor, Schedule.start_time, Schedule.end_time,
+        Schedule.location, Schedule.room, Schedule.course_code, Schedule.group_name
+    )
+    
+    def _schedule_query(self, schedule_type: str):
+        """Active, not cancelled schedule rows of type, response columns only"""
+        return Schedule.query.with_entities(*self.SCHEDULE_COLUMNS).filter_by(
+            schedule_type=schedule_type,
             is_active=True,
             is_cancelled=False
         )
-        
-        if group:
-            query = query.filter_by(group_name=group)
-        
-        # Get schedule for current week
+    
+    def _current_week_query(self, query):
+        """Limit schedule query to the current week, ordered by start time"""
         today = datetime.now()
         week_start = today - timedelta(days=today.weekday())
         week_end = week_start + timedelta(days=6)
         
-        schedules = query.filter(
+        return query.filter(
             Schedule.start_time >= week_start,
             Schedule.start_time <= week_end
-        ).order_by(Schedule.start_time).all()
-        
-        return [{
+        ).order_by(Schedule.start_time)
+    
+    @staticmethod
+    def _format_class(s) -> Dict:
+        return {
             'title': s.title,
             'instructor': s.instructor,
-            'start_time': s.start_time.strftime('%Y-%m-%d %H:%M'),
-            'end_time': s.end_time.strftime('%Y-%m-%d %H:%M'),
+            'start_time': s.start_time.isoformat(sep=' ', timespec='minutes'),
+            'end_time': s.end_time.isoformat(sep=' ', timespec='minutes'),
             'location': f"{s.location}, ауд. {s.room}",
             'course_code': s.course_code,
             'group': s.group_name
-        } for s in schedules]
+        }
+    
+    def get_current_schedule(self, group: str = None, language: str = 'ru') -> List[Dict]:
+        """Get current class schedule"""
+        query = self._schedule_query('class')
+        
+        if group:
+            query = query.filter_by(group_name=group)
+        
+        # Get schedule for current week
+        return [self._format_class(s) for s in self._current_week_query(query)]
     
     def get_exam_schedule(self, group: str = None, language: str = 'ru') -> List[Dict]:
         """Get exam schedule"""
-        query = Schedule.query.filter_by(
-            schedule_type='exam',
-            is_active=True,
-            is_cancelled=False
-        )
+        query = self._schedule_query('exam')
         
         if group:
             query = query.filter_by(group_name=group)
@@ -272,8 +509,8 @@ class UniNavEnhanced(AgentEnhancedFunctionality):
         return [{
             'subject': s.title,
             'instructor': s.instructor,
-            'date': s.start_time.strftime('%Y-%m-%d'),
-            'time': f"{s.start_time.strftime('%H:%M')} - {s.end_time.strftime('%H:%M')}",
+            'date': s.start_time.date().isoformat(),
+            'time': f"{s.start_time.time().isoformat(timespec='minutes')} - {s.end_time.time().isoformat(timespec='minutes')}",
             'location': f"{s.location}, ауд. {s.room}",
             'course_code': s.course_code,
             'group': s.group_name
@@ -281,72 +518,22 @@ class UniNavEnhanced(AgentEnhancedFunctionality):
     
     def submit_academic_request(self, request_data: Dict) -> Dict:
         """Submit academic-related request"""
-        try:
-            request_id = f"AC-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            
-            request = StudentRequest(
-                request_id=request_id,
-                student_id=request_data.get('student_id'),
-                student_name=request_data.get('student_name'),
-                student_email=request_data.get('email'),
-                request_type='academic',
-                category=request_data.get('request_type'),
-                title=request_data.get('title'),
-                description=request_data.get('description'),
-                status='submitted',
-                assigned_to='Деканат'
-            )
-            
-            db.session.add(request)
-            db.session.commit()
-            
-            return {
-                'success': True,
-                'request_id': request_id,
-                'message': 'Заявка успешно подана в деканат',
-                'estimated_processing_time': '5-7 рабочих дней'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error submitting academic request: {e}")
-            return {
-                'success': False,
-                'message': 'Ошибка при подаче заявки. Попробуйте позже.'
-            }
-    
+        return self._submit_request(request_data)
+
     def get_faculty_info(self, faculty_name: str = None, language: str = 'ru') -> Dict:
         """Get faculty and instructor information"""
-        faculties = {
-            'естественно-технических наук': {
-                'dean': 'Сидоров С.С.',
-                'dean_email': 'siidorov@bolashak.kz',
-                'office': 'Главный корпус, каб. 301',
-                'phone': '+7 (7242) 123-461',
-                'departments': [
-                    'Кафедра математики и информатики',
-                    'Кафедра физики и техники',
-                    'Кафедра химии и биологии'
-                ]
-            },
-            'гуманитарный': {
-                'dean': 'Жанбосынова А.К.',
-                'dean_email': 'zhanbosynova@bolashak.kz',
-                'office': 'Главный корпус, каб. 201',
-                'phone': '+7 (7242) 123-462',
-                'departments': [
-                    'Кафедра казахского языка и литературы',
-                    'Кафедра истории и философии',
-                    'Кафедра иностранных языков'
-                ]
-            }
-        }
-        
+        faculties = static_content_cache.get(self.agent_type, 'faculties', language, FACULTIES)
         if faculty_name:
-            return faculties.get(faculty_name.lower(), {
-                'message': f'Информация о факультете "{faculty_name}" не найдена'
-            })
+            faculty = faculties.get(faculty_name.lower())
+            if faculty is None:
+                return {
+                    'message': f'Информация о факультете "{faculty_name}" не найдена'
+                }
+            return faculty
         
-        return {'faculties': list(faculties.keys())}
+        if faculties is FACULTIES:
+            return FACULTY_LIST
+        return {'faculties': list(faculties)}
 
 class CareerNavigatorEnhanced(AgentEnhancedFunctionality):
     """Enhanced functionality for CareerNavigator agent"""
@@ -355,19 +542,71 @@ class CareerNavigatorEnhanced(AgentEnhancedFunctionality):
         super().__init__('career_navigator')
     
     def search_jobs(self, skills: List[str] = None, location: str = None, 
-                   job_type: str = None, language: str = 'ru') -> List[Dict]:
-        """Search for job postings"""
+                   job_type: str = None, language: str = 'ru',
+                   before: datetime = None, before_id: int = None) -> List[Dict]:
+        """
+        Search for job postings, newest first
+        
+        Args:
+            before, before_id: keyset cursor (created_at и id последней вакансии
+                предыдущей страницы); next page is read from the index without OFFSET
+        """
         query = JobPosting.query.filter_by(is_active=True)
         
         if location:
-            query = query.filter(JobPosting.location.contains(location))
+            # lower(location) LIKE обслуживается trigram-индексом (PostgreSQL)
+            query = query.filter(func.lower(JobPosting.location).contains(location.lower(), autoescape=True))
         
         if job_type:
             query = query.filter_by(job_type=job_type)
         
-        jobs = query.order_by(JobPosting.created_at.desc()).limit(10).all()
+        if before:
+            if before_id is None:
+                query = query.filter(JobPosting.created_at < before)
+            else:
+                query = query.filter(or_(
+                    JobPosting.created_at < before,
+                    and_(JobPosting.created_at == before, JobPosting.id < before_id)
+                ))
         
-        return [{
+        jobs = query.order_by(JobPosting.created_at.desc(), JobPosting.id.desc()).limit(10).all()
+        
+        return [self._format_job(j) for j in jobs]
+    
+    def match_jobs(self, skills: List[str], limit: int = 10) -> List[Dict]:
+        """
+        Rank active job postings by overlap of required and student skills
+        
+        Score is the cosine between binary skill vectors:
+        |common| / sqrt(|student skills| * |required skills|).
+        
+        Returns:
+            Up to limit matching jobs, best first (newer first on ties)
+        """
+        student_skills = frozenset(s.strip().lower() for s in skills if s and s.strip())
+        if not student_skills:
+            return []
+        
+        scored = []
+        rows = JobPosting.query.with_entities(JobPosting.id, JobPosting.target_skills).filter_by(is_active=True)
+        for job_id, target_skills in rows:
+            if not target_skills:
+                continue
+            required = frozenset(s.strip().lower() for s in target_skills if isinstance(s, str) and s.strip())
+            common = len(student_skills & required)
+            if common:
+                scored.append((common / math.sqrt(len(student_skills) * len(required)), job_id))
+        
+        best = heapq.nlargest(limit, scored)
+        if not best:
+            return []
+        
+        jobs = {j.id: j for j in JobPosting.query.filter(JobPosting.id.in_([job_id for _, job_id in best]))}
+        return [{**self._format_job(jobs[job_id]), 'match_score': round(score, 3)} for score, job_id in best]
+    
+    @staticmethod
+    def _format_job(j) -> Dict:
+        return {
             'id': j.id,
             'title': j.title,
             'company': j.company_name,
@@ -375,11 +614,12 @@ class CareerNavigatorEnhanced(AgentEnhancedFunctionality):
             'type': j.job_type,
             'employment_type': j.employment_type,
             'salary_range': j.salary_range,
-            'deadline': j.application_deadline.strftime('%Y-%m-%d') if j.application_deadline else None,
+            'deadline': j.application_deadline.date().isoformat() if j.application_deadline else None,
             'is_internal': j.is_internal,
             'required_skills': j.target_skills,
-            'experience_level': j.experience_level
-        } for j in jobs]
+            'experience_level': j.experience_level,
+            'created_at': j.created_at.isoformat() if j.created_at else None
+        }
     
     def get_career_recommendations(self, student_profile: Dict, language: str = 'ru') -> Dict:
         """Get personalized career recommendations"""
@@ -388,104 +628,66 @@ class CareerNavigatorEnhanced(AgentEnhancedFunctionality):
         
         # Simple recommendation logic (would be more sophisticated in production)
         recommendations = {
-            'job_matches': self.search_jobs(skills=skills),
+            'job_matches': self.match_jobs(skills) or self.search_jobs(skills=skills),
             'skill_development': [],
             'career_paths': []
         }
         
         # Skill development suggestions
-        if 'python' in [s.lower() for s in skills]:
-            recommendations['skill_development'].append({
-                'skill': 'Django/Flask',
-                'reason': 'Дополнит ваши знания Python для веб-разработки',
-                'resources': ['Онлайн курсы', 'Практические проекты']
-            })
+        skills_lower = frozenset(map(str.lower, skills))
+        for skill, suggestion in SKILL_DEVELOPMENT.items():
+            if skill in skills_lower:
+                recommendations['skill_development'].append(suggestion)
         
         # Career path suggestions based on faculty
         if 'технических' in faculty.lower():
-            recommendations['career_paths'] = [
-                'Системный администратор',
-                'Веб-разработчик',
-                'Инженер по данным',
-                'DevOps инженер'
-            ]
+            recommendations['career_paths'] = TECH_CAREER_PATHS
         
         return recommendations
     
     def create_resume_template(self, student_data: Dict, language: str = 'ru') -> str:
         """Generate resume template"""
-        template = f"""
-# {student_data.get('name', '[Ваше имя]')}
-
-## Контактная информация
-- Email: {student_data.get('email', '[email]')}
-- Телефон: {student_data.get('phone', '[телефон]')}
-- LinkedIn: {student_data.get('linkedin', '[профиль LinkedIn]')}
-
-## Образование
-**Кызылординский университет "Болашак"**
-- Факультет: {student_data.get('faculty', '[факультет]')}
-- Специальность: {student_data.get('major', '[специальность]')}
-- Год окончания: {student_data.get('graduation_year', '[год]')}
-
-## Навыки
-{', '.join(student_data.get('skills', ['[укажите навыки]']))}
-
-## Опыт работы
-[Опишите ваш опыт работы]
-
-## Проекты
-[Опишите ваши проекты]
-
-## Дополнительная информация
-[Языки, сертификаты, хобби]
-        """
+        template = RESUME_TEMPLATE.format_map({
+            'name': student_data.get('name', '[Ваше имя]'),
+            'email': student_data.get('email', '[email]'),
+            'phone': student_data.get('phone', '[телефон]'),
+            'linkedin': student_data.get('linkedin', '[профиль LinkedIn]'),
+            'faculty': student_data.get('faculty', '[факультет]'),
+            'major': student_data.get('major', '[специальность]'),
+            'graduation_year': student_data.get('graduation_year', '[год]'),
+            'skills': ', '.join(student_data.get('skills', ['[укажите навыки]']))
+        })
         
         return template.strip()
     
-    def get_interview_tips(self, job_type: str = None, language: str = 'ru') -> List[Dict]:
+    def get_interview_tips(self, job_type: str = None, language: str = 'ru') -> Sequence[Dict]:
         """Get interview preparation tips"""
-        general_tips = [
-            {
-                'category': 'Подготовка',
-                'tips': [
-                    'Изучите компанию и должность',
-                    'Подготовьте ответы на типичные вопросы',
-                    'Подготовьте вопросы для интервьюера'
-                ]
-            },
-            {
-                'category': 'Во время интервью',
-                'tips': [
-                    'Приходите вовремя',
-                    'Одевайтесь профессионально',
-                    'Поддерживайте зрительный контакт',
-                    'Будьте конкретными в ответах'
-                ]
-            }
-        ]
-        
         if job_type == 'internship':
-            general_tips.append({
-                'category': 'Для стажировки',
-                'tips': [
-                    'Подчеркните желание учиться',
-                    'Покажите энтузиазм',
-                    'Расскажите о проектах из университета'
-                ]
-            })
-        
-        return general_tips
+            return INTERNSHIP_INTERVIEW_TIPS
+        return INTERVIEW_TIPS
 
 class UniRoomEnhanced(AgentEnhancedFunctionality):
     """Enhanced functionality for UniRoom agent"""
     
+    REQUEST_PREFIX = 'HS'
+    REQUEST_TYPE = 'housing'
+    REQUEST_ASSIGNED_TO = 'Администрация общежития'
+    REQUEST_SUCCESS_MESSAGE = 'Заявка успешно подана в администрацию общежития'
+    REQUEST_PROCESSING_TIME = '3-5 рабочих дней'
+    
     def __init__(self):
         super().__init__('uniroom')
     
     def get_available_rooms(self, room_type: str = None, language: str = 'ru') -> List[Dict]:
         """Get available dormitory rooms"""
-        query = HousingRoom.query.filter_by(
+        # Только нужные колонки; свободные места считает база
+        query = HousingRoom.query.with_entities(
+            HousingRoom.id, HousingRoom.building, HousingRoom.room_number,
+            HousingRoom.room_type, HousingRoom.capacity,
+            (HousingRoom.capacity - func.coalesce(HousingRoom.current_occupancy, 0)).label('available_spaces'),
+            HousingRoom.monthly_cost, HousingRoom.deposit_amount,
+            HousingRoom.amenities, HousingRoom.floor
+        ).filter_by(
             status='available',
             is_active=True
         )
@@ -501,7 +703,7 @@ class UniRoomEnhanced(AgentEnhancedFunctionality):
             'room_number': r.room_number,
             'type': r.room_type,
             'capacity': r.capacity,
-            'available_spaces': r.capacity - r.current_occupancy,
+            'available_spaces': r.available_spaces,
             'monthly_cost': r.monthly_cost,
             'deposit': r.deposit_amount,
             'amenities': r.amenities,
@@ -510,67 +712,15 @@ class UniRoomEnhanced(AgentEnhancedFunctionality):
     
     def submit_housing_request(self, request_data: Dict) -> Dict:
         """Submit housing-related request"""
-        try:
-            request_id = f"HS-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            
-            request = StudentRequest(
-                request_id=request_id,
-                student_id=request_data.get('student_id'),
-                student_name=request_data.get('student_name'),
-                student_email=request_data.get('email'),
-                request_type='housing',
-                category=request_data.get('request_type'),  # settlement, relocation, maintenance
-                title=request_data.get('title'),
-                description=request_data.get('description'),
-                status='submitted',
-                assigned_to='Администрация общежития'
-            )
-            
-            db.session.add(request)
-            db.session.commit()
-            
-            return {
-                'success': True,
-                'request_id': request_id,
-                'message': 'Заявка успешно подана в администрацию общежития',
-                'estimated_processing_time': '3-5 рабочих дней'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error submitting housing request: {e}")
-            return {
-                'success': False,
-                'message': 'Ошибка при подаче заявки. Попробуйте позже.'
-            }
-    
+        # request_type: settlement, relocation, maintenance
+        return self._submit_request(request_data)
+
     def get_housing_rules(self, language: str = 'ru') -> Dict:
         """Get dormitory rules and regulations"""
-        return {
-            'general_rules': [
-                'Соблюдение тишины с 22:00 до 7:00',
-                'Запрет на курение в здании',
-                'Регистрация гостей в администрации',
-                'Содержание комнаты в чистоте'
-            ],
-            'payment_rules': {
-                'monthly_payment_date': '5 число каждого месяца',
-                'late_fee': '10% за каждый день просрочки',
-                'deposit_return': 'В течение 30 дней после выселения'
-            },
-            'maintenance_requests': {
-                'urgent_issues': 'Немедленно обратиться в администрацию',
-                'routine_maintenance': 'Подать заявку через систему',
-                'response_time': '24-48 часов'
-            },
-            'contact_info': {
-                'admin_office': 'Общежитие А, 1 этаж',
-                'phone': '+7 (7242) 123-459',
-                'emergency_phone': '+7 (7242) 123-999',
-                'working_hours': '8:00-20:00 ежедневно'
-            }
-        }
+        return HOUSING_RULES
     
-    def check_occupancy_status(self, room_id: int = None, building: str = None) -> Dict:
+    def check_occupancy_status(self, room_id: int = None, building: str = None,
+                               include_residents: bool = True) -> Dict:
         """Check room occupancy status"""
         if room_id:
             room = HousingRoom.query.get(room_id)
@@ -578,26 +728,35 @@ class UniRoomEnhanced(AgentEnhancedFunctionality):
                 assignments = HousingAssignment.query.filter_by(
                     room_id=room_id,
                     status='active'
-                ).all()
+                )
+                
+                if include_residents:
+                    residents = [name for name, in assignments.with_entities(HousingAssignment.student_name)]
+                    occupancy = len(residents)
+                else:
+                    residents = []
+                    occupancy = assignments.with_entities(func.count(HousingAssignment.id)).scalar()
                 
                 return {
                     'room': f"{room.building}-{room.room_number}",
                     'capacity': room.capacity,
-                    'current_occupancy': len(assignments),
-                    'available_spaces': room.capacity - len(assignments),
-                    'residents': [a.student_name for a in assignments],
+                    'current_occupancy': occupancy,
+                    'available_spaces': room.capacity - occupancy,
+                    'residents': residents,
                     'status': room.status
                 }
         
-        # Get building-wide statistics
+        # Get building-wide statistics (агрегаты считает база, строки не загружаются)
         if building:
-            rooms = HousingRoom.query.filter_by(building=building, is_active=True).all()
-            total_capacity = sum(r.capacity for r in rooms)
-            total_occupied = sum(r.current_occupancy for r in rooms)
+            total_rooms, total_capacity, total_occupied = db.session.query(
+                func.count(HousingRoom.id),
+                func.coalesce(func.sum(HousingRoom.capacity), 0),
+                func.coalesce(func.sum(HousingRoom.current_occupancy), 0)
+            ).filter_by(building=building, is_active=True).one()
             
             return {
                 'building': building,
-                'total_rooms': len(rooms),
+                'total_rooms': total_rooms,
                 'total_capacity': total_capacity,
                 'total_occupied': total_occupied,
                 'occupancy_rate': f"{(total_occupied/total_capacity*100):.1f}%" if total_capacity > 0 else "0%"
@@ -607,27 +766,9 @@ class UniRoomEnhanced(AgentEnhancedFunctionality):
     
     def get_maintenance_schedule(self, building: str = None, language: str = 'ru') -> List[Dict]:
         """Get maintenance and inspection schedule"""
-        # This would typically come from a maintenance system
-        schedule = [
-            {
-                'date': '2024-07-15',
-                'time': '10:00-16:00',
-                'type': 'Плановая проверка электропроводки',
-                'building': 'А',
-                'affected_floors': [1, 2, 3],
-                'contact': 'Технический отдел: +7 (7242) 123-460'
-            },
-            {
-                'date': '2024-07-20',
-                'time': '9:00-12:00',
-                'type': 'Ремонт системы отопления',
-                'building': 'Б',
-                'affected_floors': [2],
-                'contact': 'Администрация общежития: +7 (7242) 123-459'
-            }
-        ]
+        schedule = static_content_cache.get(self.agent_type, 'maintenance_schedule', language, MAINTENANCE_SCHEDULE)
         
         if building:
-            schedule = [s for s in schedule if s['building'] == building]
+            return [s for s in schedule if s['building'] == building]
         
-        return schedule
\ No newline at end of file
+        return list(schedule)
\ No newline at end of file
@@ -16,10 +16,22 @@ import math
 
 logger = logging.getLogger(__name__)
 
+# Слова: непрерывные последовательности букв и цифр
+_WORD_RE = re.compile(r'\w+')
+
 
 class MLIntentClassifier:
     """Machine Learning-based intent classifier for multi-agent routing"""
     
+    # Question type markers
+    QUESTION_INDICATORS = {
+        'what': ('что', 'какой', 'какая', 'какие'),
+        'how': ('как', 'каким образом'),
+        'when': ('когда', 'во сколько'),
+        'where': ('где', 'куда'),
+        'why': ('почему', 'зачем')
+    }
+    
     def __init__(self):
         self.feature_weights = {
             'keyword_exact': 0.35,
@@ -31,6 +43,7 @@ class MLIntentClassifier:
         
         # Initialize agent training data
         self._init_training_data()
+        self._compile_training_data()
         
         # Initialize learned patterns
         self.learned_patterns = defaultdict(list)
@@ -146,59 +159,54 @@ class MLIntentClassifier:
             }
         }
     
-    def _extract_features(self, message: str, language: str = 'ru') -> Dict[str, float]:
-        """Extract ML features from user message"""
-        message_lower = message.lower()
+    def _compile_training_data(self):
+        """Precompute per-agent lookup data used for every message"""
+        # agent -> (keywords, keyword words, compiled patterns, context indicators)
+        self._agent_profiles = {
+            agent: (
+                tuple(data['keywords']),
+                frozenset(word for keyword in data['keywords'] for word in keyword.split()),
+                tuple(re.compile(pattern) for pattern in data['patterns']),
+                tuple(data['context_indicators'])
+            )
+            for agent, data in self.training_data.items()
+        }
+    
+    def _extract_features(self, message: str, language: str = 'ru',
+                          message_lower: Optional[str] = None) -> Dict[str, float]:
+        """Extract ML features from user message (message_lower: already lowercased text)"""
+        if message_lower is None:
+            message_lower = message.lower()
         features = {}
         
-        # Preprocessing
-        # Remove punctuation and normalize
-        clean_message = re.sub(r'[^\w\s]', ' ', message_lower)
-        words = clean_message.split()
-        
-        # 1. Keyword exact match features
-        for agent, data in self.training_data.items():
-            exact_matches = sum(1 for keyword in data['keywords'] 
-                              if keyword in message_lower)
-            features[f'{agent}_keyword_exact'] = exact_matches / len(data['keywords'])
-        
-        # 2. Semantic similarity features (using word overlap)
-        for agent, data in self.training_data.items():
-            agent_words = set()
-            for keyword in data['keywords']:
-                agent_words.update(keyword.split())
+        # Preprocessing: words without punctuation
+        words = _WORD_RE.findall(message_lower)
+        
+        message_words = set(words)
+        for agent, profile in self._agent_profiles.items():
+            keywords, agent_words, patterns, indicators = profile
             
-            message_words = set(words)
+            # 1. Keyword exact match features
+            exact_matches = sum(1 for keyword in keywords if keyword in message_lower)
+            features[f'{agent}_keyword_exact'] = exact_matches / len(keywords)
+            
+            # 2. Semantic similarity features (using word overlap)
             if agent_words and message_words:
                 overlap = len(agent_words.intersection(message_words))
                 features[f'{agent}_semantic'] = overlap / len(agent_words.union(message_words))
             else:
                 features[f'{agent}_semantic'] = 0.0
-        
-        # 3. Domain-specific pattern matching
-        for agent, data in self.training_data.items():
-            pattern_matches = 0
-            for pattern in data['patterns']:
-                if re.search(pattern, message_lower):
-                    pattern_matches += 1
-            features[f'{agent}_patterns'] = pattern_matches / len(data['patterns'])
-        
-        # 4. Context indicators
-        for agent, data in self.training_data.items():
-            context_matches = sum(1 for indicator in data['context_indicators']
-                                if indicator in message_lower)
-            features[f'{agent}_context'] = context_matches / len(data['context_indicators'])
+            
+            # 3. Domain-specific pattern matching
+            pattern_matches = sum(1 for pattern in patterns if pattern.search(message_lower))
+            features[f'{agent}_patterns'] = pattern_matches / len(patterns)
+            
+            # 4. Context indicators
+            context_matches = sum(1 for indicator in indicators if indicator in message_lower)
+            features[f'{agent}_context'] = context_matches / len(indicators)
         
         # 5. Question type analysis
-        question_indicators = {
-            'what': ['что', 'какой', 'какая', 'какие'],
-            'how': ['как', 'каким образом'],
-            'when': ['когда', 'во сколько'],
-            'where': ['где', 'куда'],
-            'why': ['почему', 'зачем']
-        }
-        
-        for q_type, indicators in question_indicators.items():
+        for q_type, indicators in self.QUESTION_INDICATORS.items():
             if any(ind in message_lower for ind in indicators):
                 features[f'question_{q_type}'] = 1.0
             else:
@@ -206,7 +214,8 @@ class MLIntentClassifier:
         
         return features
     
-    def _calculate_agent_score(self, agent: str, features: Dict[str, float]) -> float:
+    def _calculate_agent_score(self, agent: str, features: Dict[str, float],
+                               message_lower: str = '') -> float:
         """Calculate ML-based score for agent using weighted features"""
         score = 0.0
         
@@ -238,31 +247,41 @@ class MLIntentClassifier:
         if agent in self.learned_patterns:
             for pattern_data in self.learned_patterns[agent]:
                 if pattern_data['confidence'] > 0.7:
-                    similarity = SequenceMatcher(None, message.lower(), 
-                                               pattern_data['message'].lower()).ratio()
+                    similarity = SequenceMatcher(None, message_lower, 
+                                               pattern_data['message_lower']).ratio()
                     if similarity > 0.6:
                         score *= 1.1  # 10% boost for learned patterns
                         break
         
         return min(1.0, max(0.0, score))
     
-    def classify_intent(self, message: str, language: str = 'ru') -> Dict[str, float]:
+    def classify_intent(self, message: str, language: str = 'ru',
+                        message_lower: Optional[str] = None) -> Dict[str, float]:
         """
         Classify user intent using ML features
         
+        Args:
+            message: User message
+            language: Message language
+            message_lower: Lowercased message if the caller already has it
+        
         Returns:
             Dict with agent names as keys and confidence scores as values
         """
         if not message.strip():
             return {}
         
+        # Lowercase once for feature extraction and learned-pattern matching
+        if message_lower is None:
+            message_lower = message.lower()
+        
         # Extract features
-        features = self._extract_features(message, language)
+        features = self._extract_features(message, language, message_lower)
         
         # Calculate scores for each agent
         agent_scores = {}
         for agent in self.training_data.keys():
-            score = self._calculate_agent_score(agent, features)
+            score = self._calculate_agent_score(agent, features, message_lower)
             agent_scores[agent] = score
         
         # Normalize scores to ensure they sum to reasonable values
@@ -325,6 +344,7 @@ class MLIntentClassifier:
         if user_rating >= 0.8:
             pattern_data = {
                 'message': message,
+                'message_lower': message.lower(),
                 'confidence': user_rating,
                 'language': language
             }
@@ -0,0 +1,52 @@
+"""
+Fast JSON Provider
+Быстрая сериализация JSON-ответов
+
+Flask JSON provider backed by orjson for jsonify() responses and request
+bodies. Output matches DefaultJSONProvider (sorted keys, RFC 822 dates);
+anything orjson cannot encode falls back to the standard provider.
+"""
+
+import logging
+from typing import Any
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson for compact responses and parsing"""
+
+    # Даты передаются в default(), чтобы сохранить формат Flask (RFC 822)
+    OPTIONS = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS |
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+    ) if orjson is not None else 0
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Serialize arguments with orjson unless pretty output is required"""
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self.OPTIONS)
+        except TypeError as e:
+            # Например, целые числа больше 64 бит
+            logger.debug(f"orjson fallback to standard encoder: {e}")
+            return super().response(*args, **kwargs)
+
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        """Deserialize JSON, using orjson when no json.loads options are given"""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
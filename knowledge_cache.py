@@ -0,0 +1,184 @@
+"""
+Agent Knowledge Base Cache
+Кэш базы знаний агентов
+
+Keeps per-agent snapshots of active AgentKnowledgeBase entries in memory
+so that chat messages do not reload the whole table on every request.
+Snapshots are dropped automatically when a session commits changes to
+AgentKnowledgeBase rows.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from itertools import chain
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from config import AgentConfig
+
+logger = logging.getLogger(__name__)
+
+# Лёгкий снимок записи базы знаний (не привязан к сессии SQLAlchemy)
+KnowledgeEntry = namedtuple(
+    'KnowledgeEntry',
+    ['id', 'title', 'content_ru', 'content_kz', 'keywords', 'priority']
+)
+
+
+class KnowledgeSnapshot:
+    """Column-oriented view of one agent's active entries (priority order)"""
+
+    __slots__ = ('loaded_at', 'entries', 'titles', 'priorities', '_contents', '_top_contexts')
+
+    def __init__(self, entries: Tuple[KnowledgeEntry, ...], loaded_at: float):
+        self.loaded_at = loaded_at
+        self.entries = entries
+        self.titles = tuple(entry.title for entry in entries)
+        self.priorities = tuple(entry.priority for entry in entries)
+        self._contents: Dict[str, Tuple[str, ...]] = {}
+        self._top_contexts: Dict[Tuple[str, int], str] = {}
+
+    def contents(self, language: str) -> Tuple[str, ...]:
+        """Content column for language (ru, otherwise kz), built on first use"""
+        column = self._contents.get(language)
+        if column is None:
+            field = 'content_ru' if language == 'ru' else 'content_kz'
+            column = tuple(getattr(entry, field) for entry in self.entries)
+            self._contents[language] = column
+        return column
+
+    def top_context(self, language: str, top_k: int = 2) -> str:
+        """Formatted context from the top_k highest-priority entries"""
+        key = (language, top_k)
+        context = self._top_contexts.get(key)
+        if context is None:
+            context = "\n\n".join(
+                f"**{title}**\n{content}"
+                for title, content in zip(self.titles[:top_k], self.contents(language)[:top_k])
+                if content and content.strip()
+            )
+            self._top_contexts[key] = context
+        return context
+
+
+class KnowledgeBaseCache:
+    """In-process TTL cache of active knowledge entries per agent type"""
+
+    def __init__(self, ttl: int = 300):
+        """
+        Initialize cache
+
+        Args:
+            ttl: Time-to-live for an agent snapshot in seconds
+        """
+        self.ttl = ttl
+        self._snapshots: Dict[str, KnowledgeSnapshot] = {}
+        self._lock = threading.Lock()
+        # Увеличивается при каждой инвалидации: снимок, загруженный до нее, не сохраняется
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load_entries(self, agent_type: str) -> Tuple[KnowledgeEntry, ...]:
+        """Load active entries for agent from database ordered by priority"""
+        from models import AgentKnowledgeBase
+
+        # Только нужные колонки, без построения ORM-объектов
+        rows = AgentKnowledgeBase.query.with_entities(
+            *(getattr(AgentKnowledgeBase, field) for field in KnowledgeEntry._fields)
+        ).filter_by(
+            agent_type=agent_type,
+            is_active=True
+        ).order_by(AgentKnowledgeBase.priority.asc()).all()
+
+        return tuple(KnowledgeEntry._make(row) for row in rows)
+
+    def get_snapshot(self, agent_type: str) -> KnowledgeSnapshot:
+        """
+        Get snapshot of active knowledge entries for agent, reloading when expired
+
+        Args:
+            agent_type: Agent type
+
+        Returns:
+            KnowledgeSnapshot with entries ordered by priority
+        """
+        snapshot = self._snapshots.get(agent_type)
+        if snapshot is not None and time.time() - snapshot.loaded_at < self.ttl:
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        generation = self._generation
+        snapshot = KnowledgeSnapshot(self._load_entries(agent_type), time.time())
+        with self._lock:
+            if generation == self._generation:
+                self._snapshots[agent_type] = snapshot
+
+        logger.debug(f"Loaded {len(snapshot.entries)} knowledge entries for {agent_type}")
+        return snapshot
+
+    def get_entries(self, agent_type: str) -> Tuple[KnowledgeEntry, ...]:
+        """Get active knowledge entries for agent ordered by priority"""
+        return self.get_snapshot(agent_type).entries
+
+    def invalidate(self, agent_type: Optional[str] = None):
+        """
+        Drop cached snapshot for agent type (or for all agents)
+
+        Args:
+            agent_type: Agent type to invalidate, None clears everything
+        """
+        with self._lock:
+            self._generation += 1
+            if agent_type is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(agent_type, None)
+        logger.info(f"Knowledge cache invalidated for {agent_type or 'all agents'}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics"""
+        return {
+            'agents_cached': len(self._snapshots),
+            'hits': self.hits,
+            'misses': self.misses,
+            'ttl': self.ttl
+        }
+
+
+# Global knowledge cache instance
+knowledge_cache = KnowledgeBaseCache(ttl=AgentConfig.KNOWLEDGE_CACHE_TTL)
+
+
+def _register_invalidation_hooks(cache: KnowledgeBaseCache):
+    """Invalidate agent snapshots after commits that touch AgentKnowledgeBase"""
+    from models import AgentKnowledgeBase
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_changed_agents(session, flush_context):
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, AgentKnowledgeBase):
+                agent_types = session.info.setdefault('knowledge_changed_agents', set())
+                agent_types.add(obj.agent_type)
+                # Entry moved to another agent: the old one is stale too
+                # (None, i.e. all agents, when the old value was never loaded)
+                history = inspect(obj).attrs.agent_type.history
+                if history.has_changes() and obj not in session.new:
+                    agent_types.update(history.deleted or (None,))
+
+    @event.listens_for(Session, 'after_commit')
+    def _invalidate_changed_agents(session):
+        for agent_type in session.info.pop('knowledge_changed_agents', ()):
+            cache.invalidate(agent_type)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_changed_agents(session):
+        session.info.pop('knowledge_changed_agents', None)
+
+
+_register_invalidation_hooks(knowledge_cache)
@@ -6,39 +6,83 @@ This module provides advanced search capabilities for the knowledge base
 including TF-IDF similarity, fuzzy matching, and relevance scoring.
 """
 
+import copy
+import heapq
 import re
+import sys
 import logging
+import threading
 from typing import List, Dict, Tuple, Optional
-from collections import Counter
+from collections import Counter, OrderedDict, namedtuple
 from difflib import SequenceMatcher
+from functools import lru_cache
+from operator import itemgetter
 import math
 
+try:
+    from rapidfuzz.distance import Indel
+except ImportError:
+    Indel = None
+
 logger = logging.getLogger(__name__)
 
+# Слова: непрерывные последовательности букв и цифр (пунктуация - разделитель)
+_WORD_RE = re.compile(r'\w+')
+
+# Порог похожести слов для учета опечаток
+WORD_SIMILARITY_THRESHOLD = 0.8
+
+
+@lru_cache(maxsize=65536)
+def _similar_words(q_word: str, t_word: str) -> bool:
+    """Check whether two words differ only by a typo (cached per word pair)"""
+    # Indel similarity is 2 * LCS / total length, never below difflib's ratio():
+    # a cheap exact reject in C (small margin for float rounding)
+    if Indel is not None and Indel.normalized_similarity(q_word, t_word) < WORD_SIMILARITY_THRESHOLD - 1e-9:
+        return False
+    matcher = SequenceMatcher(None, q_word, t_word)
+    # quick_ratio() is an upper bound of ratio(), so it rejects most pairs cheaply
+    return (matcher.quick_ratio() > WORD_SIMILARITY_THRESHOLD and
+            matcher.ratio() > WORD_SIMILARITY_THRESHOLD)
+
+
+def _index_words(words: List[str]) -> Dict[int, Tuple[str, ...]]:
+    """Group unique words by length for the typo lookup"""
+    by_length = {}
+    for word in map(sys.intern, dict.fromkeys(words)):
+        by_length.setdefault(len(word), []).append(word)
+    return {length: tuple(group) for length, group in by_length.items()}
+
+# Предобработанное представление записи: строится один раз, используется всеми запросами
+DocProfile = namedtuple(
+    'DocProfile',
+    ['doc_text', 'title', 'content', 'keywords', 'keyword_list', 'title_words', 'content_words',
+     'keyword_words', 'title_matcher', 'content_matcher', 'keyword_matcher',
+     'word_count', 'doc_length']
+)
+
 
 class KnowledgeSearchEngine:
     """Enhanced search engine for knowledge base with TF-IDF and fuzzy matching"""
     
+    # Предел профилей в памяти: профили удаленных записей вытесняются по LRU
+    MAX_PROFILES = 4096
+    
     def __init__(self):
         self.stop_words = {
             'ru': {'и', 'в', 'на', 'с', 'по', 'для', 'как', 'что', 'где', 'когда', 'кто', 'как', 'это', 'то', 'да', 'нет', 'не', 'а', 'но', 'или', 'из', 'у', 'к', 'о', 'об', 'от', 'до', 'за', 'при', 'под', 'над', 'между', 'через', 'без', 'во', 'со', 'про'},
             'kz': {'және', 'пен', 'бен', 'мен', 'де', 'да', 'те', 'та', 'ке', 'қе', 'ға', 'на', 'нан', 'дан', 'тан', 'ден', 'тен', 'нен', 'мен', 'бен', 'пен', 'жоқ', 'бар', 'емес', 'болу', 'ол', 'бұл', 'сол'}
         }
-        self.processed_knowledge = {}  # Cache for processed knowledge entries
+        self.processed_knowledge = OrderedDict()  # LRU cache of processed knowledge entries
+        self._profiles_lock = threading.Lock()  # LRU меняется из потоков запросов
         
     def preprocess_text(self, text: str, language: str = 'ru') -> List[str]:
         """Preprocess text for better search"""
         if not text:
             return []
             
-        # Convert to lowercase and clean
-        text = text.lower()
-        
-        # Remove special characters but keep letters and numbers
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # Split into words
-        words = text.split()
+        # Lowercase and split into words, dropping special characters
+        words = _WORD_RE.findall(text.lower())
         
         # Remove stop words
         stop_words = self.stop_words.get(language, set())
@@ -51,47 +95,33 @@ class KnowledgeSearchEngine:
         if not query_words or not documents:
             return {}
             
-        # Calculate document frequency for each term
-        df = Counter()
-        doc_words = {}
+        # Term counts come from cached entry profiles (title, content and keywords)
+        profiles = [self._get_doc_profile(doc, doc.get('language', 'ru')) for doc in documents]
         
-        for i, doc in enumerate(documents):
-            # Combine title, content and keywords for search
-            text = f"{doc.get('title', '')} {doc.get('content', '')} {doc.get('keywords', '')}"
-            words = self.preprocess_text(text, doc.get('language', 'ru'))
-            doc_words[i] = words
-            
-            # Count unique terms in document
-            unique_words = set(words)
-            for word in unique_words:
+        # Document frequency is only needed for query terms
+        query_terms = set(query_words)
+        df = Counter()
+        for profile in profiles:
+            for word in query_terms.intersection(profile.word_count):
                 df[word] += 1
         
-        # Calculate TF-IDF scores
-        scores = {}
+        # Inverse document frequency, computed once per query word
         num_docs = len(documents)
+        idf = {word: math.log(num_docs / df[word]) if df[word] > 0 else 0
+               for word in query_terms}
         
-        for i, doc in enumerate(documents):
-            score = 0.0
-            doc_word_list = doc_words.get(i, [])
-            doc_word_count = Counter(doc_word_list)
-            doc_length = len(doc_word_list)
-            
+        # Calculate TF-IDF scores
+        scores = {}
+        for i, profile in enumerate(profiles):
+            doc_length = profile.doc_length
             if doc_length == 0:
                 scores[i] = 0.0
                 continue
-                
-            for query_word in query_words:
-                # Term frequency
-                tf = doc_word_count.get(query_word, 0) / doc_length
-                
-                # Inverse document frequency
-                if df[query_word] > 0:
-                    idf = math.log(num_docs / df[query_word])
-                else:
-                    idf = 0
-                    
-                score += tf * idf
             
+            score = 0.0
+            word_count = profile.word_count
+            for query_word in query_words:
+                score += word_count.get(query_word, 0) / doc_length * idf[query_word]
             scores[i] = score
             
         return scores
@@ -100,69 +130,141 @@ class KnowledgeSearchEngine:
         """Calculate fuzzy matching score for handling typos"""
         if not query or not text:
             return 0.0
+        query_lower = query.lower()
+        text_lower = text.lower()
+        return self._fuzzy_score(query_lower, query_lower.split(), text_lower,
+                                 _index_words(text_lower.split()))
+    
+    def _has_similar_word(self, q_word: str, text_words: Dict[int, Tuple[str, ...]]) -> bool:
+        """Check whether text has a word similar to q_word (typo tolerance)"""
+        q_length = len(q_word)
+        for length, words in text_words.items():
+            # ratio() <= 2 * min(len) / total: words of too different length never match
+            if 2.0 * min(q_length, length) / (q_length + length) <= WORD_SIMILARITY_THRESHOLD:
+                continue
+            for t_word in words:
+                if _similar_words(q_word, t_word):
+                    return True
+        return False
+    
+    def _fuzzy_score(self, query_lower: str, query_words: List[str],
+                     text_lower: str, text_words: Dict[int, Tuple[str, ...]],
+                     text_matcher: Optional[SequenceMatcher] = None) -> float:
+        """
+        fuzzy_match_score on already lowercased and split query and text
+        
+        text_words: unique words of text grouped by length (see _index_words)
+        text_matcher: SequenceMatcher prepared with text as the second sequence;
+        a copy reuses its index of text instead of rebuilding it per query
+        """
+        if not query_lower or not text_lower:
+            return 0.0
             
         # Direct substring match gets highest score
-        if query.lower() in text.lower():
+        if query_lower in text_lower:
             return 1.0
             
         # Calculate similarity ratio
-        similarity = SequenceMatcher(None, query.lower(), text.lower()).ratio()
+        if text_matcher is not None:
+            matcher = copy.copy(text_matcher)
+            matcher.set_seq1(query_lower)
+        else:
+            matcher = SequenceMatcher(None, query_lower, text_lower)
+        similarity = matcher.ratio()
         
         # Boost score for partial word matches
-        query_words = query.lower().split()
-        text_words = text.lower().split()
-        
         word_matches = 0
         for q_word in query_words:
-            for t_word in text_words:
-                if q_word in t_word or SequenceMatcher(None, q_word, t_word).ratio() > 0.8:
-                    word_matches += 1
-                    break
+            # Query words have no whitespace, so a substring of text is a substring of a word
+            if q_word in text_lower or self._has_similar_word(q_word, text_words):
+                word_matches += 1
         
         word_match_ratio = word_matches / len(query_words) if query_words else 0
         
         # Combine similarity and word match scores
         return max(similarity, word_match_ratio * 0.8)
     
-    def calculate_relevance_score(self, query: str, entry: Dict, language: str = 'ru') -> float:
+    def _get_doc_profile(self, entry: Dict, language: str) -> DocProfile:
+        """Get preprocessed search profile for entry, cached per entry id and language"""
+        title = entry.get('title', '')
+        content = entry.get('content', '')
+        keywords = entry.get('keywords', '')
+        doc_text = f"{title} {content} {keywords}"
+        cache_key = (entry.get('id'), language)
+        
+        if cache_key[0] is not None:
+            with self._profiles_lock:
+                cached = self.processed_knowledge.get(cache_key)
+                if cached is not None and cached.doc_text == doc_text:
+                    self.processed_knowledge.move_to_end(cache_key)
+                    return cached
+        
+        # Словарь записей общий: одинаковые слова разных записей хранятся один раз
+        doc_words = list(map(sys.intern, self.preprocess_text(doc_text, language)))
+        title_lower, content_lower, keywords_lower = title.lower(), content.lower(), keywords.lower()
+        profile = DocProfile(
+            doc_text, title_lower, content_lower, keywords_lower,
+            tuple(k.strip() for k in keywords_lower.split(',')),
+            _index_words(title_lower.split()), _index_words(content_lower.split()),
+            _index_words(keywords_lower.split()),
+            SequenceMatcher(None, '', title_lower), SequenceMatcher(None, '', content_lower),
+            SequenceMatcher(None, '', keywords_lower),
+            Counter(doc_words), len(doc_words)
+        )
+        if cache_key[0] is not None:
+            with self._profiles_lock:
+                self.processed_knowledge[cache_key] = profile
+                self.processed_knowledge.move_to_end(cache_key)
+                if len(self.processed_knowledge) > self.MAX_PROFILES:
+                    self.processed_knowledge.popitem(last=False)
+        return profile
+    
+    def calculate_relevance_score(self, query: str, entry: Dict, language: str = 'ru',
+                                  query_words: Optional[List[str]] = None) -> float:
         """Calculate overall relevance score combining multiple factors"""
         
         # Extract text fields
-        title = entry.get('title', '')
-        content = entry.get('content', '')
         keywords = entry.get('keywords', '')
         priority = entry.get('priority', 1)
         
+        # Lowercased fields and word lists are reused across queries
+        profile = self._get_doc_profile(entry, language)
+        query_lower = query.lower()
+        query_split = query_lower.split()
+        
         # Calculate different score components
         scores = {}
         
         # 1. Keyword exact match (highest weight)
         if keywords:
-            keyword_list = [k.strip().lower() for k in keywords.split(',')]
-            query_lower = query.lower()
+            keyword_list = profile.keyword_list
             exact_keyword_matches = sum(1 for k in keyword_list if k in query_lower)
             scores['keyword_exact'] = exact_keyword_matches / len(keyword_list) if keyword_list else 0
         else:
             scores['keyword_exact'] = 0
             
         # 2. Fuzzy keyword match
-        scores['keyword_fuzzy'] = self.fuzzy_match_score(query, keywords) if keywords else 0
+        scores['keyword_fuzzy'] = self._fuzzy_score(
+            query_lower, query_split, profile.keywords, profile.keyword_words, profile.keyword_matcher
+        ) if keywords else 0
         
         # 3. Title relevance
-        scores['title'] = self.fuzzy_match_score(query, title)
+        scores['title'] = self._fuzzy_score(
+            query_lower, query_split, profile.title, profile.title_words, profile.title_matcher
+        )
         
         # 4. Content relevance  
-        scores['content'] = self.fuzzy_match_score(query, content)
+        scores['content'] = self._fuzzy_score(
+            query_lower, query_split, profile.content, profile.content_words, profile.content_matcher
+        )
         
         # 5. TF-IDF score (requires document collection)
-        query_words = self.preprocess_text(query, language)
-        doc_text = f"{title} {content} {keywords}"
-        doc_words = self.preprocess_text(doc_text, language)
+        if query_words is None:
+            query_words = self.preprocess_text(query, language)
+        word_count, doc_length = profile.word_count, profile.doc_length
         
         # Simple term frequency for single document
-        if query_words and doc_words:
-            word_count = Counter(doc_words)
-            doc_length = len(doc_words)
+        if query_words and doc_length:
             tf_score = sum(word_count.get(word, 0) for word in query_words) / doc_length
             scores['tf'] = tf_score
         else:
@@ -221,26 +323,37 @@ class KnowledgeSearchEngine:
             }
             search_docs.append(doc)
         
-        # Calculate relevance scores
-        scored_results = []
-        for doc in search_docs:
-            score = self.calculate_relevance_score(query, doc, language)
-            if score >= min_score:
-                scored_results.append({
-                    'entry': doc['entry'],
-                    'score': score,
-                    'content': doc['content'],
-                    'title': doc['title']
-                })
-        
-        # Sort by score (descending) and limit results
-        scored_results.sort(key=lambda x: x['score'], reverse=True)
+        # Calculate relevance scores (query is preprocessed once for all entries)
+        query_words = self.preprocess_text(query, language)
+        
+        # Streaming top-K: a min-heap of (score, -position) keeps the best
+        # max_results entries, ties resolved in entry order like a stable sort
+        heap: List[Tuple[float, int, Dict]] = []
+        matched = 0
+        for position, doc in enumerate(search_docs):
+            score = self.calculate_relevance_score(query, doc, language, query_words)
+            if score < min_score:
+                continue
+            matched += 1
+            item = (score, -position, doc)
+            if len(heap) < max_results:
+                heapq.heappush(heap, item)
+            elif heap and item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        
+        # Result dicts only for the survivors, best first
+        top_results = [{
+            'entry': doc['entry'],
+            'score': score,
+            'content': doc['content'],
+            'title': doc['title']
+        } for score, _, doc in sorted(heap, key=itemgetter(0, 1), reverse=True)]
         
         # Log search results
-        logger.info(f"Knowledge search for '{query}': {len(scored_results)} results "
-                   f"(max_score: {scored_results[0]['score']:.3f})" if scored_results else "No results")
+        logger.info(f"Knowledge search for '{query}': {matched} results "
+                   f"(max_score: {top_results[0]['score']:.3f})" if top_results else "No results")
         
-        return scored_results[:max_results]
+        return top_results
     
     def format_context(self, search_results: List[Dict], max_length: int = 1500) -> str:
         """Format search results into context string with smart truncation"""
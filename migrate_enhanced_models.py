@@ -8,6 +8,8 @@ import os
 import sys
 from datetime import datetime
 
+from sqlalchemy import text
+
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -25,6 +27,11 @@ def migrate_database():
             print("Creating enhanced models tables...")
             db.create_all()
             
+            # create_all() skips indexes of tables that already exist
+            print("Creating missing indexes...")
+            ensure_indexes()
+            ensure_search_indexes()
+            
             # Add some sample data for testing
             print("Adding sample data...")
             add_sample_data()
@@ -35,6 +42,38 @@ def migrate_database():
             print(f"Error during migration: {e}")
             raise
 
+def ensure_indexes():
+    """Create model indexes missing on existing tables"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+def ensure_search_indexes():
+    """
+    PostgreSQL only: trigram GIN indexes for substring search
+    
+    AgentEnhancedFunctionality.search_knowledge_base filters with
+    keywords LIKE '%query%' and CareerNavigatorEnhanced.search_jobs with
+    lower(location) LIKE '%query%'; gin_trgm_ops indexes serve these
+    predicates without a sequential scan and without changing results.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_akb_keywords_trgm "
+                "ON agent_knowledge_base USING gin (keywords gin_trgm_ops)"
+            ))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_job_postings_location_trgm "
+                "ON job_postings USING gin (lower(location) gin_trgm_ops)"
+            ))
+    except Exception as e:
+        # Нет прав на CREATE EXTENSION: поиск работает и без индекса
+        print(f"Skipping trigram indexes: {e}")
+
 def add_sample_data():
     """Add sample data for testing the enhanced functionality"""
     
@@ -207,28 +246,22 @@ Email: {{email}}
         }
     ]
     
+    # Владелец записей по умолчанию
+    for template_data in templates:
+        template_data['created_by'] = 1  # Assuming admin user with ID 1 exists
+    for job_data in jobs:
+        job_data['posted_by'] = 1  # Assuming admin user with ID 1 exists
+    
     try:
-        # Add templates
-        for template_data in templates:
-            template = DocumentTemplate(**template_data)
-            template.created_by = 1  # Assuming admin user with ID 1 exists
-            db.session.add(template)
-        
-        # Add schedules
-        for schedule_data in schedules:
-            schedule = Schedule(**schedule_data)
-            db.session.add(schedule)
-        
-        # Add job postings
-        for job_data in jobs:
-            job = JobPosting(**job_data)
-            job.posted_by = 1  # Assuming admin user with ID 1 exists
-            db.session.add(job)
-        
-        # Add housing rooms
-        for room_data in rooms:
-            room = HousingRoom(**room_data)
-            db.session.add(room)
+        # Bulk insert: one executemany per table instead of per-object add/flush
+        for model, rows in (
+            (DocumentTemplate, templates),
+            (Schedule, schedules),
+            (JobPosting, jobs),
+            (HousingRoom, rooms),
+        ):
+            if rows:
+                db.session.execute(db.insert(model), rows)
         
         # Commit all changes
         db.session.commit()
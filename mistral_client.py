@@ -2,7 +2,12 @@ import os
 import logging
 import requests
 import json
-from typing import Optional
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterator, Optional, Tuple
+from requests.adapters import HTTPAdapter
+
+from prompt_engineering import prompt_engineer
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +24,14 @@ class MistralClient:
         self.base_url = "https://api.mistral.ai/v1"
         self.model = "mistral-small-latest"
 
+        # Общий keep-alive пул соединений для всех агентов
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=20))
+
+        # Одинаковые одновременные запросы обслуживаются одним вызовом API
+        self._inflight: Dict[Tuple[str, str, str, str], Future] = {}
+        self._inflight_lock = threading.Lock()
+
         self.system_prompts = {
             'ru': """
         Ты — AI-ассистент для абитуриентов и студентов Кызылординского университета "Болашак". Отвечай кратко, дружелюбно и информативно на русском языке. Используй следующие возможности:
@@ -68,10 +81,10 @@ class MistralClient:
                 "temperature": 0.7
             }
 
-            response = requests.post(f"{self.base_url}/chat/completions",
-                                     headers=headers,
-                                     json=data,
-                                     timeout=30)
+            response = self.session.post(f"{self.base_url}/chat/completions",
+                                         headers=headers,
+                                         json=data,
+                                         timeout=30)
 
             if response.status_code == 200:
                 result = response.json()
@@ -90,58 +103,100 @@ class MistralClient:
             logger.error(f"Unexpected error in Mistral client: {str(e)}")
             return self._get_fallback_response(language)
 
+    def _build_enhanced_request(self,
+                                user_message: str,
+                                context: str,
+                                language: str,
+                                custom_system_prompt: str = "") -> Tuple[dict, dict]:
+        """Build chat completion payload with enhanced prompt engineering"""
+        # Use custom system prompt if provided, otherwise fall back to default
+        system_prompt = custom_system_prompt if custom_system_prompt else self.system_prompts.get(language, self.system_prompts['ru'])
+
+        # Stable system prompt goes first as its own message (provider prefix cache),
+        # context-dependent guidance, context and question go into the user message
+        messages, quality_metrics = prompt_engineer.generate_enhanced_messages(
+            system_prompt=system_prompt,
+            context=context,
+            user_query=user_message,
+            language=language
+        )
+        
+        # Log quality metrics for monitoring
+        logger.info(f"Prompt quality: relevance={quality_metrics.get('relevance', 0):.2f}, "
+                   f"tokens={quality_metrics.get('final_tokens', 0)}")
+
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": 500,
+            "temperature": 0.7
+        }
+        return data, quality_metrics
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
     def get_response_with_system_prompt(self,
                                         user_message: str,
                                         context: str = "",
                                         language: str = "ru",
                                         custom_system_prompt: str = "") -> str:
-        """Get response using enhanced prompt engineering and custom system prompt"""
+        """
+        Get response using enhanced prompt engineering and custom system prompt.
+        Concurrent calls with identical arguments wait for the first one's API
+        call instead of issuing their own.
+        """
+        key = (user_message, context, language, custom_system_prompt)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_leader:
+            try:
+                return future.result(timeout=60)
+            except Exception as e:
+                logger.error(f"Error waiting for coalesced Mistral request: {str(e)}")
+                return self._get_fallback_response(language)
+
+        try:
+            response = self._request_with_system_prompt(
+                user_message, context, language, custom_system_prompt
+            )
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _request_with_system_prompt(self,
+                                    user_message: str,
+                                    context: str,
+                                    language: str,
+                                    custom_system_prompt: str) -> str:
+        """Single chat completion call with enhanced prompt"""
         try:
             # Check if API key is available
             if not self.api_key:
                 logger.error("Mistral API key not configured")
                 return self._get_fallback_response(language)
             
-            # Use enhanced prompt engineering
-            from prompt_engineering import prompt_engineer
-            
-            # Use custom system prompt if provided, otherwise fall back to default
-            system_prompt = custom_system_prompt if custom_system_prompt else self.system_prompts.get(language, self.system_prompts['ru'])
-
-            # Generate enhanced prompt with quality assessment
-            enhanced_prompt, quality_metrics = prompt_engineer.generate_enhanced_prompt(
-                system_prompt=system_prompt,
-                context=context,
-                user_query=user_message,
-                language=language
+            data, quality_metrics = self._build_enhanced_request(
+                user_message, context, language, custom_system_prompt
             )
-            
-            # Log quality metrics for monitoring
-            logger.info(f"Prompt quality: relevance={quality_metrics.get('relevance', 0):.2f}, "
-                       f"tokens={quality_metrics.get('final_tokens', 0)}")
 
-            # For enhanced prompts, we use a single user message with structured content
-            messages = [{
-                "role": "user",
-                "content": enhanced_prompt
-            }]
-
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-
-            data = {
-                "model": self.model,
-                "messages": messages,
-                "max_tokens": 500,
-                "temperature": 0.7
-            }
-
-            response = requests.post(f"{self.base_url}/chat/completions",
-                                     headers=headers,
-                                     json=data,
-                                     timeout=30)
+            response = self.session.post(f"{self.base_url}/chat/completions",
+                                         headers=self._headers(),
+                                         json=data,
+                                         timeout=30)
 
             if response.status_code == 200:
                 result = response.json()
@@ -163,6 +218,65 @@ class MistralClient:
             logger.error(f"Unexpected error in enhanced Mistral client: {str(e)}")
             return self._get_fallback_response(language)
 
+    def stream_response_with_system_prompt(self,
+                                           user_message: str,
+                                           context: str = "",
+                                           language: str = "ru",
+                                           custom_system_prompt: str = "") -> Iterator[str]:
+        """
+        Stream response chunks (SSE) as they are generated by Mistral.
+        Errors before the first chunk yield a fallback response; errors after
+        it are re-raised, so the caller does not take a cut-off answer as complete.
+        """
+        if not self.api_key:
+            logger.error("Mistral API key not configured")
+            yield self._get_fallback_response(language)
+            return
+
+        streamed_any = False
+        try:
+            data, _ = self._build_enhanced_request(
+                user_message, context, language, custom_system_prompt
+            )
+            data["stream"] = True
+
+            with self.session.post(f"{self.base_url}/chat/completions",
+                                   headers=self._headers(),
+                                   json=data,
+                                   timeout=30,
+                                   stream=True) as response:
+                if response.status_code != 200:
+                    logger.error(
+                        f"Mistral API error: {response.status_code} - {response.text}"
+                    )
+                    yield self._get_fallback_response(language)
+                    return
+
+                # text/event-stream без charset декодировался бы как ISO-8859-1
+                response.encoding = 'utf-8'
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    delta = chunk['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        streamed_any = True
+                        yield delta
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Request error to Mistral API: {str(e)}")
+            if streamed_any:
+                raise
+            yield self._get_smart_fallback_response(user_message, context, language)
+        except Exception as e:
+            logger.error(f"Unexpected error in Mistral streaming: {str(e)}")
+            if streamed_any:
+                raise
+            yield self._get_fallback_response(language)
+
     def _get_smart_fallback_response(self,
                                      user_message: str,
                                      context: str,
@@ -231,4 +345,8 @@ class MistralClient:
             'kz':
             "**Кешіріңіз, мен уақытша қолжетімсізбін.**\n\nУниверситеттің қабылдау комиссиясына телефон немесе электрондық пошта арқылы хабарласыңыз."
         }
-        return fallback_responses.get(language, fallback_responses['ru'])
\ No newline at end of file
+        return fallback_responses.get(language, fallback_responses['ru'])
+
+
+# Shared client instance used by all agents
+mistral_client = MistralClient()
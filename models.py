@@ -138,6 +138,10 @@ class KnowledgeBase(db.Model):
 class AgentKnowledgeBase(db.Model):
     """Agent-specific knowledge base entries"""
     __tablename__ = 'agent_knowledge_base'
+    __table_args__ = (
+        # Горячий запрос агентов: filter_by(agent_type, is_active).order_by(priority)
+        db.Index('ix_akb_agent_active_prio', 'agent_type', 'is_active', 'priority'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     agent_type = db.Column(db.String(50), nullable=False)  # Type of agent this knowledge belongs to
@@ -167,6 +171,25 @@ class AgentKnowledgeBase(db.Model):
     def __repr__(self):
         return f'<AgentKnowledgeBase {self.agent_type}:{self.title}>'
 
+class AgentStaticContent(db.Model):
+    """Reference content shown by enhanced agents (overrides built-in data)"""
+    __tablename__ = 'agent_static_content'
+    __table_args__ = (
+        db.UniqueConstraint('agent_type', 'kind', 'language', name='uq_agent_static_content_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    agent_type = db.Column(db.String(50), nullable=False)
+    kind = db.Column(db.String(50), nullable=False)  # admission_info, programs, faculties, maintenance_schedule
+    language = db.Column(db.String(5), nullable=False, default='ru')
+    content = db.Column(db.JSON, nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AgentStaticContent {self.agent_type}:{self.kind}:{self.language}>'
+
 class AgentType(db.Model):
     """Model for agent types and their configurations"""
     __tablename__ = 'agent_types'
@@ -256,6 +279,10 @@ class AdminUser(db.Model):
 class DocumentTemplate(db.Model):
     """Templates for various university documents and forms"""
     __tablename__ = 'document_templates'
+    __table_args__ = (
+        # Шаблоны агента: filter_by(agent_type, is_active)
+        db.Index('ix_document_templates_agent_active', 'agent_type', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name_ru = db.Column(db.String(200), nullable=False)
@@ -291,6 +318,13 @@ class DocumentTemplate(db.Model):
 class StudentRequest(db.Model):
     """Tracking system for student requests (HR, housing, academic)"""
     __tablename__ = 'student_requests'
+    __table_args__ = (
+        # Статистика заявок: GROUP BY status, request_type
+        db.Index('ix_student_requests_status_type', 'status', 'request_type'),
+        # Заявки студента: filter(student_email | student_id).order_by(submitted_at desc)
+        db.Index('ix_student_requests_email_submitted', 'student_email', 'submitted_at'),
+        db.Index('ix_student_requests_sid_submitted', 'student_id', 'submitted_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     request_id = db.Column(db.String(50), unique=True, nullable=False)  # Human-readable ID
@@ -324,6 +358,10 @@ class StudentRequest(db.Model):
 class Schedule(db.Model):
     """University schedules for classes, exams, events"""
     __tablename__ = 'schedules'
+    __table_args__ = (
+        # Расписание группы: filter_by(schedule_type, group_name) + диапазон start_time
+        db.Index('ix_schedules_type_group_start', 'schedule_type', 'group_name', 'start_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     schedule_type = db.Column(db.String(50), nullable=False)  # class, exam, event, meeting
@@ -361,6 +399,10 @@ class Schedule(db.Model):
 class JobPosting(db.Model):
     """Job postings for career services"""
     __tablename__ = 'job_postings'
+    __table_args__ = (
+        # Лента вакансий: filter_by(is_active).order_by(created_at desc, id desc)
+        db.Index('ix_job_postings_active_created', 'is_active', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(300), nullable=False)
@@ -405,6 +447,10 @@ class JobPosting(db.Model):
 class HousingRoom(db.Model):
     """Dormitory room management"""
     __tablename__ = 'housing_rooms'
+    __table_args__ = (
+        # Статистика по корпусу: filter_by(building, is_active)
+        db.Index('ix_housing_rooms_building_active', 'building', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     building = db.Column(db.String(50), nullable=False)
@@ -437,6 +483,10 @@ class HousingRoom(db.Model):
 class HousingAssignment(db.Model):
     """Student housing assignments"""
     __tablename__ = 'housing_assignments'
+    __table_args__ = (
+        # Жильцы комнаты: filter_by(room_id, status)
+        db.Index('ix_housing_assignments_room_status', 'room_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.String(50), nullable=False)
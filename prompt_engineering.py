@@ -9,6 +9,7 @@ dynamic templates, and token management.
 import logging
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +27,14 @@ class PromptConfig:
 class PromptEngineer:
     """Enhanced prompt engineering with dynamic templates and optimization"""
     
+    # Сколько последних (промпт, контекст, вопрос, язык) хранить с готовым результатом
+    RESULT_CACHE_SIZE = 1024
+    
     def __init__(self, config: Optional[PromptConfig] = None):
         self.config = config or PromptConfig()
+        # Результат детерминирован входами: повторные запросы берутся из LRU
+        self._enhanced_prompt = lru_cache(maxsize=self.RESULT_CACHE_SIZE)(self._build_enhanced_prompt)
+        self._enhanced_messages = lru_cache(maxsize=self.RESULT_CACHE_SIZE)(self._build_enhanced_messages)
         
     def estimate_token_count(self, text: str) -> int:
         """Rough estimation of token count (1 token ≈ 4 characters for Russian)"""
@@ -158,7 +165,9 @@ class PromptEngineer:
         
         return "\n\n".join(prompt_parts)
     
-    def optimize_prompt_structure(self, system_prompt: str, context: str, user_query: str) -> str:
+    def optimize_prompt_structure(self, system_prompt: str, context: str, user_query: str,
+                                  max_tokens: Optional[int] = None,
+                                  system_title: str = "СИСТЕМА") -> str:
         """Optimize the overall prompt structure and length"""
         
         # Calculate current token usage
@@ -171,11 +180,11 @@ class PromptEngineer:
                     f"query={query_tokens}, total={total_tokens}")
         
         # If within limits, return as-is
-        if total_tokens <= self.config.max_tokens:
-            return self._format_final_prompt(system_prompt, context, user_query)
+        available_tokens = max_tokens if max_tokens is not None else self.config.max_tokens
+        if total_tokens <= available_tokens:
+            return self._format_final_prompt(system_prompt, context, user_query, system_title)
         
         # Need to truncate - prioritize based on weights
-        available_tokens = self.config.max_tokens
         
         # Reserve tokens for user query (highest priority)
         query_token_limit = int(available_tokens * self.config.user_query_weight)
@@ -199,16 +208,17 @@ class PromptEngineer:
         
         logger.info(f"Prompt optimized: {total_tokens} -> {self.estimate_token_count(system_prompt + context + user_query)} tokens")
         
-        return self._format_final_prompt(system_prompt, context, user_query)
+        return self._format_final_prompt(system_prompt, context, user_query, system_title)
     
-    def _format_final_prompt(self, system_prompt: str, context: str, user_query: str) -> str:
+    def _format_final_prompt(self, system_prompt: str, context: str, user_query: str,
+                             system_title: str = "СИСТЕМА") -> str:
         """Format the final prompt with clear sections"""
         
         sections = []
         
         # System prompt section
         if system_prompt:
-            sections.append(f"=== СИСТЕМА ===\n{system_prompt}")
+            sections.append(f"=== {system_title} ===\n{system_prompt}")
         
         # Context section (if available)
         if context and context.strip():
@@ -228,6 +238,18 @@ class PromptEngineer:
         Returns:
             Tuple of (optimized_prompt, quality_metrics)
         """
+        optimized_prompt, quality_metrics = self._enhanced_prompt(
+            system_prompt, context, user_query, language
+        )
+        
+        logger.info(f"Enhanced prompt generated: {quality_metrics['final_tokens']} tokens, "
+                   f"relevance={quality_metrics['relevance']:.2f}")
+        
+        return optimized_prompt, dict(quality_metrics)
+    
+    def _build_enhanced_prompt(self, system_prompt: str, context: str, user_query: str,
+                               language: str) -> Tuple[str, Dict[str, float]]:
+        """Uncached generate_enhanced_prompt"""
         
         # Assess context quality
         context_quality = self.assess_context_quality(context, user_query)
@@ -250,10 +272,62 @@ class PromptEngineer:
             'final_tokens': final_tokens
         }
         
-        logger.info(f"Enhanced prompt generated: {final_tokens} tokens, "
-                   f"relevance={context_quality['relevance']:.2f}")
-        
         return optimized_prompt, quality_metrics
+    
+    def generate_enhanced_messages(self, system_prompt: str, context: str, user_query: str,
+                                   language: str = 'ru') -> Tuple[List[Dict[str, str]], Dict[str, float]]:
+        """
+        Generate chat messages with the stable system prompt as its own message
+        
+        The system message is sent unchanged on every request so the provider
+        can reuse its cached prefix; per-request guidance based on context
+        quality goes into the user message together with context and query.
+        
+        Returns:
+            Tuple of (messages, quality_metrics)
+        """
+        user_content, quality_metrics = self._enhanced_messages(
+            system_prompt, context, user_query, language
+        )
+        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        return messages, dict(quality_metrics)
+    
+    def _build_enhanced_messages(self, system_prompt: str, context: str, user_query: str,
+                                 language: str) -> Tuple[str, Dict[str, float]]:
+        """User message content and quality metrics for generate_enhanced_messages"""
+        context_quality = self.assess_context_quality(context, user_query)
+        
+        # Dynamic instructions only (without base prompt)
+        guidance = self.generate_dynamic_system_prompt("", context_quality, language).strip()
+        
+        system_tokens = self.estimate_token_count(system_prompt)
+        user_content = self.optimize_prompt_structure(
+            guidance, context, user_query,
+            max_tokens=max(1, self.config.max_tokens - system_tokens),
+            system_title="ИНСТРУКЦИИ"
+        )
+        
+        final_tokens = system_tokens + self.estimate_token_count(user_content)
+        quality_metrics = {
+            **context_quality,
+            'token_efficiency': min(1.0, self.config.max_tokens / max(final_tokens, 1)),
+            'final_tokens': final_tokens
+        }
+        return user_content, quality_metrics
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters of the prompt result caches"""
+        prompt_info = self._enhanced_prompt.cache_info()
+        messages_info = self._enhanced_messages.cache_info()
+        return {
+            'hits': prompt_info.hits + messages_info.hits,
+            'misses': prompt_info.misses + messages_info.misses,
+            'cached_results': prompt_info.currsize + messages_info.currsize
+        }
 
 
 # Global instance
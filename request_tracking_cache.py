@@ -0,0 +1,118 @@
+"""
+Student Request Tracking Cache
+Кэш отслеживания заявок студентов
+
+Keeps the serialized tracking view of recently looked-up student requests,
+so clients polling /requests/track/<id> do not query the database on every
+poll. Entries are dropped when a session commits changes to the request
+and expire after a short TTL to cover updates made outside the ORM.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTrackingCache:
+    """LRU cache of serialized request tracking data with TTL"""
+
+    def __init__(self, max_size: int = 1024, ttl: int = 60):
+        """
+        Initialize cache
+
+        Args:
+            max_size: Maximum number of cached requests
+            ttl: Time-to-live for a cached entry in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        # request_id -> (expires_at, data)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get cached tracking data for request or None"""
+        with self._lock:
+            cached = self._entries.get(request_id)
+            if cached is not None and cached[0] > time.time():
+                self._entries.move_to_end(request_id)
+                self.hits += 1
+                return cached[1]
+        self.misses += 1
+        return None
+
+    def set(self, request_id: str, data: Dict[str, Any]):
+        """Store tracking data for request"""
+        with self._lock:
+            self._entries[request_id] = (time.time() + self.ttl, data)
+            self._entries.move_to_end(request_id)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, request_id: Optional[str] = None):
+        """
+        Drop cached tracking data for request (or for all requests)
+
+        Args:
+            request_id: Human-readable request ID, None clears everything
+        """
+        with self._lock:
+            if request_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(request_id, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics"""
+        return {
+            'cached_requests': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'ttl': self.ttl
+        }
+
+
+# Global request tracking cache instance
+request_tracking_cache = RequestTrackingCache()
+
+
+def _register_invalidation_hooks(cache: RequestTrackingCache):
+    """Invalidate tracking data after commits that touch StudentRequest rows"""
+    from models import StudentRequest
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_changed_requests(session, flush_context):
+        for obj in chain(session.dirty, session.deleted):
+            if isinstance(obj, StudentRequest):
+                request_ids = session.info.setdefault('tracked_requests_changed', set())
+                request_ids.add(obj.request_id)
+                # Сменился сам request_id: старое значение тоже устарело
+                history = inspect(obj).attrs.request_id.history
+                if history.has_changes():
+                    request_ids.update(history.deleted or (None,))
+
+    @event.listens_for(Session, 'after_commit')
+    def _invalidate_changed_requests(session):
+        request_ids = session.info.pop('tracked_requests_changed', ())
+        if None in request_ids:
+            cache.invalidate()
+            return
+        for request_id in request_ids:
+            cache.invalidate(request_id)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_changed_requests(session):
+        session.info.pop('tracked_requests_changed', None)
+
+
+_register_invalidation_hooks(request_tracking_cache)
@@ -7,17 +7,31 @@ to improve response times and reduce API calls.
 """
 
 import hashlib
-import json
 import logging
+import re
+import sys
+import threading
 import time
-from typing import Dict, Optional, Any
+from typing import Dict, FrozenSet, List, Optional, Any, Tuple
 from collections import OrderedDict
 
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 logger = logging.getLogger(__name__)
 
 
 class ResponseCache:
-    """Simple in-memory cache for AI responses with TTL support"""
+    """
+    Simple in-memory cache for AI responses with TTL support
+    
+    Entries are spread over SHARD_COUNT independent LRU shards, each guarded
+    by its own lock, so concurrent requests rarely wait on each other.
+    """
+    
+    SHARD_COUNT = 16  # Степень двойки: шард выбирается маской хэша
     
     def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
         """
@@ -29,25 +43,36 @@ class ResponseCache:
         """
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self.cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
-        self.hits = 0
-        self.misses = 0
+        self.shard_max_size = max(1, max_size // self.SHARD_COUNT)
+        self._shards: List[Tuple[threading.Lock, OrderedDict]] = [
+            (threading.Lock(), OrderedDict()) for _ in range(self.SHARD_COUNT)
+        ]
+        # Счетчики по шардам, обновляются под блокировкой шарда
+        self._hits = [0] * self.SHARD_COUNT
+        self._misses = [0] * self.SHARD_COUNT
+    
+    @property
+    def hits(self) -> int:
+        return sum(self._hits)
+    
+    @property
+    def misses(self) -> int:
+        return sum(self._misses)
         
-    def _generate_cache_key(self, user_message: str, agent_type: str, language: str) -> str:
+    def _generate_cache_key(self, user_message: str, agent_type: str, language: str) -> int:
         """Generate cache key from message parameters"""
         # Normalize message for better cache hits
         normalized_message = user_message.lower().strip()
         
-        # Create unique key
-        key_data = {
-            'message': normalized_message,
-            'agent': agent_type,
-            'language': language
-        }
-        
-        # Use SHA256 hash for consistent key generation
-        key_string = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
-        return hashlib.sha256(key_string.encode('utf-8')).hexdigest()[:16]
+        # 128-битный дайджест как int: без hex-строки, стабилен между перезапусками
+        key_bytes = f"{agent_type}\x00{language}\x00{normalized_message}".encode('utf-8')
+        if xxhash is not None:
+            return xxhash.xxh3_128_intdigest(key_bytes)
+        return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=16).digest(), 'big')
+    
+    def _shard_index(self, cache_key: int) -> int:
+        """Get index of the shard holding cache_key"""
+        return cache_key & (self.SHARD_COUNT - 1)
     
     def _is_expired(self, cache_entry: Dict[str, Any]) -> bool:
         """Check if cache entry is expired"""
@@ -56,25 +81,24 @@ class ResponseCache:
             
         return time.time() > cache_entry['expires_at']
     
-    def _cleanup_expired(self):
-        """Remove expired entries from cache"""
+    def _cleanup_expired(self, shard: OrderedDict):
+        """Remove expired entries from shard (caller holds the shard lock)"""
         current_time = time.time()
         expired_keys = [
-            key for key, entry in self.cache.items() 
+            key for key, entry in shard.items() 
             if current_time > entry.get('expires_at', 0)
         ]
         
         for key in expired_keys:
-            del self.cache[key]
+            del shard[key]
             
         if expired_keys:
             logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
     
-    def _evict_oldest(self):
-        """Remove oldest entries to maintain max_size"""
-        while len(self.cache) >= self.max_size:
-            oldest_key = next(iter(self.cache))
-            del self.cache[oldest_key]
+    def _evict_oldest(self, shard: OrderedDict):
+        """Remove oldest entries to maintain shard size (caller holds the shard lock)"""
+        while len(shard) >= self.shard_max_size:
+            oldest_key, _ = shard.popitem(last=False)
             logger.debug(f"Evicted oldest cache entry: {oldest_key}")
     
     def get(self, user_message: str, agent_type: str, language: str = 'ru') -> Optional[Dict[str, Any]]:
@@ -86,26 +110,28 @@ class ResponseCache:
         """
         try:
             cache_key = self._generate_cache_key(user_message, agent_type, language)
+            index = self._shard_index(cache_key)
+            lock, shard = self._shards[index]
             
-            # Clean up expired entries periodically
-            if len(self.cache) > 0 and (self.hits + self.misses) % 10 == 0:
-                self._cleanup_expired()
-            
-            if cache_key in self.cache:
-                entry = self.cache[cache_key]
+            with lock:
+                # Clean up expired entries periodically
+                if shard and (self._hits[index] + self._misses[index]) % 10 == 0:
+                    self._cleanup_expired(shard)
                 
-                if not self._is_expired(entry):
-                    # Move to end (LRU behavior)
-                    self.cache.move_to_end(cache_key)
-                    self.hits += 1
-                    
-                    logger.debug(f"Cache hit for message: '{user_message[:50]}...'")
-                    return entry['response']
-                else:
-                    # Remove expired entry
-                    del self.cache[cache_key]
-            
-            self.misses += 1
+                entry = shard.get(cache_key)
+                if entry is not None:
+                    if not self._is_expired(entry):
+                        # Move to end (LRU behavior)
+                        shard.move_to_end(cache_key)
+                        self._hits[index] += 1
+                        
+                        logger.debug(f"Cache hit for message: '{user_message[:50]}...'")
+                        return entry['response']
+                    else:
+                        # Remove expired entry
+                        del shard[cache_key]
+                
+                self._misses[index] += 1
             return None
             
         except Exception as e:
@@ -129,24 +155,27 @@ class ResponseCache:
         """
         try:
             cache_key = self._generate_cache_key(user_message, agent_type, language)
+            lock, shard = self._shards[self._shard_index(cache_key)]
             
             # Calculate expiration time
             ttl = ttl or self.default_ttl
-            expires_at = time.time() + ttl
-            
-            # Evict old entries if needed
-            self._evict_oldest()
+            cached_at = time.time()
             
-            # Store in cache
             cache_entry = {
                 'response': response_data,
-                'cached_at': time.time(),
-                'expires_at': expires_at,
+                'cached_at': cached_at,
+                'expires_at': cached_at + ttl,
                 'agent_type': agent_type,
                 'language': language
             }
             
-            self.cache[cache_key] = cache_entry
+            with lock:
+                # Evict old entries if needed
+                shard.pop(cache_key, None)
+                self._evict_oldest(shard)
+                
+                # Store in cache
+                shard[cache_key] = cache_entry
             
             logger.debug(f"Cached response for message: '{user_message[:50]}...' "
                         f"(TTL: {ttl}s)")
@@ -158,21 +187,24 @@ class ResponseCache:
     
     def clear(self):
         """Clear all cached responses"""
-        self.cache.clear()
-        self.hits = 0
-        self.misses = 0
+        for index, (lock, shard) in enumerate(self._shards):
+            with lock:
+                shard.clear()
+                self._hits[index] = 0
+                self._misses[index] = 0
         logger.info("Cache cleared")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        total_requests = self.hits + self.misses
-        hit_rate = (self.hits / total_requests * 100) if total_requests > 0 else 0
+        hits, misses = self.hits, self.misses
+        total_requests = hits + misses
+        hit_rate = (hits / total_requests * 100) if total_requests > 0 else 0
         
         return {
-            'hits': self.hits,
-            'misses': self.misses,
+            'hits': hits,
+            'misses': misses,
             'hit_rate': round(hit_rate, 2),
-            'cache_size': len(self.cache),
+            'cache_size': sum(len(shard) for _, shard in self._shards),
             'max_size': self.max_size
         }
     
@@ -208,5 +240,147 @@ class ResponseCache:
         return True
 
 
+class SemanticResponseCache:
+    """
+    Paraphrase-tolerant response cache
+    
+    A message is reduced to its signature: the set of content stems (6-char
+    prefixes of words, stopwords dropped, negations and question words kept)
+    plus the entities it mentions (numbers, phones, emails). Messages with the
+    same signature within an (agent_type, language) bucket share a cached
+    answer, so word forms, word order and stopwords may differ. Any changed content word
+    ("магистратура" -> "бакалавриат"), an added "не", another question word
+    ("где" -> "когда") or a different room number yields another signature
+    and never reuses the answer.
+    """
+    
+    _TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+    _ENTITY_RE = re.compile(r'[\w.+-]+@[\w-]+\.[\w.]+|\+?\d[\d\s()-]{5,}\d|\d+')
+    # Отрицания меняют смысл вопроса и всегда входят в набор стемов
+    _NEGATIONS = frozenset(('не', 'ни', 'нет', 'без', 'емес', 'жоқ', 'жок'))
+    # Вопросительные слова задают тип вопроса ("где" / "когда") и тоже сохраняются
+    _QUESTION_WORDS = frozenset((
+        'как', 'что', 'где', 'когда', 'куда', 'откуда', 'почему', 'зачем', 'сколько',
+        'кто', 'чем', 'чей', 'қалай', 'қайда', 'қашан', 'қанша', 'кім', 'неге',
+        'неліктен', 'қай', 'қайдан'
+    ))
+    # Служебные слова (короче 3 букв отбрасываются и так)
+    _STOPWORDS = frozenset((
+        'для', 'какие', 'какой', 'какая', 'каким', 'это', 'мне', 'или', 'при',
+        'про', 'чтобы', 'можно', 'пожалуйста', 'қандай', 'үшін', 'және', 'немесе'
+    ))
+    
+    def __init__(self, max_size_per_bucket: int = 200, default_ttl: int = 1800,
+                 stem_length: int = 6):
+        """
+        Initialize semantic cache
+        
+        Args:
+            max_size_per_bucket: Maximum entries per (agent_type, language) bucket
+            default_ttl: Default time-to-live in seconds
+            stem_length: Prefix length used as a cheap stem for ru/kz word forms
+        """
+        self.max_size_per_bucket = max_size_per_bucket
+        self.default_ttl = default_ttl
+        self.stem_length = stem_length
+        # (agent_type, language) -> LRU: signature -> entry
+        self.buckets: Dict[Tuple[str, str], OrderedDict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def _signature(self, message: str) -> Optional[Tuple[FrozenSet[str], FrozenSet[str]]]:
+        """Content stems and entities of message (None if nothing to match on)"""
+        stems = frozenset(
+            sys.intern(token[:self.stem_length])
+            for token in self._TOKEN_RE.findall(message.lower())
+            if token in self._NEGATIONS or token in self._QUESTION_WORDS
+            or (len(token) > 2 and token not in self._STOPWORDS and not token.isdigit())
+        )
+        if not stems:
+            return None
+        entities = frozenset(
+            re.sub(r'[\s()-]', '', match.lower())
+            for match in self._ENTITY_RE.findall(message)
+        )
+        return stems, entities
+    
+    def get(self, user_message: str, agent_type: str, language: str = 'ru') -> Optional[Dict[str, Any]]:
+        """
+        Get cached response for a paraphrase of a cached message
+        
+        Returns:
+            Cached response dict or None if no entry with the same signature
+        """
+        try:
+            signature = self._signature(user_message)
+            with self._lock:
+                bucket = self.buckets.get((agent_type, language))
+                entry = bucket.get(signature) if bucket and signature else None
+                if entry is not None and time.time() > entry['expires_at']:
+                    del bucket[signature]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    return None
+                bucket.move_to_end(signature)
+                self.hits += 1
+            logger.debug(f"Semantic cache hit for message: '{user_message[:50]}...'")
+            return entry['response']
+            
+        except Exception as e:
+            logger.error(f"Error accessing semantic cache: {e}")
+            return None
+    
+    def set(self, user_message: str, agent_type: str, response_data: Dict[str, Any],
+            language: str = 'ru', ttl: Optional[int] = None) -> bool:
+        """
+        Cache a response for paraphrase lookups
+        
+        Returns:
+            True if cached successfully
+        """
+        try:
+            signature = self._signature(user_message)
+            if signature is None:
+                return False
+            
+            entry = {
+                'response': response_data,
+                'expires_at': time.time() + (ttl or self.default_ttl)
+            }
+            with self._lock:
+                bucket = self.buckets.setdefault((agent_type, language), OrderedDict())
+                bucket.pop(signature, None)
+                while len(bucket) >= self.max_size_per_bucket:
+                    bucket.popitem(last=False)
+                bucket[signature] = entry
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error caching semantic response: {e}")
+            return False
+    
+    def clear(self):
+        """Clear all cached responses"""
+        with self._lock:
+            self.buckets.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total_requests = self.hits + self.misses
+        hit_rate = (self.hits / total_requests * 100) if total_requests > 0 else 0
+        
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(hit_rate, 2),
+            'cache_size': sum(len(bucket) for bucket in self.buckets.values())
+        }
+
+
 # Global cache instance
-response_cache = ResponseCache(max_size=500, default_ttl=1800)  # 30 minutes TTL
\ No newline at end of file
+response_cache = ResponseCache(max_size=500, default_ttl=1800)  # 30 minutes TTL
+semantic_response_cache = SemanticResponseCache(max_size_per_bucket=200, default_ttl=1800)
@@ -6,16 +6,22 @@ This module provides advanced semantic search capabilities using
 text embeddings and knowledge graph relationships.
 """
 
+import heapq
 import logging
 import re
+import threading
 import json
 import math
-from typing import Dict, List, Tuple, Optional, Set, Any
-from collections import defaultdict, Counter
+from typing import Dict, FrozenSet, List, Tuple, Optional, Set, Any
+from collections import defaultdict, Counter, OrderedDict
 import hashlib
+from operator import itemgetter
 
 logger = logging.getLogger(__name__)
 
+# Слова: непрерывные последовательности букв и цифр
+_WORD_RE = re.compile(r'\w+')
+
 
 class SemanticSearchEngine:
     """Advanced semantic search with embeddings simulation and knowledge graphs"""
@@ -23,14 +29,22 @@ class SemanticSearchEngine:
     def __init__(self):
         self.knowledge_graph = {}  # Simple knowledge graph representation
         self.concept_embeddings = {}  # Simulated embeddings for concepts
+        self.concept_cosines = {}  # (concept, concept) -> cosine, nonzero pairs only
         self.entity_relationships = defaultdict(set)
         self.concept_synonyms = {}
         
         # Initialize with university domain knowledge
         self._initialize_domain_knowledge()
         
-        # Semantic similarity cache
-        self.similarity_cache = {}
+        # Semantic similarity cache (LRU, bounded to keep memory flat)
+        self.similarity_cache = OrderedDict()
+        self.max_similarity_cache = 4096
+        
+        # Precomputed per-entry features: (entry, language) -> features (LRU)
+        self.entry_features = OrderedDict()
+        self.max_entry_features = 2048
+        # Оба LRU меняются из потоков запросов
+        self._cache_lock = threading.Lock()
         
     def _initialize_domain_knowledge(self):
         """Initialize domain-specific knowledge graph and concepts"""
@@ -128,33 +142,91 @@ class SemanticSearchEngine:
                     embedding = {k: v / norm for k, v in embedding.items()}
             
             self.concept_embeddings[concept] = embedding
+        
+        # Pairwise cosines are computed once here instead of per query
+        embeddings = list(self.concept_embeddings.items())
+        self.concept_cosines = {}
+        for concept1, embedding1 in embeddings:
+            for concept2, embedding2 in embeddings:
+                cosine = self._cosine_similarity(embedding1, embedding2)
+                if cosine:
+                    self.concept_cosines[(concept1, concept2)] = cosine
     
     def calculate_semantic_similarity(self, text1: str, text2: str) -> float:
         """Calculate semantic similarity between two texts"""
         # Create cache key
         key = hashlib.md5(f"{text1}|{text2}".encode()).hexdigest()[:12]
-        if key in self.similarity_cache:
-            return self.similarity_cache[key]
+        with self._cache_lock:
+            cached = self.similarity_cache.get(key)
+            if cached is not None:
+                self.similarity_cache.move_to_end(key)
+                return cached
+        
+        similarity = self._similarity_from_features(
+            self._text_features(text1), self._text_features(text2)
+        )
         
-        # Extract concepts from both texts
-        concepts1 = self._extract_concepts(text1.lower())
-        concepts2 = self._extract_concepts(text2.lower())
+        # Cache result
+        with self._cache_lock:
+            self.similarity_cache[key] = similarity
+            if len(self.similarity_cache) > self.max_similarity_cache:
+                self.similarity_cache.popitem(last=False)
+        
+        return similarity
+    
+    def _text_features(self, text: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """Concepts and word set of text, the inputs of semantic similarity"""
+        text_lower = text.lower()
+        return (frozenset(self._extract_concepts(text_lower)),
+                frozenset(_WORD_RE.findall(text_lower)))
+    
+    def _similarity_from_features(self, features1: Tuple[FrozenSet[str], FrozenSet[str]],
+                                  features2: Tuple[FrozenSet[str], FrozenSet[str]]) -> float:
+        """Semantic similarity of two texts from their precomputed features"""
+        concepts1, words1 = features1
+        concepts2, words2 = features2
         
         if not concepts1 or not concepts2:
-            similarity = self._calculate_lexical_similarity(text1, text2)
-        else:
-            # Calculate concept-based similarity
-            similarity = self._calculate_concept_similarity(concepts1, concepts2)
+            return self._jaccard(words1, words2)
         
-        # Cache result
-        self.similarity_cache[key] = similarity
+        # Calculate concept-based similarity
+        return self._calculate_concept_similarity(concepts1, concepts2)
+    
+    def _get_entry_features(self, entry, language: str) -> Tuple:
+        """
+        Features of a knowledge entry, computed once per entry version
         
-        return similarity
+        Returns:
+            Tuple of (content, title features, content features,
+            keyword features, combined concepts)
+        """
+        key = (entry, language)
+        with self._cache_lock:
+            features = self.entry_features.get(key)
+            if features is not None:
+                self.entry_features.move_to_end(key)
+                return features
+        
+        content = entry.content_ru if language == 'ru' else entry.content_kz
+        keywords = entry.keywords or ''
+        features = (
+            content,
+            self._text_features(entry.title),
+            self._text_features(content or ''),
+            self._text_features(keywords),
+            frozenset(self._extract_concepts(f"{entry.title} {content} {keywords}".lower()))
+        )
+        
+        with self._cache_lock:
+            self.entry_features[key] = features
+            if len(self.entry_features) > self.max_entry_features:
+                self.entry_features.popitem(last=False)
+        return features
     
     def _extract_concepts(self, text: str) -> Set[str]:
         """Extract known concepts from text"""
         concepts = set()
-        text_words = set(re.findall(r'\b\w+\b', text.lower()))
+        text_words = set(_WORD_RE.findall(text.lower()))
         
         # Direct concept matches
         for concept in self.knowledge_graph:
@@ -184,18 +256,12 @@ class SemanticSearchEngine:
         max_concepts = max(len(concepts1), len(concepts2))
         direct_score = direct_overlap / max_concepts if max_concepts > 0 else 0
         
-        # Embedding-based similarity
-        embedding_scores = []
-        for c1 in concepts1:
-            for c2 in concepts2:
-                if c1 in self.concept_embeddings and c2 in self.concept_embeddings:
-                    embedding_sim = self._cosine_similarity(
-                        self.concept_embeddings[c1],
-                        self.concept_embeddings[c2]
-                    )
-                    embedding_scores.append(embedding_sim)
-        
-        embedding_score = max(embedding_scores) if embedding_scores else 0
+        # Embedding-based similarity (cosines are non-negative, missing pairs are 0)
+        concept_cosines = self.concept_cosines
+        embedding_score = max(
+            (concept_cosines.get((c1, c2), 0.0) for c1 in concepts1 for c2 in concepts2),
+            default=0
+        )
         
         # Relationship-based similarity
         relationship_score = self._calculate_relationship_similarity(concepts1, concepts2)
@@ -251,9 +317,13 @@ class SemanticSearchEngine:
     
     def _calculate_lexical_similarity(self, text1: str, text2: str) -> float:
         """Fallback lexical similarity calculation"""
-        words1 = set(re.findall(r'\b\w+\b', text1.lower()))
-        words2 = set(re.findall(r'\b\w+\b', text2.lower()))
-        
+        words1 = set(_WORD_RE.findall(text1.lower()))
+        words2 = set(_WORD_RE.findall(text2.lower()))
+        return self._jaccard(words1, words2)
+    
+    @staticmethod
+    def _jaccard(words1: Set[str], words2: Set[str]) -> float:
+        """Jaccard similarity of two word sets"""
         if not words1 or not words2:
             return 0.0
         
@@ -283,19 +353,23 @@ class SemanticSearchEngine:
         
         scored_results = []
         
+        # Query features are computed once, entry features once per entry
+        query_features = self._text_features(query)
+        query_concepts = query_features[0]
+        
         for entry in knowledge_entries:
             # Get content based on language
-            content = entry.content_ru if language == 'ru' else entry.content_kz
+            (content, title_features, content_features,
+             keyword_features, entry_concepts) = self._get_entry_features(entry, language)
             if not content:
                 continue
             
             # Calculate semantic similarity
-            title_similarity = self.calculate_semantic_similarity(query, entry.title)
-            content_similarity = self.calculate_semantic_similarity(query, content)
+            title_similarity = self._similarity_from_features(query_features, title_features)
+            content_similarity = self._similarity_from_features(query_features, content_features)
             
             # Calculate keyword semantic similarity
-            keywords = entry.keywords or ''
-            keyword_similarity = self.calculate_semantic_similarity(query, keywords)
+            keyword_similarity = self._similarity_from_features(query_features, keyword_features)
             
             # Weighted semantic score
             semantic_score = (
@@ -305,9 +379,6 @@ class SemanticSearchEngine:
             )
             
             # Add concept expansion boost
-            query_concepts = self._extract_concepts(query.lower())
-            entry_concepts = self._extract_concepts(f"{entry.title} {content} {keywords}".lower())
-            
             if query_concepts and entry_concepts:
                 concept_expansion_score = self._calculate_concept_expansion_score(
                     query_concepts, entry_concepts
@@ -330,13 +401,13 @@ class SemanticSearchEngine:
                     'title': entry.title
                 })
         
-        # Sort by semantic score
-        scored_results.sort(key=lambda x: x['semantic_score'], reverse=True)
+        # Top results by semantic score, without sorting the whole list
+        top_results = heapq.nlargest(max_results, scored_results, key=itemgetter('semantic_score'))
         
         logger.info(f"Semantic search for '{query}': {len(scored_results)} results "
-                   f"(best score: {scored_results[0]['semantic_score']:.3f})" if scored_results else "No results")
+                   f"(best score: {top_results[0]['semantic_score']:.3f})" if top_results else "No results")
         
-        return scored_results[:max_results]
+        return top_results
     
     def _calculate_concept_expansion_score(self, query_concepts: Set[str], 
                                          entry_concepts: Set[str]) -> float:
@@ -463,6 +534,7 @@ class SemanticSearchEngine:
         
         # Regenerate embeddings for updated concept
         self._generate_concept_embeddings()
+        self.entry_features.clear()
         
         logger.info(f"Updated knowledge graph with concept: {concept}")
     
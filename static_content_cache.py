@@ -0,0 +1,153 @@
+"""
+Static Content Cache
+Кэш справочного контента агентов
+
+Reference data shown by enhanced agents (admission info, program
+requirements, faculties, maintenance schedule) can be overridden from
+the agent_static_content table. All rows are loaded with one query and
+kept in process memory, so a chat turn never reads them from the
+database; cached content is dropped when a session commits changes to
+AgentStaticContent rows (other workers pick changes up after the TTL).
+Caches built from this content (e.g. endpoint responses) register an
+on_invalidate callback and are cleared at the same time.
+"""
+
+import logging
+import threading
+import time
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import AgentConfig
+
+logger = logging.getLogger(__name__)
+
+
+class StaticContentCache:
+    """In-process TTL cache of all agent static content rows"""
+
+    def __init__(self, ttl: int = 600):
+        """
+        Initialize cache
+
+        Args:
+            ttl: Time-to-live for loaded content in seconds
+        """
+        self.ttl = ttl
+        # (agent_type, kind, language) -> content
+        self._content: Dict[Tuple[str, str, str], Any] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._invalidation_callbacks: List[Callable[[], None]] = []
+        # Увеличивается при каждой инвалидации: загрузка, начатая до нее, не считается свежей
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Load all active content rows with a single query"""
+        from models import AgentStaticContent
+
+        generation = self._generation
+        rows = AgentStaticContent.query.with_entities(
+            AgentStaticContent.agent_type,
+            AgentStaticContent.kind,
+            AgentStaticContent.language,
+            AgentStaticContent.content
+        ).filter_by(is_active=True).all()
+
+        content = {(agent_type, kind, language): value for agent_type, kind, language, value in rows}
+        with self._lock:
+            self._content = content
+            # Инвалидация во время загрузки: следующий get() перечитает таблицу
+            if generation == self._generation:
+                self._loaded_at = time.time()
+        logger.info(f"Static content cache loaded: {len(content)} entries")
+
+    def get(self, agent_type: str, kind: str, language: str = 'ru', default: Any = None) -> Any:
+        """
+        Get content for agent, falling back to Russian and then to default
+
+        Args:
+            agent_type: Agent type
+            kind: Content kind (e.g. 'admission_info')
+            language: Response language
+            default: Built-in content used when the table has no row
+
+        Returns:
+            Content (shared, do not modify)
+        """
+        if self._loaded_at is None or time.time() - self._loaded_at >= self.ttl:
+            self.misses += 1
+            try:
+                self.load()
+            except Exception as e:
+                # Нет таблицы или базы: отдаем встроенный контент
+                from models import db
+                db.session.rollback()
+                self._loaded_at = time.time()
+                logger.error(f"Error loading static content: {e}")
+        else:
+            self.hits += 1
+
+        content = self._content
+        value = content.get((agent_type, kind, language))
+        if value is None and language != 'ru':
+            value = content.get((agent_type, kind, 'ru'))
+        return default if value is None else value
+
+    def invalidate(self):
+        """Drop loaded content; the next get() reloads it"""
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+        for callback in self._invalidation_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in static content invalidation callback: {e}")
+        logger.info("Static content cache invalidated")
+
+    def on_invalidate(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Register callback run on every invalidation (usable as a decorator)"""
+        self._invalidation_callbacks.append(callback)
+        return callback
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            'entries': len(self._content),
+            'hits': self.hits,
+            'misses': self.misses,
+            'ttl': self.ttl
+        }
+
+
+# Global static content cache instance
+static_content_cache = StaticContentCache(ttl=AgentConfig.STATIC_CONTENT_CACHE_TTL)
+
+
+def _register_invalidation_hooks(cache: StaticContentCache):
+    """Invalidate loaded content after commits that touch AgentStaticContent"""
+    from models import AgentStaticContent
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_changed_content(session, flush_context):
+        if any(isinstance(obj, AgentStaticContent)
+               for obj in chain(session.new, session.dirty, session.deleted)):
+            session.info['static_content_changed'] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def _invalidate_content(session):
+        if session.info.pop('static_content_changed', False):
+            cache.invalidate()
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_changed_content(session):
+        session.info.pop('static_content_changed', None)
+
+
+_register_invalidation_hooks(static_content_cache)
@@ -0,0 +1,137 @@
+"""
+Document Template Cache
+Кэш шаблонов документов
+
+Keeps the localized, ready-to-serialize list of active document templates
+per (agent type, language). Templates are read on every template listing
+but change only from the admin side, so cached views are dropped when a
+session commits changes to DocumentTemplate rows.
+"""
+
+import logging
+import threading
+import time
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import AgentConfig
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateCache:
+    """In-process TTL cache of localized template lists"""
+
+    def __init__(self, ttl: int = 600):
+        """
+        Initialize cache
+
+        Args:
+            ttl: Time-to-live for a cached list in seconds
+        """
+        self.ttl = ttl
+        # (agent_type, language) -> (loaded_at, templates)
+        self._views: Dict[Tuple[str, str], Tuple[float, Tuple[Dict[str, Any], ...]]] = {}
+        self._lock = threading.Lock()
+        # Увеличивается при каждой инвалидации: список, загруженный до нее, не сохраняется
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load_templates(self, agent_type: str, language: str) -> Tuple[Dict[str, Any], ...]:
+        """Load active templates for agent and localize them"""
+        from models import DocumentTemplate
+
+        templates = DocumentTemplate.query.filter_by(
+            agent_type=agent_type,
+            is_active=True
+        ).all()
+
+        return tuple({
+            'id': t.id,
+            'name': t.get_name(language),
+            'category': t.category,
+            'instructions': t.get_instructions(language),
+            'required_fields': t.required_fields,
+            'file_path': t.file_path
+        } for t in templates)
+
+    def get_templates(self, agent_type: str, language: str = 'ru') -> List[Dict[str, Any]]:
+        """
+        Get localized active templates for agent
+
+        Args:
+            agent_type: Agent type
+            language: Response language
+
+        Returns:
+            List of template dicts (shared, do not modify)
+        """
+        key = (agent_type, language)
+        cached = self._views.get(key)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            self.hits += 1
+            return list(cached[1])
+
+        self.misses += 1
+        generation = self._generation
+        templates = self._load_templates(agent_type, language)
+        with self._lock:
+            if generation == self._generation:
+                self._views[key] = (time.time(), templates)
+        return list(templates)
+
+    def invalidate(self, agent_type: Optional[str] = None):
+        """
+        Drop cached lists for agent type (or for all agents)
+
+        Args:
+            agent_type: Agent type to invalidate, None clears everything
+        """
+        with self._lock:
+            self._generation += 1
+            if agent_type is None:
+                self._views.clear()
+            else:
+                for key in [key for key in self._views if key[0] == agent_type]:
+                    del self._views[key]
+        logger.info(f"Template cache invalidated for {agent_type or 'all agents'}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics"""
+        return {
+            'views_cached': len(self._views),
+            'hits': self.hits,
+            'misses': self.misses,
+            'ttl': self.ttl
+        }
+
+
+# Global template cache instance
+template_cache = TemplateCache(ttl=AgentConfig.TEMPLATE_CACHE_TTL)
+
+
+def _register_invalidation_hooks(cache: TemplateCache):
+    """Invalidate cached template lists after commits that touch DocumentTemplate"""
+    from models import DocumentTemplate
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect_changed_templates(session, flush_context):
+        if any(isinstance(obj, DocumentTemplate)
+               for obj in chain(session.new, session.dirty, session.deleted)):
+            session.info['templates_changed'] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def _invalidate_templates(session):
+        if session.info.pop('templates_changed', False):
+            cache.invalidate()
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_changed_templates(session):
+        session.info.pop('templates_changed', None)
+
+
+_register_invalidation_hooks(template_cache)
@@ -1,8 +1,9 @@
 # Импорт необходимых модулей
 import time
+import json
 import logging
 from datetime import datetime
-from flask import Blueprint, render_template, request, jsonify, session, Response
+from flask import Blueprint, render_template, request, jsonify, session, Response, stream_with_context
 import requests
 import base64
 from sqlalchemy import func, desc
@@ -128,6 +129,7 @@ def chat():
             db.session.add(user_query)
             db.session.commit()
         except Exception as db_error:
+            db.session.rollback()
             logger.warning(f"Database error (continuing without saving): {str(db_error)}")
             # Continue without saving to database
 
@@ -155,6 +157,78 @@ def chat():
         error_message = "Извините, произошла ошибка. Попробуйте еще раз." if lang == 'ru' else "Кешіріңіз, қате орын алды. Қайталап көріңіз."
         return jsonify({'success': False, 'error': error_message}), 500
 
+@main_bp.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream chat response as Server-Sent Events"""
+    data = request.get_json()
+    if not data or 'message' not in data:
+        return jsonify({'success': False, 'error': 'Сообщение не найдено'}), 400
+
+    user_message = data['message'].strip()
+    language = data.get('language', 'ru')
+    agent_type = data.get('agent')
+
+    if not user_message:
+        return jsonify({'success': False, 'error': 'Пустое сообщение'}), 400
+
+    router = initialize_agent_router()
+
+    agent = None
+    confidence, routing_info = 1.0, {}
+    if agent_type and agent_type != 'auto':
+        agent = next((a for a in router.agents if a.agent_type == agent_type), None)
+    if agent is None:
+        agent, confidence, routing_info = router.select_agent(user_message, language)
+    if agent is None:
+        return jsonify({'success': False, 'error': 'Не удалось определить агента'}), 500
+
+    # Без совпадений по ключевым словам: ответ из кэша или просьба уточнить, без LLM
+    if router.should_clarify(confidence, routing_info):
+        events = router.clarify_stream(agent, user_message, language, confidence)
+    else:
+        events = agent.process_message_stream(user_message, language)
+
+    session_id = session.get('session_id', '')
+    ip_address = request.remote_addr
+    user_agent = request.headers.get('User-Agent', '')
+
+    def generate():
+        chunks = []
+        meta = {}
+        for event in events:
+            if event['type'] == 'meta':
+                meta = event
+            elif event['type'] == 'chunk':
+                chunks.append(event['content'])
+            elif event['type'] == 'done':
+                # Сохраняем запрос после завершения потока
+                from models import UserQuery, db
+                try:
+                    db.session.add(UserQuery(
+                        user_message=user_message,
+                        bot_response=''.join(chunks),
+                        language=language,
+                        response_time=event['response_time'],
+                        agent_type=meta.get('agent_type'),
+                        agent_name=meta.get('agent_name'),
+                        agent_confidence=meta.get('confidence', 0.0),
+                        context_used=meta.get('context_used', False),
+                        session_id=session_id,
+                        ip_address=ip_address,
+                        user_agent=user_agent
+                    ))
+                    db.session.commit()
+                except Exception as db_error:
+                    db.session.rollback()
+                    logger.warning(f"Database error (continuing without saving): {str(db_error)}")
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @main_bp.route('/api/health')
 def health_check():
     """Health check endpoint"""